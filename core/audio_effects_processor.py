@@ -57,9 +57,17 @@ class AudioEffectsProcessor:
         "ambient_hall": {
             "echo": {"delays_ms": [150, 280, 450, 650], "decays": [0.4, 0.3, 0.2, 0.12], "mix": 0.3},
             "chorus": {"rate": 0.6, "depth": 0.3, "voices": 2, "spread": 0.4, "mix": 0.15}
+        },
+        
+        # Reverb por convolución con una IR real (archivo en audio_effects.ir_file)
+        "convolution_reverb": {
+            "convolution": {"mix": 0.25, "max_seconds": 1.5}
         }
     }
     
+    # Banco de respuestas al impulso compiladas: (preset, sample_rate, ir_file) -> etapas
+    _IR_BANK = {}
+    
     # =======================================================================
     # 2.2 INICIALIZACIÓN
     # =======================================================================
@@ -69,6 +77,7 @@ class AudioEffectsProcessor:
         """
         self.config = config
         self.enabled = config.get("enabled", False)
+        # audio_effects.ir_file: IR para el preset convolution_reverb
         
         if not self.enabled:
             return
@@ -84,24 +93,21 @@ class AudioEffectsProcessor:
     # =======================================================================
     # 2.3 APLICACIÓN DE EFECTOS PRINCIPAL
     # =======================================================================
-    def apply_effects(self, input_wav_path: str, output_wav_path: str = None) -> bool:
+    def process_buffer(self, audio: np.ndarray, sample_rate: int) -> np.ndarray:
         """
-        Aplica efectos temporales con calidad técnica equiparable a RadioFilter.
+        Aplica los efectos del preset a un buffer en memoria.
+        Devuelve float32 mono (el mismo audio si no hay efectos o si fallan).
         """
+        audio = np.asarray(audio, dtype=np.float32)
         if not self.enabled or self.preset == "none":
-            return False
-            
-        if not os.path.exists(input_wav_path):
-            logger.error(f"❌ Archivo no encontrado: {input_wav_path}")
-            return False
+            return audio
         
         start_time = time.time()
         
         try:
             # =======================================================================
-            # 2.3.1 CARGA Y PREPARACIÓN (como RadioFilter)
+            # 2.3.1 PREPARACIÓN (como RadioFilter)
             # =======================================================================
-            audio, sample_rate = sf.read(input_wav_path)
             if len(audio.shape) > 1:
                 audio = np.mean(audio, axis=1)
             
@@ -113,25 +119,45 @@ class AudioEffectsProcessor:
             # =======================================================================
             # 2.3.2 APLICACIÓN DE EFECTOS DEL PRESET
             # =======================================================================
-            audio = self._apply_preset_effects(audio, sample_rate)
+            processed = self._apply_preset_effects(audio, sample_rate)
             
             # =======================================================================
             # 2.3.3 POST-PROCESAMIENTO FINAL
             # =======================================================================
             # Soft clipping final (técnica de RadioFilter)
-            audio = self._soft_clip(audio, threshold=0.85, hardness=3)
+            processed = self._soft_clip(processed, threshold=0.85, hardness=3)
             
             # Normalización final solo si necesario
-            max_final = np.max(np.abs(audio))
+            max_final = np.max(np.abs(processed))
             if max_final > 1.0:
-                audio = audio / max_final * 0.98
+                processed = processed / max_final * 0.98
+            
+            end_time = time.time()
+            logger.info(f"✅ Audio effects ({self.preset}) aplicados en {end_time - start_time:.3f}s")
+            return processed.astype(np.float32)
+            
+        except Exception as e:
+            logger.error(f"❌ Error aplicando efectos: {e}")
+            return audio
+    
+    def apply_effects(self, input_wav_path: str, output_wav_path: str = None) -> bool:
+        """
+        Versión sobre archivos de process_buffer() (scripts y exportación).
+        """
+        if not self.enabled or self.preset == "none":
+            return False
+            
+        if not os.path.exists(input_wav_path):
+            logger.error(f"❌ Archivo no encontrado: {input_wav_path}")
+            return False
+        
+        try:
+            audio, sample_rate = sf.read(input_wav_path, dtype='float32')
+            audio = self.process_buffer(audio, sample_rate)
             
             # Guardar
             output_path = output_wav_path or input_wav_path
             sf.write(output_path, audio, sample_rate)
-            
-            end_time = time.time()
-            logger.info(f"✅ Audio effects ({self.preset}) aplicados en {end_time - start_time:.3f}s")
             return True
             
         except Exception as e:
@@ -142,75 +168,91 @@ class AudioEffectsProcessor:
     # 2.4 APLICACIÓN DE EFECTOS POR PRESET
     # =======================================================================
     def _apply_preset_effects(self, audio: np.ndarray, sample_rate: int) -> np.ndarray:
-        """Aplica efectos del preset con orden optimizado."""
+        """Aplica las etapas compiladas del preset (IR por convolución + chorus)."""
         if self.preset not in self.PRESETS:
             logger.warning(f"⚠️ Preset '{self.preset}' no encontrado")
             return audio
         
-        preset_config = self.PRESETS[self.preset]
         result = audio.copy()
+        for kind, stage in self._compiled_stages(sample_rate):
+            if kind == "ir":
+                # Overlap-add FFT: coste casi independiente del número de taps
+                result = scipy.signal.oaconvolve(result, stage)[:len(audio)].astype(result.dtype)
+            else:
+                result = self._apply_true_chorus(result, sample_rate, stage)
         
-        # Orden: delay -> chorus -> echo (por procesamiento óptimo)
-        if "delay" in preset_config:
-            result = self._apply_studio_delay(result, sample_rate, preset_config["delay"])
+        return result
+    
+    def _compiled_stages(self, sample_rate: int) -> list:
+        """
+        Compila el preset una vez por sample rate.
+        Orden: delay -> chorus -> echo -> convolución; las etapas lineales
+        consecutivas se funden en una sola IR.
+        """
+        ir_file = self.config.get("ir_file")
+        key = (self.preset, sample_rate, ir_file)
+        if key in self._IR_BANK:
+            return self._IR_BANK[key]
         
-        if "chorus" in preset_config:
-            result = self._apply_true_chorus(result, sample_rate, preset_config["chorus"])
+        preset_config = self.PRESETS[self.preset]
+        stages = []
+        
+        def add_ir(ir):
+            if stages and stages[-1][0] == "ir":
+                stages[-1] = ("ir", scipy.signal.oaconvolve(stages[-1][1], ir))
+            else:
+                stages.append(("ir", ir))
         
+        if "delay" in preset_config:
+            add_ir(self._studio_delay_ir(sample_rate, preset_config["delay"]))
+        if "chorus" in preset_config:
+            stages.append(("chorus", preset_config["chorus"]))
         if "echo" in preset_config:
-            result = self._apply_multi_echo(result, sample_rate, preset_config["echo"])
+            add_ir(self._multi_echo_ir(sample_rate, preset_config["echo"]))
+        if "convolution" in preset_config:
+            ir = self._file_ir(sample_rate, preset_config["convolution"], ir_file)
+            if ir is not None:
+                add_ir(ir)
         
-        return result
+        self._IR_BANK[key] = stages
+        logger.debug(f"🧮 Preset '{self.preset}' compilado a {sample_rate} Hz: "
+                     + ", ".join(f"{kind}({len(stage)})" if kind == "ir" else kind for kind, stage in stages))
+        return stages
     
 # =======================================================================
 # 3. EFECTOS ESPECÍFICOS
 # =======================================================================
     
     # =======================================================================
-    # 3.1 STUDIO DELAY
+    # 3.1 STUDIO DELAY (IR)
     # =======================================================================
-    def _apply_studio_delay(self, audio: np.ndarray, sample_rate: int, params: dict) -> np.ndarray:
+    def _studio_delay_ir(self, sample_rate: int, params: dict) -> np.ndarray:
         """
-        Delay de calidad con damping y anti-aliasing.
-        Técnica similar a tu RadioFilter: simple pero muy bien ejecutado.
+        Delay con damping y feedback horneados en una respuesta al impulso:
+        seco + mix * (eco amortiguado en t + feedback en 2t).
         """
-        try:
-            time_ms = params.get("time_ms", 120)
-            feedback = np.clip(params.get("feedback", 0.35), 0.0, 0.7)
-            damping = np.clip(params.get("damping", 0.7), 0.1, 0.95)  # Filtro progresivo
-            mix = np.clip(params.get("mix", 0.18), 0.0, 0.5)
-            
-            delay_samples = int(time_ms * sample_rate / 1000)
-            
-            if delay_samples >= len(audio) or delay_samples < 1:
-                return audio
-            
-            # Crear línea de delay con filtro anti-aliasing
-            delayed = np.zeros_like(audio)
-            delayed[delay_samples:] = audio[:-delay_samples]
-            
-            # Aplicar damping (filtro pasa-bajos progresivo como en RadioFilter)
-            nyquist = 0.5 * sample_rate
-            cutoff = damping * 0.4  # Frecuencia de corte progresiva
-            b_damp, a_damp = scipy.signal.butter(2, cutoff, btype='low')
-            delayed = scipy.signal.filtfilt(b_damp, a_damp, delayed)
-            
-            # Feedback con saturación suave (técnica RadioFilter)
-            if feedback > 0:
-                feedback_signal = np.zeros_like(audio)
-                double_delay = delay_samples * 2
-                if double_delay < len(audio):
-                    fb_audio = audio[:-double_delay] * feedback
-                    # Soft clipping en el feedback para carácter
-                    fb_audio = self._soft_clip(fb_audio, threshold=0.6, hardness=2)
-                    feedback_signal[double_delay:] = fb_audio
-                delayed += feedback_signal
-            
-            return audio * (1 - mix) + delayed * mix
-            
-        except Exception as e:
-            logger.warning(f"⚠️ Studio delay falló: {e}")
-            return audio
+        time_ms = params.get("time_ms", 120)
+        feedback = np.clip(params.get("feedback", 0.35), 0.0, 0.7)
+        damping = np.clip(params.get("damping", 0.7), 0.1, 0.95)  # Filtro progresivo
+        mix = np.clip(params.get("mix", 0.18), 0.0, 0.5)
+        
+        delay_samples = int(time_ms * sample_rate / 1000)
+        ir = np.zeros(2 * delay_samples + self.IR_TAIL + 1)
+        ir[0] = 1 - mix
+        if delay_samples < 1:
+            ir[0] = 1.0
+            return ir
+        
+        # Damping (filtro pasa-bajos de fase cero, como el filtfilt de la cadena clásica)
+        cutoff = damping * 0.4  # Frecuencia de corte progresiva
+        b_damp, a_damp = scipy.signal.butter(2, cutoff, btype='low')
+        self._add_zero_phase_tap(ir, delay_samples, mix, b_damp, a_damp)
+        
+        # Feedback: segunda repetición sin filtrar
+        if feedback > 0:
+            ir[2 * delay_samples] += feedback * mix
+        
+        return ir
     
     # =======================================================================
     # 3.2 TRUE CHORUS
@@ -250,23 +292,9 @@ class AudioEffectsProcessor:
                 lfo_secondary = np.sin(2 * np.pi * rate * 1.3 * t + phase_offset + np.pi/4)
                 lfo_combined = (lfo_primary + 0.3 * lfo_secondary) * depth * spread
                 
-                # Delay modulado con interpolación lineal (anti-aliasing básico)
-                voice_signal = np.zeros_like(audio)
-                
-                for i in range(len(audio)):
-                    delay_variation = lfo_combined[i] * max_variation_samples
-                    delay_total = base_delay_samples + int(delay_variation)
-                    
-                    # Interpolación simple para suavizar
-                    if i >= delay_total and delay_total > 0:
-                        frac = delay_variation - int(delay_variation)
-                        if i >= delay_total + 1:
-                            # Interpolación lineal
-                            sample1 = audio[i - delay_total]
-                            sample2 = audio[i - delay_total - 1]
-                            voice_signal[i] = sample1 * (1 - frac) + sample2 * frac
-                        else:
-                            voice_signal[i] = audio[i - delay_total]
+                # Delay modulado con interpolación lineal, vectorizado sobre todo el buffer
+                voice_signal = self._modulated_delay(audio, lfo_combined * max_variation_samples,
+                                                     base_delay_samples)
                 
                 # Cada voz con ganancia calculada
                 voice_gain = 0.7 / voices  # Normalización automática
@@ -278,51 +306,102 @@ class AudioEffectsProcessor:
             logger.warning(f"⚠️ True chorus falló: {e}")
             return audio
     
+    @staticmethod
+    def _modulated_delay(audio: np.ndarray, delay_variation: np.ndarray, base_delay: int) -> np.ndarray:
+        """
+        Línea de retardo fraccional modulada (gather interpolado de índices).
+        Mismo resultado que recorrer muestra a muestra:
+            delay_total = base + int(variación); frac = variación - int(variación)
+            salida[i] = audio[i - delay_total] * (1 - frac) + audio[i - delay_total - 1] * frac
+        """
+        n = len(audio)
+        whole = delay_variation.astype(np.int64)          # int() trunca hacia cero, igual que astype
+        frac = delay_variation - whole
+        delay_total = base_delay + whole
+        source = np.arange(n) - delay_total
+
+        valid = (source >= 0) & (delay_total > 0)
+        interpolate = source >= 1
+
+        current = audio[np.clip(source, 0, n - 1)]
+        previous = audio[np.clip(source - 1, 0, n - 1)]
+        voice = np.where(interpolate, current * (1 - frac) + previous * frac, current)
+        return np.where(valid, voice, 0.0).astype(audio.dtype)
+    
     # =======================================================================
-    # 3.3 MULTI ECHO
+    # 3.3 MULTI ECHO (IR)
     # =======================================================================
-    def _apply_multi_echo(self, audio: np.ndarray, sample_rate: int, params: dict) -> np.ndarray:
+    def _multi_echo_ir(self, sample_rate: int, params: dict) -> np.ndarray:
         """
-        Eco múltiple con decaimiento exponencial y filtrado progresivo.
-        Misma filosofía que tu triple eco en RadioFilter.
+        Eco múltiple con decaimiento y filtrado progresivo horneado en una IR.
+        Ecos más tardíos = más filtrados (simulación física).
         """
-        try:
-            delays_ms = params.get("delays_ms", [150, 280, 450])
-            decays = params.get("decays", [0.4, 0.3, 0.2])
-            mix = np.clip(params.get("mix", 0.25), 0.0, 0.4)
-            
-            # Asegurar que tenemos el mismo número de delays y decays
-            min_length = min(len(delays_ms), len(decays))
-            delays_ms = delays_ms[:min_length]
-            decays = decays[:min_length]
-            
-            echo_sum = np.zeros_like(audio)
-            
-            for i, (delay_ms, decay) in enumerate(zip(delays_ms, decays)):
-                delay_samples = int(delay_ms * sample_rate / 1000)
-                
-                if delay_samples < len(audio):
-                    echoed = np.zeros_like(audio)
-                    echoed[delay_samples:] = audio[:-delay_samples] * decay
-                    
-                    # Filtrado progresivo (como en RadioFilter)
-                    # Ecos más tardíos = más filtrados (simulación física)
-                    if i > 0:  # Primer eco sin filtrar
-                        nyquist = 0.5 * sample_rate
-                        # Frecuencia de corte decrece con cada eco
-                        cutoff_freq = 2000 - (i * 400)  # 2000, 1600, 1200 Hz...
-                        cutoff_norm = max(cutoff_freq / nyquist, 0.1)
-                        
-                        b_echo, a_echo = scipy.signal.butter(2, cutoff_norm, btype='low')
-                        echoed = scipy.signal.filtfilt(b_echo, a_echo, echoed)
-                    
-                    echo_sum += echoed
-            
-            return audio * (1 - mix) + echo_sum * mix
-            
-        except Exception as e:
-            logger.warning(f"⚠️ Multi echo falló: {e}")
-            return audio
+        delays_ms = params.get("delays_ms", [150, 280, 450])
+        decays = params.get("decays", [0.4, 0.3, 0.2])
+        mix = np.clip(params.get("mix", 0.25), 0.0, 0.4)
+        
+        # Asegurar que tenemos el mismo número de delays y decays
+        min_length = min(len(delays_ms), len(decays))
+        delays = [int(delay_ms * sample_rate / 1000) for delay_ms in delays_ms[:min_length]]
+        
+        ir = np.zeros(max(delays, default=0) + self.IR_TAIL + 1)
+        ir[0] = 1 - mix
+        nyquist = 0.5 * sample_rate
+        
+        for i, (delay_samples, decay) in enumerate(zip(delays, decays)):
+            if i == 0:  # Primer eco sin filtrar
+                ir[delay_samples] += decay * mix
+                continue
+            # Frecuencia de corte decrece con cada eco: 2000, 1600, 1200 Hz...
+            cutoff_norm = max((2000 - i * 400) / nyquist, 0.1)
+            b_echo, a_echo = scipy.signal.butter(2, cutoff_norm, btype='low')
+            self._add_zero_phase_tap(ir, delay_samples, decay * mix, b_echo, a_echo)
+        
+        return ir
+    
+    # =======================================================================
+    # 3.4 REVERB POR CONVOLUCIÓN (IR DESDE ARCHIVO)
+    # =======================================================================
+    def _file_ir(self, sample_rate: int, params: dict, ir_file: str):
+        """Carga una IR corta (WAV), la remuestrea y la mezcla con la señal seca."""
+        if ir_file and not os.path.isabs(ir_file):
+            ir_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ir_file)
+        if not ir_file or not os.path.exists(ir_file):
+            logger.warning(f"⚠️ IR no encontrada: {ir_file} (define audio_effects.ir_file)")
+            return None
+        
+        mix = np.clip(params.get("mix", 0.25), 0.0, 0.6)
+        impulse, ir_rate = sf.read(ir_file, dtype='float32')
+        if len(impulse.shape) > 1:
+            impulse = np.mean(impulse, axis=1)
+        if ir_rate != sample_rate:
+            divisor = np.gcd(int(ir_rate), int(sample_rate))
+            impulse = scipy.signal.resample_poly(impulse, sample_rate // divisor, ir_rate // divisor)
+        impulse = impulse[:int(params.get("max_seconds", 1.5) * sample_rate)]
+        
+        # Energía unitaria: el mix controla el nivel, no la grabación de la IR
+        energy = np.sqrt(np.sum(impulse ** 2))
+        if energy > 0:
+            impulse = impulse / energy
+        
+        ir = impulse * mix
+        ir[0] += 1 - mix
+        return ir
+    
+    # Muestras reservadas para la cola de los filtros de damping en cada tap
+    IR_TAIL = 1024
+    
+    @classmethod
+    def _add_zero_phase_tap(cls, ir: np.ndarray, delay: int, gain: float, b, a):
+        """Suma en ir[delay] la respuesta de fase cero (filtfilt) de un pasa-bajos, escalada por gain."""
+        impulse = np.zeros(2 * cls.IR_TAIL + 1)
+        impulse[cls.IR_TAIL] = 1.0
+        response = scipy.signal.filtfilt(b, a, impulse) * gain
+        
+        # Centrada en delay; la parte previa a t=0 (si el delay es muy corto) se descarta
+        start = delay - cls.IR_TAIL
+        offset = max(0, -start)
+        ir[max(start, 0):delay + cls.IR_TAIL + 1] += response[offset:]
     
 # =======================================================================
 # 4. UTILIDADES Y HELPER FUNCTIONS
@@ -0,0 +1,134 @@
+# ===============================================
+# DSP BANK - Coeficientes y Lechos de Ruido Precalculados para TARS-BSK
+# Objetivo: Diseñar filtros y colorear ruido una vez por configuración, no una vez por frase
+# Dependencias: SciPy (diseño SOS), NumPy (generador aleatorio)
+# Advertencia: El ruido de radio es aleatorio. Pero no hace falta inventarlo cada vez.
+# ===============================================
+
+# ===============================================
+# 1. CONFIGURACIÓN INICIAL Y DEPENDENCIAS
+# ===============================================
+import logging
+import threading
+import time
+from typing import Dict, Tuple
+
+import numpy as np
+import scipy.signal
+
+logger = logging.getLogger("TARS.DSPBank")
+
+BED_SECONDS = 6.0      # Duración de cada lecho (se recorre en bucle desde un desfase aleatorio)
+BED_VARIANTS = 3       # Lechos distintos por tipo para que el bucle no se reconozca
+
+# ===============================================
+# 2. CLASE PRINCIPAL DSPBANK
+# ===============================================
+class DSPBank:
+    """
+    Recursos DSP de la cadena de radio para un (sample_rate, banda):
+
+    - SOS: pasa-banda Butterworth, resonancias del casco, suavizado de fluctuaciones
+    - Lechos: ruido coloreado con chasquidos (nivel unitario), microfluctuaciones
+      ya suavizadas y máscaras de dropout
+
+    En tiempo de ejecución solo se recortan lechos y se filtra la voz.
+    """
+
+    _instances: Dict[Tuple[int, int, int], "DSPBank"] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, sample_rate: int, lowcut: int = 200, highcut: int = 3000) -> "DSPBank":
+        """Banco compartido para esta configuración (se construye la primera vez)"""
+        key = (int(sample_rate), int(lowcut), int(highcut))
+        with cls._lock:
+            bank = cls._instances.get(key)
+            if bank is None:
+                bank = cls._instances[key] = cls(*key)
+            return bank
+
+    # =======================
+    # 2.1 DISEÑO (UNA SOLA VEZ)
+    # =======================
+    def __init__(self, sample_rate: int, lowcut: int, highcut: int):
+        start = time.time()
+        self.sample_rate = sample_rate
+        nyquist = 0.5 * sample_rate
+
+        self.bandpass = scipy.signal.butter(6, [lowcut / nyquist, highcut / nyquist], btype='band', output='sos')
+        # Resonancias del casco (~2kHz, ~1kHz, ~3kHz) en una cascada SOS
+        self.resonators = np.vstack([
+            scipy.signal.tf2sos(*scipy.signal.iirpeak(freq / nyquist, Q=q))
+            for freq, q in ((2000, 12), (1000, 10), (3000, 8))
+        ])
+        self.noise_lowpass = scipy.signal.butter(2, 0.3, btype='low', output='sos')
+        self.smooth = scipy.signal.butter(1, 0.002, output='sos')
+
+        rng = np.random.default_rng()
+        length = int(BED_SECONDS * sample_rate)
+        self.noise_beds = [self._noise_bed(rng, length) for _ in range(BED_VARIANTS)]
+        self.fluctuation_beds = [self._fluctuation_bed(rng, length) for _ in range(BED_VARIANTS)]
+        self.dropout_beds = [np.where(rng.random(length) > 0.997, 0.5, 1.0).astype(np.float32)
+                             for _ in range(BED_VARIANTS)]
+        # Generator de NumPy no es thread-safe: productor de voz, avisos y reset() comparten el banco
+        self._rng = rng
+        self._rng_lock = threading.Lock()
+
+        logger.info(f"🧮 Banco DSP {sample_rate} Hz [{lowcut}-{highcut}Hz] preparado en {time.time() - start:.2f}s")
+
+    def _noise_bed(self, rng, length: int) -> np.ndarray:
+        """Ruido coloreado de nivel 1.0 con chasquidos (se escala por noise_level al usarlo)"""
+        colored = scipy.signal.sosfilt(self.noise_lowpass, rng.normal(0, 1.0, length))
+        crackle_points = rng.random(length) > 0.995
+        colored[crackle_points] *= 6.0
+        return colored.astype(np.float32)
+
+    def _fluctuation_bed(self, rng, length: int) -> np.ndarray:
+        """Microfluctuaciones 1 ± 0.02 ya suavizadas (fase cero, como la cadena original)"""
+        return scipy.signal.sosfiltfilt(self.smooth, 1.0 + 0.02 * rng.standard_normal(length)).astype(np.float32)
+
+    # =======================
+    # 2.2 LECTURA DE LECHOS
+    # =======================
+    def cursor(self) -> "BedCursor":
+        """Lectura continua de lechos para un enunciado (variante y desfase aleatorios)"""
+        with self._rng_lock:
+            variant = int(self._rng.integers(BED_VARIANTS))
+            offset = int(self._rng.integers(len(self.noise_beds[0])))
+        return BedCursor(self, variant, offset)
+
+
+class BedCursor:
+    """Posición de lectura en los lechos; bloques consecutivos leen muestras consecutivas"""
+
+    def __init__(self, bank: DSPBank, variant: int, offset: int):
+        self.bank = bank
+        self.variant = variant
+        self.position = offset
+
+    def _take(self, beds, n: int) -> np.ndarray:
+        return np.take(beds[self.variant], np.arange(self.position, self.position + n), mode='wrap')
+
+    def noise(self, n: int, level: float) -> np.ndarray:
+        return self._take(self.bank.noise_beds, n) * level
+
+    def fluctuation(self, n: int) -> np.ndarray:
+        return self._take(self.bank.fluctuation_beds, n)
+
+    def dropout(self, n: int) -> np.ndarray:
+        return self._take(self.bank.dropout_beds, n)
+
+    def advance(self, n: int):
+        self.position += n
+
+# ===============================================
+# ESTADO: ALEATORIAMENTE PREVISIBLE (el ruido ya venía de casa)
+# ÚLTIMA ACTUALIZACIÓN: Cuando butter() dejó de ejecutarse una vez por cada "Sí"
+# FILOSOFÍA: "La estática es eterna. Su cálculo no tiene por qué serlo."
+# ===============================================
+#
+#           THIS IS THE BANK WAY...
+#           (diseñar una vez, mezclar siempre)
+#
+# ===============================================
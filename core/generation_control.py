@@ -0,0 +1,100 @@
+# ===============================================
+# GENERATION CONTROL - Plazos y Cancelación de Generaciones para TARS-BSK
+# Objetivo: Que un hilo que ya nadie espera deje de pensar en menos de un token
+# Dependencias: llama_cpp (StoppingCriteriaList), threading
+# Advertencia: Un hilo huérfano con 3 hilos de llama es un fantasma con factura de CPU.
+# ===============================================
+
+# ===============================================
+# 1. CONFIGURACIÓN INICIAL Y DEPENDENCIAS
+# ===============================================
+import logging
+import threading
+import time
+from typing import Optional
+
+try:
+    from llama_cpp import StoppingCriteriaList
+except ImportError:  # Versiones antiguas de llama_cpp: una lista invocable sirve igual
+    class StoppingCriteriaList(list):
+        def __call__(self, input_ids, logits) -> bool:
+            return any(criterion(input_ids, logits) for criterion in self)
+
+logger = logging.getLogger("TARS.GenerationControl")
+
+# ===============================================
+# 2. CLASE PRINCIPAL GENERATIONTOKEN
+# ===============================================
+class GenerationToken:
+    """
+    Token de cancelación con plazo opcional para una generación del LLM.
+
+    Se entrega a llama_cpp como stopping_criteria: el modelo lo consulta tras
+    cada token muestreado, así que una generación cancelada o fuera de plazo
+    se detiene en el siguiente token.
+    """
+
+    # =======================
+    # 2.1 INICIALIZACIÓN
+    # =======================
+    def __init__(self, timeout: Optional[float] = None, label: str = "generación"):
+        """
+        :param timeout: Segundos máximos desde la creación (None = sin plazo, solo cancelación manual)
+        :param label: Nombre para los logs
+        """
+        self.label = label
+        self.created_at = time.time()
+        self.deadline = self.created_at + timeout if timeout is not None else None
+        self._cancelled = threading.Event()
+        self._reason = None
+
+    # =======================
+    # 2.2 ESTADO Y CANCELACIÓN
+    # =======================
+    def cancel(self, reason: str = "cancelada"):
+        """Marca la generación como cancelada (idempotente)"""
+        if not self._cancelled.is_set():
+            self._reason = reason
+            self._cancelled.set()
+            logger.info(f"🛑 {self.label.capitalize()} {reason} tras {time.time() - self.created_at:.2f}s")
+
+    def is_cancelled(self) -> bool:
+        """True si se canceló o se superó el plazo"""
+        if self._cancelled.is_set():
+            return True
+        if self.deadline is not None and time.time() >= self.deadline:
+            self.cancel("fuera de plazo")
+            return True
+        return False
+
+    def remaining(self) -> Optional[float]:
+        """Segundos restantes hasta el plazo (None si no tiene)"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.time())
+
+    @property
+    def reason(self) -> Optional[str]:
+        return self._reason
+
+    # =======================
+    # 2.3 INTEGRACIÓN CON LLAMA_CPP
+    # =======================
+    def __call__(self, input_ids, logits) -> bool:
+        """Firma de stopping_criteria: devuelve True para detener la generación"""
+        return self.is_cancelled()
+
+    def stopping_criteria(self) -> StoppingCriteriaList:
+        """Lista de criterios lista para pasar a Llama.__call__"""
+        return StoppingCriteriaList([self])
+
+# ===============================================
+# ESTADO: PUNTUALMENTE OBEDIENTE (se calla cuando se le dice)
+# ÚLTIMA ACTUALIZACIÓN: Cuando el hilo de hace 34 segundos dejó de pisar al siguiente turno
+# FILOSOFÍA: "Si ya nadie escucha, tampoco hace falta terminar la frase."
+# ===============================================
+#
+#           THIS IS THE DEADLINE WAY...
+#           (pensar con fecha de caducidad)
+#
+# ===============================================
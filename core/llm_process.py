@@ -0,0 +1,496 @@
+# ===============================================
+# LLM PROCESS - Inferencia Aislada en un Proceso Propio para TARS-BSK
+# Objetivo: Que llama.cpp piense en otro proceso y el micrófono no se entere
+# Dependencias: llama_cpp, multiprocessing.connection, multiprocessing.shared_memory
+# Advertencia: Si el modelo revienta, revienta solo. El resto de TARS sigue con su sarcasmo.
+# ===============================================
+#
+# Protocolo (socket Unix autenticado + un bloque de memoria compartida):
+#
+#   memoria compartida: [0] bandera de cancelación | [1 .. 1+N) prompt | [1+N ..) salida
+#
+#   padre → hijo: (comando, argumentos)          hijo → padre:
+#     "generate"  {prompt_len | prompt, kwargs}    ("chunk", offset, length) | ("chunk_inline", texto) ... ("done", info)
+#     "reset" / "warm" / "prepare" / "prefix_*"    ("ok", resultado) | ("error", mensaje)
+#     "embed"     {text}                           ("ok", lista de floats)
+#     "shutdown"
+#
+# El hijo se lanza como intérprete nuevo (no fork): no hereda hilos, locks ni el
+# __main__ de tars_core.py.
+# ===============================================
+
+# ===============================================
+# 1. CONFIGURACIÓN INICIAL Y DEPENDENCIAS
+# ===============================================
+import argparse
+import atexit
+import json
+import logging
+import os
+import secrets
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger("TARS.LLMProcess")
+
+CANCEL_FLAG = 0
+PROMPT_OFFSET = 1
+
+
+class LlamaProcessError(RuntimeError):
+    """El proceso de inferencia no responde, se cerró o devolvió un error"""
+
+
+# ===============================================
+# 2. LADO PADRE: PROXY COMPATIBLE CON LLAMA
+# ===============================================
+class RemoteLlama:
+    """
+    Sustituto de llama_cpp.Llama que delega la inferencia en un proceso hijo.
+
+    - tokenize/detokenize/token_bos: locales, con un Llama vocab_only (sin pesos)
+    - __call__: generación remota (normal o stream); los stopping_criteria se
+      evalúan aquí por fragmento y la cancelación viaja por memoria compartida
+    - Caída del hijo: LlamaProcessError y, si restart_on_crash, relanzado en la siguiente petición
+    """
+
+    # =======================
+    # 2.1 INICIALIZACIÓN Y ARRANQUE
+    # =======================
+    def __init__(self, model_kwargs: dict, cpus: Optional[list] = None, nice: int = 0,
+                 restart_on_crash: bool = True, buffer_kb: int = 64, startup_timeout: float = 120.0,
+                 prefix_cache_mb: int = 0, label: str = "llm"):
+        """
+        :param model_kwargs: Argumentos de Llama(...) para el hijo
+        :param cpus: Núcleos a los que se fija el hijo (None = sin fijar)
+        :param nice: Niceness del hijo (positivo = menos prioridad que el audio)
+        :param restart_on_crash: Relanzar el hijo automáticamente si muere
+        :param buffer_kb: Tamaño de cada zona (prompt y salida) de la memoria compartida
+        :param startup_timeout: Segundos máximos para cargar el modelo en el hijo
+        :param prefix_cache_mb: RAM para la caché de prefijos del hijo (0 = sin caché)
+        :param label: Nombre para logs y para el bloque de memoria
+        """
+        self.model_kwargs = dict(model_kwargs)
+        self.cpus = cpus
+        self.nice = nice
+        self.restart_on_crash = restart_on_crash
+        self.buffer_size = buffer_kb * 1024
+        self.startup_timeout = startup_timeout
+        self.prefix_cache_mb = prefix_cache_mb
+        self.label = label
+
+        self._lock = threading.RLock()
+        self._process: Optional[subprocess.Popen] = None
+        self._conn = None
+        self._shm: Optional[SharedMemory] = None
+        self._vocab = None
+        self.restarts = 0
+
+    def start(self) -> "RemoteLlama":
+        """Carga el vocabulario local y lanza el hijo (bloquea hasta que el modelo está cargado)"""
+        from llama_cpp import Llama
+
+        if self._vocab is None:
+            self._vocab = Llama(model_path=self.model_kwargs["model_path"], vocab_only=True, verbose=False)
+
+        with self._lock:
+            self._spawn()
+        atexit.register(self.close)
+        return self
+
+    def _spawn(self):
+        start = time.time()
+        self._shm = SharedMemory(create=True, size=1 + 2 * self.buffer_size)
+        self._shm.buf[CANCEL_FLAG] = 0
+
+        address = os.path.join(tempfile.gettempdir(), f"tars_{self.label}_{os.getpid()}_{secrets.token_hex(4)}.sock")
+        authkey = secrets.token_bytes(16)
+        config = {
+            "address": address,
+            "shm_name": self._shm.name,
+            "buffer_size": self.buffer_size,
+            "model_kwargs": self.model_kwargs,
+            "cpus": self.cpus,
+            "nice": self.nice,
+            "prefix_cache_mb": self.prefix_cache_mb,
+        }
+
+        env = dict(os.environ, TARS_LLM_AUTHKEY=authkey.hex())
+        self._process = subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), "--config", json.dumps(config)],
+            env=env
+        )
+
+        # El hijo escucha antes de cargar el modelo: conectar con reintentos
+        deadline = time.time() + 10.0
+        while True:
+            try:
+                self._conn = Client(address, family="AF_UNIX", authkey=authkey)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if self._process.poll() is not None or time.time() > deadline:
+                    self._cleanup()
+                    raise LlamaProcessError(f"El proceso '{self.label}' no arrancó")
+                time.sleep(0.05)
+
+        # Esperar a que el modelo esté cargado sin bloquearse si el hijo muere
+        status, info = self._receive(timeout=self.startup_timeout)
+        if status != "ready":
+            self._cleanup()
+            raise LlamaProcessError(f"El proceso '{self.label}' falló al cargar el modelo: {info}")
+
+        logger.info(f"🧩 Proceso de inferencia '{self.label}' listo (PID {self._process.pid}, "
+                    f"núcleos {self.cpus or 'todos'}) en {time.time() - start:.2f}s")
+
+    def _ensure_running(self):
+        if self._process is not None and self._process.poll() is None and self._conn is not None:
+            return
+        if self._process is None or not self.restart_on_crash:
+            raise LlamaProcessError(f"El proceso '{self.label}' no está en marcha")
+
+        self.restarts += 1
+        logger.warning(f"♻️ Relanzando proceso de inferencia '{self.label}' (reinicio #{self.restarts})")
+        self._cleanup()
+        self._spawn()
+
+    # =======================
+    # 2.2 TRANSPORTE
+    # =======================
+    def _receive(self, timeout: Optional[float] = None):
+        """Recibe un mensaje comprobando periódicamente que el hijo sigue vivo"""
+        waited = 0.0
+        while True:
+            try:
+                if self._conn.poll(0.25):
+                    return self._conn.recv()
+            except (EOFError, OSError) as e:
+                self._mark_dead()
+                raise LlamaProcessError(f"Conexión con '{self.label}' perdida: {e}")
+
+            waited += 0.25
+            if self._process.poll() is not None:
+                self._mark_dead()
+                raise LlamaProcessError(f"El proceso '{self.label}' terminó (código {self._process.returncode})")
+            if timeout is not None and waited >= timeout:
+                raise LlamaProcessError(f"El proceso '{self.label}' no respondió en {timeout:.0f}s")
+
+    def _request(self, command: str, **kwargs):
+        """Petición simple (respuesta única)"""
+        with self._lock:
+            self._ensure_running()
+            try:
+                self._conn.send((command, kwargs))
+            except (OSError, ValueError) as e:
+                self._mark_dead()
+                raise LlamaProcessError(f"No se pudo enviar '{command}' a '{self.label}': {e}")
+
+            status, result = self._receive()
+            if status == "error":
+                raise LlamaProcessError(result)
+            return result
+
+    def _mark_dead(self):
+        logger.error(f"💥 Proceso de inferencia '{self.label}' caído")
+        try:
+            if self._conn is not None:
+                self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    # =======================
+    # 2.3 API COMPATIBLE CON LLAMA
+    # =======================
+    def tokenize(self, text: bytes, add_bos: bool = True, special: bool = False):
+        return self._vocab.tokenize(text, add_bos=add_bos, special=special)
+
+    def detokenize(self, tokens) -> bytes:
+        return self._vocab.detokenize(tokens)
+
+    def token_bos(self) -> int:
+        return self._vocab.token_bos()
+
+    def reset(self):
+        self._request("reset")
+
+    def __call__(self, prompt: str, stopping_criteria=None, stream: bool = False, **kwargs):
+        chunks = self._stream(prompt, stopping_criteria, kwargs)
+        if stream:
+            return chunks
+
+        text = ""
+        finish_reason = None
+        for chunk in chunks:
+            choice = chunk["choices"][0]
+            text += choice["text"]
+            finish_reason = choice.get("finish_reason") or finish_reason
+        return {"choices": [{"text": text, "index": 0, "finish_reason": finish_reason}]}
+
+    def _stream(self, prompt: str, stopping_criteria, kwargs: dict):
+        """Generador de fragmentos; mantiene el lock mientras dura la generación"""
+        with self._lock:
+            self._ensure_running()
+            shm = self._shm.buf
+            shm[CANCEL_FLAG] = 0
+
+            request = {"kwargs": kwargs}
+            encoded = prompt.encode("utf-8")
+            if len(encoded) <= self.buffer_size:
+                shm[PROMPT_OFFSET:PROMPT_OFFSET + len(encoded)] = encoded
+                request["prompt_len"] = len(encoded)
+            else:
+                request["prompt"] = prompt
+
+            try:
+                self._conn.send(("generate", request))
+            except (OSError, ValueError) as e:
+                self._mark_dead()
+                raise LlamaProcessError(f"No se pudo enviar la generación a '{self.label}': {e}")
+
+            output_offset = PROMPT_OFFSET + self.buffer_size
+            finished = False
+            try:
+                while True:
+                    message = self._receive()
+                    kind = message[0]
+                    if kind == "done":
+                        finished = True
+                        yield {"choices": [{"text": "", "index": 0, "finish_reason": message[1].get("finish_reason")}]}
+                        return
+                    if kind == "error":
+                        finished = True
+                        raise LlamaProcessError(message[1])
+
+                    if kind == "chunk":
+                        _, offset, length = message
+                        text = bytes(shm[output_offset + offset:output_offset + offset + length]).decode("utf-8", errors="ignore")
+                    else:
+                        text = message[1]
+
+                    # Criterios de parada del padre (cancelación, sondas): se aplican por fragmento
+                    if stopping_criteria is not None and shm[CANCEL_FLAG] == 0 and stopping_criteria(None, None):
+                        shm[CANCEL_FLAG] = 1
+
+                    yield {"choices": [{"text": text, "index": 0, "finish_reason": None}]}
+            finally:
+                if not finished and self._conn is not None:
+                    # El consumidor abandonó el stream: cancelar y vaciar hasta "done" para no desincronizar
+                    shm[CANCEL_FLAG] = 1
+                    try:
+                        while self._receive(timeout=30.0)[0] not in ("done", "error"):
+                            pass
+                    except LlamaProcessError:
+                        pass
+
+    # =======================
+    # 2.4 SERVICIOS EXTRA DEL HIJO
+    # =======================
+    def encoder(self, model_path: str) -> "RemoteEncoder":
+        """Encoder SentenceTransformer alojado en el hijo (sustituye a SemanticEngine.model)"""
+        self._request("load_encoder", model_path=model_path)
+        return RemoteEncoder(self)
+
+    def close(self):
+        """Cierra el hijo y libera la memoria compartida (idempotente)"""
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._conn.send(("shutdown", {}))
+                except Exception:
+                    pass
+            self._cleanup()
+
+    def _cleanup(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+        if self._process is not None and self._process.poll() is None:
+            try:
+                self._process.wait(timeout=2.0)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        if self._shm is not None:
+            try:
+                self._shm.close()
+                self._shm.unlink()
+            except Exception:
+                pass
+            self._shm = None
+
+
+class RemotePrefixCache:
+    """Misma interfaz que PrefixStateCache; los snapshots viven en el proceso hijo"""
+
+    def __init__(self, remote: RemoteLlama):
+        self.remote = remote
+
+    def warm(self, prefix_text: str) -> bool:
+        return self.remote._request("warm", text=prefix_text)
+
+    def prepare(self, prompt: str) -> int:
+        return self.remote._request("prepare", text=prompt)
+
+    def clear(self):
+        self.remote._request("prefix_clear")
+
+    def get_stats(self) -> dict:
+        return self.remote._request("prefix_stats")
+
+
+class RemoteEncoder:
+    """Sustituto de SentenceTransformer con encode() remoto"""
+
+    def __init__(self, remote: RemoteLlama):
+        self.remote = remote
+
+    def encode(self, text: str):
+        return np.asarray(self.remote._request("embed", text=text), dtype=np.float32)
+
+
+# ===============================================
+# 3. LADO HIJO: SERVIDOR DE INFERENCIA
+# ===============================================
+def _serve(config: dict):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if config.get("cpus"):
+        try:
+            os.sched_setaffinity(0, set(config["cpus"]))
+        except (AttributeError, OSError) as e:
+            logger.warning(f"⚠️ No se pudo fijar el proceso a los núcleos {config['cpus']}: {e}")
+    if config.get("nice"):
+        os.nice(config["nice"])
+
+    shm = SharedMemory(name=config["shm_name"])
+    try:
+        # El bloque es del padre: que el resource_tracker del hijo no lo borre al salir
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    buffer_size = config["buffer_size"]
+    output_offset = PROMPT_OFFSET + buffer_size
+
+    listener = Listener(config["address"], family="AF_UNIX", authkey=bytes.fromhex(os.environ["TARS_LLM_AUTHKEY"]))
+    conn = listener.accept()
+    listener.close()
+
+    try:
+        from llama_cpp import Llama
+        llm = Llama(**config["model_kwargs"])
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+
+    prefix_cache = None
+    if config.get("prefix_cache_mb"):
+        from prefix_cache import PrefixStateCache
+        from token_budget import TokenBudget
+        token_budget = TokenBudget(llm, n_ctx=config["model_kwargs"].get("n_ctx", 512))
+        prefix_cache = PrefixStateCache(llm, token_budget, max_bytes=config["prefix_cache_mb"] * 1024 * 1024)
+
+    encoder = None
+    conn.send(("ready", {"pid": os.getpid()}))
+
+    def cancelled(input_ids, logits) -> bool:
+        return shm.buf[CANCEL_FLAG] == 1
+
+    while True:
+        try:
+            command, args = conn.recv()
+        except (EOFError, OSError):
+            break  # El padre se fue: no quedarse huérfano
+
+        try:
+            if command == "shutdown":
+                break
+
+            elif command == "generate":
+                if "prompt" in args:
+                    prompt = args["prompt"]
+                else:
+                    prompt = bytes(shm.buf[PROMPT_OFFSET:PROMPT_OFFSET + args["prompt_len"]]).decode("utf-8")
+
+                written = 0
+                finish_reason = None
+                for chunk in llm(prompt, stream=True, stopping_criteria=cancelled, **args["kwargs"]):
+                    choice = chunk["choices"][0]
+                    finish_reason = choice.get("finish_reason") or finish_reason
+                    data = choice.get("text", "").encode("utf-8")
+                    if not data:
+                        continue
+                    if written + len(data) <= buffer_size:
+                        shm.buf[output_offset + written:output_offset + written + len(data)] = data
+                        conn.send(("chunk", written, len(data)))
+                        written += len(data)
+                    else:
+                        conn.send(("chunk_inline", data.decode("utf-8", errors="ignore")))
+                conn.send(("done", {"finish_reason": finish_reason}))
+
+            elif command == "reset":
+                llm.reset()
+                conn.send(("ok", None))
+
+            elif command == "warm":
+                conn.send(("ok", prefix_cache.warm(args["text"]) if prefix_cache else False))
+
+            elif command == "prepare":
+                conn.send(("ok", prefix_cache.prepare(args["text"]) if prefix_cache else 0))
+
+            elif command == "prefix_clear":
+                if prefix_cache:
+                    prefix_cache.clear()
+                conn.send(("ok", None))
+
+            elif command == "prefix_stats":
+                conn.send(("ok", prefix_cache.get_stats() if prefix_cache else {}))
+
+            elif command == "load_encoder":
+                if encoder is None:
+                    from sentence_transformers import SentenceTransformer
+                    encoder = SentenceTransformer(args["model_path"])
+                conn.send(("ok", None))
+
+            elif command == "embed":
+                conn.send(("ok", encoder.encode(args["text"]).tolist()))
+
+            else:
+                conn.send(("error", f"Comando desconocido: {command}"))
+
+        except Exception as e:
+            logger.error(f"❌ Error en el proceso de inferencia ({command}): {e}")
+            try:
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+            except Exception:
+                break
+
+    shm.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Proceso de inferencia aislado de TARS-BSK")
+    parser.add_argument("--config", required=True, help="Configuración JSON del proceso")
+    _serve(json.loads(parser.parse_args().config))
+
+# ===============================================
+# ESTADO: PROCESALMENTE INDEPENDIENTE (vive en su propia casa)
+# ÚLTIMA ACTUALIZACIÓN: Cuando el GIL dejó de decidir si el micrófono escuchaba o el modelo pensaba
+# FILOSOFÍA: "Pensar en otra habitación. Escuchar en esta."
+# ===============================================
+#
+#           THIS IS THE ISOLATION WAY...
+#           (si me caigo, me caigo solo)
+#
+# ===============================================
@@ -0,0 +1,234 @@
+# ===============================================
+# LLM WORKER - Actor Único de Inferencia para TARS-BSK
+# Objetivo: Que solo un hilo toque el Llama, y que la conversación pase delante de todo lo demás
+# Dependencias: threading, heapq, concurrent.futures (solo por el Future)
+# Advertencia: Una cola sin límite es una promesa de latencia que nadie puede cumplir.
+# ===============================================
+
+# ===============================================
+# 1. CONFIGURACIÓN INICIAL Y DEPENDENCIAS
+# ===============================================
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger("TARS.LLMWorker")
+
+# Prioridades: número más bajo = se atiende antes
+PRIORITY_INTERACTIVE = 0    # Turno de conversación con alguien esperando
+PRIORITY_BACKGROUND = 10    # Precarga, resúmenes, trabajo que nadie está escuchando
+
+
+class LLMQueueFull(RuntimeError):
+    """La cola de inferencia está llena y la petición no tiene prioridad para desplazar a otra"""
+
+
+# ===============================================
+# 2. TRABAJO DE INFERENCIA
+# ===============================================
+class _LLMJob:
+    """Petición encolada: función a ejecutar con el Llama y sus tiempos"""
+
+    def __init__(self, fn: Callable[[Any], Any], priority: int, label: str, cancel_token=None):
+        self.fn = fn
+        self.priority = priority
+        self.label = label
+        self.cancel_token = cancel_token
+        self.future: Future = Future()
+        self.queued_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def queue_wait(self) -> float:
+        return (self.started_at or time.time()) - self.queued_at
+
+    @property
+    def compute_time(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def is_cancelled(self) -> bool:
+        return self.cancel_token is not None and self.cancel_token.is_cancelled()
+
+
+# ===============================================
+# 3. CLASE PRINCIPAL LLMWORKER
+# ===============================================
+class LLMWorker:
+    """
+    Hilo dedicado que es el único que llama al Llama.
+
+    - submit(): encola fn(llm) con prioridad y devuelve un Future
+    - run(): submit + espera del resultado (para hilos que ya esperaban a la generación)
+    - Backpressure: con la cola llena, una petición desplaza a la de peor prioridad
+      o se rechaza con LLMQueueFull
+    - Estadísticas separadas de espera en cola y tiempo de cómputo
+    """
+
+    # =======================
+    # 3.1 INICIALIZACIÓN
+    # =======================
+    def __init__(self, llm, max_queue: int = 4, history_size: int = 50):
+        """
+        :param llm: Instancia Llama (a partir de aquí, solo la toca este worker)
+        :param max_queue: Peticiones pendientes máximas (sin contar la que está en curso)
+        :param history_size: Trabajos recientes usados para las estadísticas
+        """
+        self.llm = llm
+        self.max_queue = max_queue
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._current: Optional[_LLMJob] = None
+        self.history = deque(maxlen=history_size)
+        self.processed = 0
+        self.rejected = 0
+        self.dropped = 0
+
+    def start(self):
+        """Arranca el hilo de inferencia"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="TARS-LLMWorker", daemon=True)
+        self._thread.start()
+        logger.info(f"🧵 Worker de inferencia iniciado (cola máxima: {self.max_queue})")
+
+    def stop(self, timeout: float = 2.0):
+        """Detiene el worker; las peticiones pendientes se cancelan"""
+        with self._condition:
+            self._running = False
+            pending = [job for _, _, job in self._heap]
+            self._heap.clear()
+            self._condition.notify_all()
+
+        for job in pending:
+            job.future.cancel()
+        if self._current is not None and self._current.cancel_token is not None:
+            self._current.cancel_token.cancel("por parada del worker")
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        logger.info("🧵 Worker de inferencia detenido")
+
+    # =======================
+    # 3.2 ENCOLADO CON BACKPRESSURE
+    # =======================
+    def submit(self, fn: Callable[[Any], Any], priority: int = PRIORITY_INTERACTIVE,
+               label: str = "inferencia", cancel_token=None) -> Future:
+        """
+        Encola fn(llm) y devuelve un Future con su resultado.
+        Si el token se cancela antes de empezar, el Future queda cancelado.
+        """
+        job = _LLMJob(fn, priority, label, cancel_token)
+
+        with self._condition:
+            if not self._running:
+                raise RuntimeError("El worker de inferencia no está en marcha")
+
+            if len(self._heap) >= self.max_queue:
+                worst = max(self._heap, key=lambda entry: (entry[0], entry[1]))
+                if worst[0] <= priority:
+                    self.rejected += 1
+                    logger.warning(f"🚫 Cola de inferencia llena ({len(self._heap)}): rechazada '{label}'")
+                    raise LLMQueueFull(f"Cola de inferencia llena, rechazada '{label}'")
+
+                # La nueva petición es más urgente: se descarta la menos prioritaria
+                self._heap.remove(worst)
+                heapq.heapify(self._heap)
+                self.dropped += 1
+                dropped_job = worst[2]
+                dropped_job.future.cancel()
+                logger.warning(f"🗑️ Cola llena: descartada '{dropped_job.label}' en favor de '{label}'")
+
+            heapq.heappush(self._heap, (priority, next(self._sequence), job))
+            self._condition.notify()
+
+        return job.future
+
+    def run(self, fn: Callable[[Any], Any], priority: int = PRIORITY_INTERACTIVE,
+            label: str = "inferencia", cancel_token=None) -> Any:
+        """Encola y espera el resultado (propaga excepciones y CancelledError)"""
+        return self.submit(fn, priority, label, cancel_token).result()
+
+    @property
+    def queue_depth(self) -> int:
+        with self._condition:
+            return len(self._heap)
+
+    # =======================
+    # 3.3 BUCLE DEL WORKER
+    # =======================
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not self._heap:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                _, _, job = heapq.heappop(self._heap)
+
+            if job.is_cancelled() or not job.future.set_running_or_notify_cancel():
+                logger.info(f"🛑 '{job.label}' cancelada antes de empezar ({job.queue_wait:.2f}s en cola)")
+                job.future.cancel()
+                continue
+
+            self._current = job
+            job.started_at = time.time()
+            try:
+                result = job.fn(self.llm)
+            except BaseException as e:
+                job.finished_at = time.time()
+                job.future.set_exception(e)
+            else:
+                job.finished_at = time.time()
+                job.future.set_result(result)
+            finally:
+                self._current = None
+
+            self.processed += 1
+            self.history.append((job.priority, job.queue_wait, job.compute_time))
+            logger.info(f"⏱️ LLM '{job.label}': cola {job.queue_wait:.2f}s, cómputo {job.compute_time:.2f}s")
+
+    # =======================
+    # 3.4 ESTADÍSTICAS
+    # =======================
+    def get_stats(self) -> dict:
+        """Espera en cola y cómputo por separado (medias y máximos de los trabajos recientes)"""
+        waits = [wait for _, wait, _ in self.history]
+        computes = [compute for _, _, compute in self.history]
+        interactive_waits = [wait for priority, wait, _ in self.history if priority <= PRIORITY_INTERACTIVE]
+
+        def avg(values):
+            return sum(values) / len(values) if values else 0.0
+
+        return {
+            "queue_depth": self.queue_depth,
+            "processed": self.processed,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "avg_queue_wait": avg(waits),
+            "max_queue_wait": max(waits, default=0.0),
+            "avg_interactive_wait": avg(interactive_waits),
+            "avg_compute": avg(computes),
+            "max_compute": max(computes, default=0.0),
+        }
+
+# ===============================================
+# ESTADO: DISCIPLINADAMENTE SECUENCIAL (un Llama, un hilo, una cola)
+# ÚLTIMA ACTUALIZACIÓN: Cuando los "broadcasting errors" se quedaron sin hilos con los que chocar
+# FILOSOFÍA: "Primero quien está hablando conmigo. Los demás, que cojan número."
+# ===============================================
+#
+#           THIS IS THE QUEUE WAY...
+#           (uno a uno, y los urgentes primero)
+#
+# ===============================================
@@ -0,0 +1,238 @@
+# ===============================================
+# MODEL ROUTER - Enrutado por Niveles de Modelo para TARS-BSK
+# Objetivo: No despertar a Phi-3 para contestar "hola, qué tal"
+# Dependencias: llama_cpp (Llama con mmap), TokenBudget, RemoteLlama opcional (proceso aislado)
+# Advertencia: El modelo pequeño es rápido, no sabio. Se nota. Por eso solo saluda.
+# ===============================================
+
+# ===============================================
+# 1. CONFIGURACIÓN INICIAL Y DEPENDENCIAS
+# ===============================================
+import logging
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, Optional
+
+from llama_cpp import Llama
+from token_budget import TokenBudget
+from llm_process import RemoteLlama
+
+logger = logging.getLogger("TARS.ModelRouter")
+
+TIER_FAST = "fast"
+TIER_FULL = "full"
+
+# Intenciones que piden razonamiento: siempre al modelo completo
+DEEP_INTENTIONS = {"aprender", "profundizar", "comparar", "opinion", "preocupacion"}
+
+# ===============================================
+# 2. NIVEL DE MODELO (CARGA PEREZOSA)
+# ===============================================
+class ModelTier:
+    """Un GGUF cargado bajo demanda (mmap) con su presupuesto de tokens y sus latencias"""
+
+    def __init__(self, name: str, model_path: Path, n_ctx: int, n_threads: int = 3,
+                 n_batch: int = 64, history_size: int = 50, process_options: Optional[dict] = None):
+        """
+        :param process_options: Si se indica, el modelo vive en un proceso aparte (kwargs de RemoteLlama)
+        """
+        self.name = name
+        self.model_path = Path(model_path)
+        self.n_ctx = n_ctx
+        self.n_threads = n_threads
+        self.n_batch = n_batch
+        self.process_options = process_options
+        self.llm: Optional[Llama] = None
+        self.token_budget: Optional[TokenBudget] = None
+        self.failed = False
+        self.load_time = 0.0
+        self.latencies = deque(maxlen=history_size)
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        """True si el modelo está cargado o se puede cargar"""
+        return not self.failed and (self.llm is not None or self.model_path.exists())
+
+    def load(self) -> Llama:
+        """Carga el modelo si aún no lo está (idempotente, thread-safe)"""
+        with self._lock:
+            if self.llm is not None:
+                return self.llm
+            if not self.model_path.exists():
+                self.failed = True
+                raise FileNotFoundError(f"Modelo '{self.name}' no encontrado en: {self.model_path}")
+
+            logger.info(f"✅ Cargando modelo '{self.name}' desde {self.model_path}...")
+            start = time.time()
+            model_kwargs = dict(
+                model_path=str(self.model_path),
+                n_ctx=self.n_ctx,
+                n_threads=self.n_threads,  # 3 hilos es óptimo para RPi5 (deja 1 libre)
+                n_batch=self.n_batch,
+                f16_kv=True,
+                n_gpu_layers=0,
+                use_mmap=True,             # Pesos mapeados: el kernel pagina solo lo que se usa
+                use_mlock=False,
+                seed=-1,
+                logits_all=False,
+                verbose=False
+            )
+            try:
+                if self.process_options is not None:
+                    # Inferencia en proceso aparte: el GIL del proceso principal queda para el audio
+                    self.llm = RemoteLlama(model_kwargs, label=self.name, **self.process_options).start()
+                else:
+                    self.llm = Llama(**model_kwargs)
+            except Exception:
+                self.failed = True
+                raise
+
+            self.token_budget = TokenBudget(self.llm, n_ctx=self.n_ctx)
+            self.load_time = time.time() - start
+            logger.info(f"✅ Modelo '{self.name}' cargado en {self.load_time:.2f} segundos")
+            return self.llm
+
+    @property
+    def remote(self) -> bool:
+        return isinstance(self.llm, RemoteLlama)
+
+    def close(self):
+        """Libera el proceso de inferencia si el modelo vive fuera"""
+        if self.remote:
+            self.llm.close()
+
+    def record(self, seconds: float):
+        self.latencies.append(seconds)
+
+    def expected_latency(self) -> Optional[float]:
+        """Mediana de las últimas generaciones (None si aún no hay datos)"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[len(ordered) // 2]
+
+    def get_stats(self) -> dict:
+        ordered = sorted(self.latencies)
+
+        def percentile(p):
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+        return {
+            "loaded": self.llm is not None,
+            "remote": self.remote,
+            "restarts": self.llm.restarts if self.remote else 0,
+            "load_time": self.load_time,
+            "turns": len(ordered),
+            "avg": sum(ordered) / len(ordered) if ordered else 0.0,
+            "p50": percentile(0.5),
+            "p95": percentile(0.95),
+        }
+
+# ===============================================
+# 3. CLASE PRINCIPAL MODELROUTER
+# ===============================================
+class ModelRouter:
+    """
+    Decide qué modelo atiende cada turno a partir del análisis de chat():
+
+    - fast: turnos cortos y sociales, acuses de recibo
+    - full: conocimiento, continuaciones e intenciones que piden razonamiento,
+            o cualquier turno si el modelo completo cumple el objetivo de latencia
+    """
+
+    # =======================
+    # 3.1 INICIALIZACIÓN
+    # =======================
+    def __init__(self, full_tier: ModelTier, fast_tier: Optional[ModelTier] = None,
+                 simple_max_words: int = 6, latency_target: float = 4.0):
+        """
+        :param full_tier: Modelo principal (Phi-3)
+        :param fast_tier: Modelo pequeño opcional para turnos simples
+        :param simple_max_words: Turnos con menos palabras se consideran simples
+        :param latency_target: Segundos objetivo por respuesta; si el modelo completo lo supera,
+                               los turnos intermedios sin carga de conocimiento van al rápido
+        """
+        self.tiers: Dict[str, ModelTier] = {TIER_FULL: full_tier}
+        if fast_tier is not None:
+            self.tiers[TIER_FAST] = fast_tier
+        self.simple_max_words = simple_max_words
+        self.latency_target = latency_target
+
+    def tier(self, name: str) -> ModelTier:
+        """Nivel pedido si está disponible; si no, el completo"""
+        tier = self.tiers.get(name)
+        if tier is None or not tier.available:
+            return self.tiers[TIER_FULL]
+        return tier
+
+    def get_llm(self, name: str) -> Llama:
+        """Llama del nivel (carga perezosa). Si el rápido falla, cae al completo"""
+        tier = self.tier(name)
+        try:
+            return tier.load()
+        except Exception as e:
+            if tier.name == TIER_FULL:
+                raise
+            logger.warning(f"⚠️ Modelo '{tier.name}' no disponible ({e}), usando '{TIER_FULL}'")
+            return self.tiers[TIER_FULL].load()
+
+    def token_budget(self, name: str) -> TokenBudget:
+        """Presupuesto del nivel que realmente atenderá (o el completo si aún no se cargó)"""
+        tier = self.tier(name)
+        return tier.token_budget or self.tiers[TIER_FULL].token_budget
+
+    # =======================
+    # 3.2 DECISIÓN DE ENRUTADO
+    # =======================
+    def route(self, user_input: str, analysis: dict) -> str:
+        """Nombre del nivel que debe atender este turno"""
+        if self.tier(TIER_FAST).name != TIER_FAST:
+            return TIER_FULL
+
+        if analysis.get("is_continuation") or analysis.get("is_knowledge_query") or analysis.get("is_memory_query"):
+            return TIER_FULL
+
+        intentions = {i.get("intention") for i in analysis.get("intentions", [])}
+        if intentions & DEEP_INTENTIONS:
+            return TIER_FULL
+
+        if len(user_input.strip().split()) < self.simple_max_words:
+            return TIER_FAST
+
+        # Turno intermedio sin señales de conocimiento: decide el objetivo de latencia
+        expected = self.tiers[TIER_FULL].expected_latency()
+        if expected is not None and expected > self.latency_target:
+            logger.info(f"⚡ Modelo completo fuera de objetivo ({expected:.1f}s > {self.latency_target:.1f}s)")
+            return TIER_FAST
+
+        return TIER_FULL
+
+    # =======================
+    # 3.3 ESTADÍSTICAS
+    # =======================
+    def record(self, name: str, seconds: float):
+        """Registra la latencia de generación del nivel que atendió"""
+        self.tier(name).record(seconds)
+
+    def get_stats(self) -> dict:
+        return {name: tier.get_stats() for name, tier in self.tiers.items()}
+
+    def close(self):
+        for tier in self.tiers.values():
+            tier.close()
+
+# ===============================================
+# ESTADO: JERÁRQUICAMENTE PRÁCTICO (el becario saluda, el jefe piensa)
+# ÚLTIMA ACTUALIZACIÓN: Cuando "hola" dejó de costar 3.8GB de pesos y 6 segundos
+# FILOSOFÍA: "No todas las preguntas merecen 3.800 millones de parámetros."
+# ===============================================
+#
+#           THIS IS THE ROUTING WAY...
+#           (cada turno al cerebro que se merece)
+#
+# ===============================================
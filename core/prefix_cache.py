@@ -0,0 +1,214 @@
+# ===============================================
+# PREFIX CACHE - Memoria a Corto Plazo del KV-Cache para TARS-BSK
+# Objetivo: No volver a leer "Sarcasmo clínico. Sin compasión..." 400 veces al día
+# Dependencias: llama_cpp (API pública: save_state/load_state/n_tokens) y un presupuesto de RAM que no negocia
+# Advertencia: Cada token del preámbulo pesa ~400KB en KV. La nostalgia no es gratis.
+# ===============================================
+
+# ===============================================
+# 1. CONFIGURACIÓN INICIAL Y DEPENDENCIAS
+# ===============================================
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional, Sequence, Tuple
+
+logger = logging.getLogger("TARS.PrefixCache")
+
+# ===============================================
+# 2. CLASE PRINCIPAL PREFIXSTATECACHE
+# ===============================================
+class PrefixStateCache:
+    """
+    Caché LRU de snapshots del estado de llama (save_state/load_state) indexados
+    por los tokens del prefijo evaluado.
+
+    Antes de cada generación se restaura el snapshot con el prefijo común más
+    largo; llama_cpp reutiliza ese prefijo del KV-cache y solo evalúa el resto
+    del prompt.
+
+    Solo usa la API pública de Llama: qué hay en el KV-cache lo recuerda la propia
+    caché (último prefijo cargado o prompt preparado) y lo acota con llm.n_tokens.
+    Si esa API falta o falla, la caché se desactiva en lugar de romper la generación.
+    """
+
+    # =======================
+    # 2.1 INICIALIZACIÓN
+    # =======================
+    def __init__(self, llm, token_budget, max_bytes: int = 64 * 1024 * 1024, min_prefix_tokens: int = 8):
+        """
+        :param llm: Instancia Llama
+        :param token_budget: TokenBudget para reutilizar la tokenización cacheada
+        :param max_bytes: Presupuesto de RAM para todos los snapshots
+        :param min_prefix_tokens: Prefijo mínimo para que merezca la pena restaurar
+        """
+        self.llm = llm
+        self.token_budget = token_budget
+        self.max_bytes = max_bytes
+        self.min_prefix_tokens = min_prefix_tokens
+        self.entries: "OrderedDict[Tuple[int, ...], object]" = OrderedDict()
+        self.sizes = {}
+        self.hits = 0
+        self.misses = 0
+        self._evaluated: Tuple[int, ...] = ()
+
+        missing = [name for name in ("save_state", "load_state", "n_tokens", "eval", "reset")
+                   if not hasattr(llm, name)]
+        self.enabled = not missing
+        if missing:
+            logger.warning(f"⚠️ Esta versión de llama_cpp no expone {', '.join(missing)}: caché de prefijos desactivada")
+
+    def _disable(self, error: Exception):
+        """Desactiva la caché sin romper la generación (el modelo vuelve a evaluar el prompt entero)"""
+        logger.warning(f"⚠️ Caché de prefijos desactivada: {error}")
+        self.enabled = False
+        self.clear()
+
+    # =======================
+    # 2.2 UTILIDADES DE TOKENS
+    # =======================
+    def _with_bos(self, text: str) -> Tuple[int, ...]:
+        """Tokens tal como los verá llama en el contexto (BOS + texto)"""
+        bos = self.llm.token_bos()
+        return (bos,) + tuple(self.token_budget.tokens(text))
+
+    @staticmethod
+    def _common_prefix(a: Sequence[int], b: Sequence[int]) -> int:
+        """Longitud del prefijo común entre dos secuencias de tokens"""
+        length = 0
+        for x, y in zip(a, b):
+            if x != y:
+                break
+            length += 1
+        return length
+
+    def _evaluated_tokens(self) -> Sequence[int]:
+        """
+        Tokens que ya están en el KV-cache del modelo: lo último que cargamos o preparamos,
+        recortado a llm.n_tokens (un reset() o un contexto más corto lo invalidan)
+        """
+        try:
+            n_tokens = int(self.llm.n_tokens)
+        except Exception:
+            return ()
+        return self._evaluated[:n_tokens]
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self.sizes.values())
+
+    # =======================
+    # 2.3 CAPTURA DE PREFIJOS
+    # =======================
+    def warm(self, prefix_text: str) -> bool:
+        """
+        Evalúa el prefijo y guarda su snapshot si no estaba ya en caché.
+        Devuelve True si se ha creado una entrada nueva.
+        """
+        if not self.enabled or not prefix_text:
+            return False
+
+        key = self._with_bos(prefix_text)
+        if len(key) < self.min_prefix_tokens:
+            return False
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return False
+
+        start = time.time()
+        try:
+            self.llm.reset()
+            self._evaluated = ()
+            self.llm.eval(list(key))
+            self._evaluated = key
+            state = self.llm.save_state()
+        except Exception as e:
+            self._disable(e)
+            return False
+        size = getattr(state, "llama_state_size", 0)
+
+        if size > self.max_bytes:
+            logger.warning(f"⚠️ Snapshot de prefijo demasiado grande ({size / 1e6:.1f}MB), no se guarda")
+            return False
+
+        self.entries[key] = state
+        self.sizes[key] = size
+        self._evict()
+
+        logger.info(f"💾 Prefijo cacheado: {len(key)} tokens, {size / 1e6:.1f}MB en {time.time() - start:.2f}s "
+                    f"({len(self.entries)} entradas, {self.total_bytes / 1e6:.1f}MB)")
+        return True
+
+    def _evict(self):
+        """Expulsa las entradas menos usadas hasta respetar el presupuesto de RAM"""
+        while self.entries and self.total_bytes > self.max_bytes:
+            key, _ = self.entries.popitem(last=False)
+            self.sizes.pop(key, None)
+            logger.info(f"🗑️ Prefijo expulsado de la caché ({len(key)} tokens)")
+
+    # =======================
+    # 2.4 RESTAURACIÓN ANTES DE GENERAR
+    # =======================
+    def prepare(self, prompt: str) -> int:
+        """
+        Deja el KV-cache con el prefijo común más largo para este prompt.
+        Devuelve cuántos tokens del prompt no habrá que re-evaluar.
+        """
+        if not self.enabled:
+            return 0
+
+        tokens = self._with_bos(prompt)
+        current = self._common_prefix(self._evaluated_tokens(), tokens)
+
+        best_key: Optional[Tuple[int, ...]] = None
+        best_len = current
+        for key in self.entries:
+            length = self._common_prefix(key, tokens)
+            if length > best_len and length >= self.min_prefix_tokens:
+                best_key, best_len = key, length
+
+        if best_key is not None:
+            try:
+                self.llm.load_state(self.entries[best_key])
+            except Exception as e:
+                self._disable(e)
+                return 0
+            self.entries.move_to_end(best_key)
+            self.hits += 1
+            logger.info(f"♻️ Prefijo restaurado: {best_len}/{len(tokens)} tokens sin re-evaluar")
+        elif current >= self.min_prefix_tokens:
+            self.hits += 1
+            logger.info(f"♻️ Prefijo ya presente en KV-cache: {current}/{len(tokens)} tokens")
+        else:
+            self.misses += 1
+
+        # Tras generar, el KV-cache empieza por este prompt (llama_cpp conserva el prefijo común)
+        self._evaluated = tokens
+        return best_len
+
+    def clear(self):
+        """Vacía la caché (p.ej. tras recargar el modelo)"""
+        self.entries.clear()
+        self.sizes.clear()
+        self._evaluated = ()
+
+    def get_stats(self) -> dict:
+        """Estadísticas de uso"""
+        return {
+            "enabled": self.enabled,
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+# ===============================================
+# ESTADO: MEMORIOSAMENTE EFICIENTE (pero con límite de RAM)
+# ÚLTIMA ACTUALIZACIÓN: Cuando el preámbulo dejó de costar 3 segundos por turno
+# FILOSOFÍA: "Lo que ya pensé, no lo vuelvo a pensar. Salvo que me echen de la RAM."
+# ===============================================
+#
+#           THIS IS THE PREFIX WAY...
+#           (recordar el principio para llegar antes al final)
+#
+# ===============================================
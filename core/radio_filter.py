@@ -15,40 +15,45 @@ import os
 import random
 import time
 import logging
+
+try:
+    from core.dsp_bank import DSPBank
+except ImportError:  # Importado directamente desde core/ (scripts/spectral_generator.py)
+    from dsp_bank import DSPBank
+
 logger = logging.getLogger("TARS.RadioFilter")
 
 # =======================================================================
 # 2. FUNCIONES DE PROCESAMIENTO DE AUDIO
 # =======================================================================
 
-def apply_radio_filter(input_wav_path: str, output_wav_path: str = None, 
-                       lowcut: int = 200, highcut: int = 3000, 
-                       add_noise: bool = True, noise_level: float = 0.002,
-                       add_compression: bool = True,
-                       mando_effect: bool = True) -> None:
+def radio_filter_buffer(audio: np.ndarray, sample_rate: int,
+                        lowcut: int = 200, highcut: int = 3000,
+                        add_noise: bool = True, noise_level: float = 0.002,
+                        add_compression: bool = True,
+                        mando_effect: bool = True) -> np.ndarray:
     """
-    Applies a radio-style filter to a WAV file with Mandalorian helmet effect.
+    Applies the radio-style filter with Mandalorian helmet effect to an in-memory buffer.
 
     Args:
-        input_wav_path: Path to the input WAV file.
-        output_wav_path: Path to save the filtered WAV file (overwrites input if None).
+        audio: Audio samples (float, mono or multichannel).
+        sample_rate: Sample rate of the audio (Hz).
         lowcut: Lower frequency cutoff for bandpass (Hz).
         highcut: Upper frequency cutoff for bandpass (Hz).
         add_noise: Whether to add subtle noise to simulate radio transmission.
         noise_level: Level of noise to add (0.0 to 0.1 recommended).
         add_compression: Whether to apply dynamic range compression.
         mando_effect: Whether to add Mandalorian helmet resonance effect.
+
+    Returns:
+        Filtered mono audio as float32.
     """
     # =======================================================================
-    # 2.1 CARGA Y PREPARACIÓN DEL AUDIO
+    # 2.1 PREPARACIÓN DEL AUDIO
     # =======================================================================
     start_time = time.time()
 
-    if not os.path.exists(input_wav_path):
-        raise FileNotFoundError(f"Input file not found: {input_wav_path}")
-
-    # Load audio
-    audio, sample_rate = sf.read(input_wav_path)
+    audio = np.asarray(audio, dtype=np.float32)
     
     # Convert to mono if stereo
     if len(audio.shape) > 1 and audio.shape[1] > 1:
@@ -65,16 +70,14 @@ def apply_radio_filter(input_wav_path: str, output_wav_path: str = None,
     # 2.2 APLICACIÓN DE FILTROS DE FRECUENCIA
     # =======================================================================
     
-    # Design bandpass filter
+    # Bandpass filter (Butterworth orden 6, diseñado una vez en el DSPBank)
     # NOTA: Orden 6 es bastante agresivo y puede causar resonancias no deseadas
     # Considerar reducir a orden 4 para un filtrado más suave
-    nyquist = 0.5 * sample_rate
-    low = lowcut / nyquist
-    high = highcut / nyquist
-    b, a = scipy.signal.butter(6, [low, high], btype='band')
+    bank = DSPBank.get(sample_rate, lowcut, highcut)
+    beds = bank.cursor()
     
     # Apply filter with zero-phase to evitar distorsión de fase
-    filtered_audio = scipy.signal.filtfilt(b, a, audio)
+    filtered_audio = scipy.signal.sosfiltfilt(bank.bandpass, audio)
     
     # =======================================================================
     # 2.3 EFECTOS ESPECIALES DE AUDIO (MANDALORIAN)
@@ -82,19 +85,11 @@ def apply_radio_filter(input_wav_path: str, output_wav_path: str = None,
     
     # Add Mandalorian helmet resonance effect
     if mando_effect:
-        # Primary helmet resonance (~ 2kHz)
-        # NOTA: Un Q=10 es alto y crea una resonancia fuerte - exactamente lo que queremos
-        # para un efecto de casco Mandaloriano convincente
-        b_metal1, a_metal1 = scipy.signal.iirpeak(2000 / nyquist, Q=12)  # Aumentado a Q=12 para más resonancia
-        filtered_audio = scipy.signal.lfilter(b_metal1, a_metal1, filtered_audio)
-        
-        # Secondary helmet resonance (~ 1kHz) - gives depth
-        b_metal2, a_metal2 = scipy.signal.iirpeak(1000 / nyquist, Q=10)  # Aumentado a Q=10 para más efecto
-        filtered_audio = scipy.signal.lfilter(b_metal2, a_metal2, filtered_audio)
-        
-        # Añadir una tercera resonancia más alta para simular la reverberación metálica (~ 3kHz)
-        b_metal3, a_metal3 = scipy.signal.iirpeak(3000 / nyquist, Q=8)
-        filtered_audio = scipy.signal.lfilter(b_metal3, a_metal3, filtered_audio)
+        # Resonancias del casco en una sola cascada SOS del DSPBank:
+        # - Primaria (~ 2kHz, Q=12): un Q alto crea una resonancia fuerte - exactamente lo que queremos
+        # - Secundaria (~ 1kHz, Q=10): da profundidad
+        # - Tercera (~ 3kHz, Q=8): simula la reverberación metálica
+        filtered_audio = scipy.signal.sosfilt(bank.resonators, filtered_audio)
         
         # Add echo/reverb effect for helmet cavity simulation
         # Utilizamos múltiples ecos para simular mejor la reverberación dentro del casco
@@ -129,17 +124,9 @@ def apply_radio_filter(input_wav_path: str, output_wav_path: str = None,
     
     # Add subtle noise to simulate radio transmission
     if add_noise and noise_level > 0:
-        # Use colored noise (more low frequency content)
-        white_noise = np.random.normal(0, noise_level, filtered_audio.shape)
-        
-        # Apply lowpass filter to create colored noise (más realista que ruido blanco)
-        b_noise, a_noise = scipy.signal.butter(2, 0.3, btype='low')
-        colored_noise = scipy.signal.lfilter(b_noise, a_noise, white_noise)
-        
-        # Add occasional crackling (like radio interference)
-        # Aumentamos el efecto de interferencia para un sonido más auténtico de casco/radio
-        crackle_points = np.random.random(filtered_audio.shape) > 0.995
-        colored_noise[crackle_points] = colored_noise[crackle_points] * 6.0  # Más pronunciado
+        # Colored noise (lowpass, más realista que ruido blanco) con chasquidos ocasionales
+        # de interferencia: ya viene coloreado en los lechos del DSPBank, solo se escala
+        colored_noise = beds.noise(len(filtered_audio), noise_level)
         
         # Añadir interferencias periódicas simulando problemas de transmisión
         t = np.arange(len(filtered_audio)) / sample_rate
@@ -195,19 +182,15 @@ def apply_radio_filter(input_wav_path: str, output_wav_path: str = None,
     # Modulación principal (más pronunciada para efecto de casco)
     am_effect = 1.0 + 0.05 * np.sin(2 * np.pi * 0.5 * t)  # Aumentado a 0.05
     
-    # Añadir fluctuaciones rápidas aleatorias para simular microfluctuaciones electrónicas
-    random_fluctuations = 1.0 + 0.02 * np.random.randn(len(filtered_audio))
-    # Suavizamos las fluctuaciones para que no sean demasiado abruptas
-    b_smooth, a_smooth = scipy.signal.butter(1, 0.002)
-    random_fluctuations = scipy.signal.filtfilt(b_smooth, a_smooth, random_fluctuations)
+    # Microfluctuaciones electrónicas (ya suavizadas en el lecho para que no sean abruptas)
+    random_fluctuations = beds.fluctuation(len(filtered_audio))
     
     # Combinamos ambos efectos
     combined_effect = am_effect * random_fluctuations
     filtered_audio = filtered_audio * combined_effect
     
     # Add occasional transmission "drop-outs" (very subtle)
-    dropout_mask = np.random.random(filtered_audio.shape) > 0.997
-    filtered_audio[dropout_mask] = filtered_audio[dropout_mask] * 0.5
+    filtered_audio = filtered_audio * beds.dropout(len(filtered_audio))
     
     # Normalización final "inteligente" para preservar el carácter pero evitar distorsión digital
     # Aplicamos una ligera compresión suave final para mantener el carácter
@@ -233,14 +216,174 @@ def apply_radio_filter(input_wav_path: str, output_wav_path: str = None,
     end_time = time.time()
     logger.info(f"🕒 Tiempo de procesamiento de filtro Mandaloriano: {end_time - start_time:.3f}s")
         
-    # =======================================================================
-    # 2.6 GUARDADO DEL AUDIO PROCESADO
-    # =======================================================================
-    
+    return filtered_audio.astype(np.float32)
+
+
+def apply_radio_filter(input_wav_path: str, output_wav_path: str = None, 
+                       lowcut: int = 200, highcut: int = 3000, 
+                       add_noise: bool = True, noise_level: float = 0.002,
+                       add_compression: bool = True,
+                       mando_effect: bool = True) -> None:
+    """
+    Applies a radio-style filter to a WAV file with Mandalorian helmet effect.
+    File wrapper around radio_filter_buffer() for scripts and exports.
+
+    Args:
+        input_wav_path: Path to the input WAV file.
+        output_wav_path: Path to save the filtered WAV file (overwrites input if None).
+        lowcut, highcut, add_noise, noise_level, add_compression, mando_effect:
+            See radio_filter_buffer().
+    """
+    if not os.path.exists(input_wav_path):
+        raise FileNotFoundError(f"Input file not found: {input_wav_path}")
+
+    # Load audio directly as float32 (no float64 round-trip)
+    audio, sample_rate = sf.read(input_wav_path, dtype='float32')
+
+    filtered_audio = radio_filter_buffer(
+        audio, sample_rate, lowcut=lowcut, highcut=highcut,
+        add_noise=add_noise, noise_level=noise_level,
+        add_compression=add_compression, mando_effect=mando_effect
+    )
+
     # Save filtered audio
     output_path = output_wav_path or input_wav_path
     sf.write(output_path, filtered_audio, sample_rate)
 
+# =======================================================================
+# 3. VERSIÓN EN STREAMING (BLOQUES CON ESTADO)
+# =======================================================================
+
+class StreamingRadioFilter:
+    """
+    La misma cadena Mandaloriana, aplicada bloque a bloque mientras Piper sigue sintetizando.
+
+    Diferencias con radio_filter_buffer():
+    - Filtros del DSPBank (SOS) aplicados con sosfilt + estado (causal, sin filtfilt)
+    - Ruido, fluctuaciones y dropouts leídos de lechos pregenerados
+    - Ecos del casco con un buffer circular de historia
+    - Normalización con seguimiento de pico y control de nivel por bloque
+    - Latencia añadida: un bloque (block_size muestras)
+    """
+
+    # =======================================================================
+    # 3.1 DISEÑO DE FILTROS (UNA SOLA VEZ)
+    # =======================================================================
+    def __init__(self, sample_rate: int, lowcut: int = 200, highcut: int = 3000,
+                 add_noise: bool = True, noise_level: float = 0.002,
+                 add_compression: bool = True, mando_effect: bool = True,
+                 block_size: int = 1024):
+        self.sample_rate = sample_rate
+        self.add_noise = add_noise and noise_level > 0
+        self.noise_level = noise_level
+        self.add_compression = add_compression
+        self.mando_effect = mando_effect
+        self.block_size = block_size
+
+        # Coeficientes y lechos de ruido compartidos (diseñados una vez por sample_rate y banda)
+        self._bank = DSPBank.get(sample_rate, lowcut, highcut)
+        self._bandpass = self._bank.bandpass
+        self._resonators = self._bank.resonators
+
+        # Ecos: (retardo en muestras, ganancia)
+        self._echo_taps = [(int(sample_rate * 0.015), 0.25), (int(sample_rate * 0.03), 0.15), (int(sample_rate * 0.05), 0.1)]
+        self._echo_length = max(delay for delay, _ in self._echo_taps)
+
+        self.reset()
+
+    def reset(self):
+        """Vacía el estado de los filtros (nuevo enunciado)"""
+        self._bandpass_zi = np.zeros((self._bandpass.shape[0], 2))
+        self._resonators_zi = np.zeros((self._resonators.shape[0], 2))
+        # Ruido, fluctuaciones y dropouts se leen de los lechos desde un desfase aleatorio
+        self._beds = self._bank.cursor()
+        self._echo_history = np.zeros(self._echo_length, dtype=np.float32)
+        self._peak = 0.0
+        self._position = 0
+
+    # =======================================================================
+    # 3.2 PROCESAMIENTO DE UN BLOQUE
+    # =======================================================================
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Filtra un bloque (float mono) y devuelve float32 de la misma longitud"""
+        block = np.asarray(block, dtype=np.float32)
+        n = len(block)
+        if n == 0:
+            return block
+
+        # Normalización con seguimiento de pico (equivalente a normalizar el archivo a 0.9).
+        # Suelo de 0.25 para no amplificar 40 veces el susurro inicial antes del primer pico real
+        self._peak = max(self._peak * 0.999, float(np.max(np.abs(block))), 0.25)
+        block = block / self._peak * 0.9
+
+        audio, self._bandpass_zi = scipy.signal.sosfilt(self._bandpass, block, zi=self._bandpass_zi)
+
+        if self.mando_effect:
+            audio, self._resonators_zi = scipy.signal.sosfilt(self._resonators, audio, zi=self._resonators_zi)
+
+            # Ecos del casco desde el buffer circular de historia
+            extended = np.concatenate([self._echo_history, audio])
+            echoes = np.zeros(n)
+            for delay, gain in self._echo_taps:
+                start = self._echo_length - delay
+                echoes += extended[start:start + n] * gain
+            self._echo_history = extended[-self._echo_length:]
+            audio = audio + echoes
+
+            peak = np.max(np.abs(audio))
+            if peak > 1.0:
+                audio = audio / peak * 0.98
+
+        t = (self._position + np.arange(n)) / self.sample_rate
+
+        if self.add_noise:
+            colored_noise = self._beds.noise(n, self.noise_level)
+            interference = 0.003 * np.sin(2 * np.pi * 0.2 * t) * (1 + 0.5 * np.sin(2 * np.pi * 2.5 * t))
+            audio = audio + colored_noise + interference
+
+            peak = np.max(np.abs(audio))
+            if peak > 0.95:
+                audio = audio / peak * 0.95
+
+        if self.add_compression:
+            # Compresión por bloque con los mismos parámetros que la versión de archivo
+            threshold, ratio, makeup_gain = 0.2, 4.0, 1.6
+            magnitude = np.abs(audio)
+            audio = np.where(magnitude > threshold, np.sign(audio) * (threshold + (magnitude - threshold) / ratio), audio)
+            audio = audio * makeup_gain
+            peak = np.max(np.abs(audio))
+            if peak > 1.0:
+                audio = audio / peak * 0.95
+
+        # Modulación AM + microfluctuaciones y dropouts del banco (continuos entre bloques)
+        am_effect = 1.0 + 0.05 * np.sin(2 * np.pi * 0.5 * t)
+        audio = audio * am_effect * self._beds.fluctuation(n) * self._beds.dropout(n)
+        self._beds.advance(n)
+
+        # Soft clipping final (mismos parámetros que la versión de archivo)
+        threshold, hardness = 0.85, 4
+        magnitude = np.abs(audio)
+        mask = magnitude > threshold
+        audio[mask] = np.sign(audio[mask]) * (threshold + (1 - threshold) *
+                                              np.tanh(hardness * ((magnitude[mask] - threshold) / (1 - threshold))))
+
+        self._position += n
+        return np.clip(audio, -0.99, 0.99).astype(np.float32)
+
+    def process_stream(self, chunks):
+        """Generador: trocea lo que llega en bloques de block_size y los filtra según se completan"""
+        pending = np.zeros(0, dtype=np.float32)
+        for chunk in chunks:
+            pending = np.concatenate([pending, np.asarray(chunk, dtype=np.float32)])
+            while len(pending) >= self.block_size:
+                yield self.process(pending[:self.block_size])
+                pending = pending[self.block_size:]
+        if len(pending):
+            yield self.process(pending)
+        # Cola de los ecos del casco
+        if self.mando_effect:
+            yield self.process(np.zeros(self._echo_length, dtype=np.float32))
+
 # ===============================================
 # ESTADO: ACÚSTICAMENTE PERTURBADO (pero funcional)
 # ÚLTIMA ACTUALIZACIÓN: Cuando dejé de escuchar frecuencias por encima de 3kHz
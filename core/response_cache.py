@@ -0,0 +1,251 @@
+# ===============================================
+# RESPONSE CACHE - Caché de Respuestas en Dos Niveles para TARS-BSK
+# Objetivo: Que la quinta vez que preguntan lo mismo no cueste una generación de Phi-3
+# Dependencias: numpy, SemanticEngine (MiniLM) opcional, json para persistencia
+# Advertencia: Repetirse es de mala educación. Repetirse gratis es eficiencia.
+# ===============================================
+
+# ===============================================
+# 1. CONFIGURACIÓN INICIAL Y DEPENDENCIAS
+# ===============================================
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("TARS.ResponseCache")
+
+# ===============================================
+# 2. CLASE PRINCIPAL RESPONSECACHE
+# ===============================================
+class ResponseCache:
+    """
+    Caché de respuestas del LLM delante de la generación:
+
+    - Nivel 1 (exacto): entrada normalizada + contexto (emoción|tema)
+    - Nivel 2 (semántico): vecino más cercano por embedding MiniLM dentro del
+      mismo contexto, por encima de similarity_threshold
+    - TTL por entrada, expulsión LRU y persistencia en JSON entre reinicios
+    """
+
+    # =======================
+    # 2.1 INICIALIZACIÓN
+    # =======================
+    def __init__(self, storage_path, semantic_engine=None, ttl_seconds: float = 7 * 24 * 3600,
+                 max_entries: int = 200, similarity_threshold: float = 0.92):
+        """
+        :param storage_path: Archivo JSON donde se persiste la caché
+        :param semantic_engine: SemanticEngine para el nivel semántico (None = solo exacto)
+        :param ttl_seconds: Vida de cada entrada
+        :param max_entries: Entradas máximas antes de expulsar las menos usadas
+        :param similarity_threshold: Similitud coseno mínima para un acierto semántico
+        """
+        self.storage_path = Path(storage_path)
+        self.semantic_engine = semantic_engine
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+
+        self.entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._embeddings = {}
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+        self._load()
+
+    # =======================
+    # 2.2 CLAVES Y NORMALIZACIÓN
+    # =======================
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Minúsculas, sin tildes, sin puntuación y con espacios colapsados (el ASR no pone tildes)"""
+        text = unicodedata.normalize("NFKD", (text or "").lower())
+        text = "".join(c for c in text if not unicodedata.combining(c))
+        text = re.sub(r"[^\w\s]", " ", text)
+        return re.sub(r"\s+", " ", text).strip()
+
+    @staticmethod
+    def context_key(emotion: Optional[str], theme: Optional[str]) -> str:
+        return f"{emotion or 'neutral'}|{theme or 'desconocido'}"
+
+    def _key(self, user_input: str, context: str) -> str:
+        return f"{context}::{self.normalize(user_input)}"
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        """Embedding normalizado (norma 1) o None si no hay motor semántico"""
+        if self.semantic_engine is None:
+            return None
+        vector = self.semantic_engine.get_embedding(text)
+        if vector is None:
+            return None
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    def _expired(self, entry: dict, now: float) -> bool:
+        return now - entry["created"] > self.ttl_seconds
+
+    # =======================
+    # 2.3 CONSULTA
+    # =======================
+    def lookup(self, user_input: str, context: str) -> Optional[Tuple[str, str]]:
+        """
+        Busca una respuesta cacheada.
+        :return: (respuesta, nivel) con nivel "exacto" o "semántico", o None si no hay acierto
+        """
+        now = time.time()
+        key = self._key(user_input, context)
+
+        with self._lock:
+            self._purge_expired(now)
+
+            # Nivel 1: coincidencia exacta
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                entry["hits"] += 1
+                self.exact_hits += 1
+                logger.info(f"💡 Caché exacta: '{user_input}'")
+                return entry["response"], "exacto"
+
+            candidates = [k for k, e in self.entries.items() if e["context"] == context and k in self._embeddings]
+
+        # Nivel 2: vecino más cercano dentro del mismo contexto (fuera del lock: MiniLM tarda)
+        if candidates:
+            query = self._embed(self.normalize(user_input))
+            if query is not None:
+                with self._lock:
+                    candidates = [k for k in candidates if k in self.entries]
+                    if candidates:
+                        matrix = np.stack([self._embeddings[k] for k in candidates])
+                        scores = matrix @ query
+                        best = int(np.argmax(scores))
+                        if scores[best] >= self.similarity_threshold:
+                            best_key = candidates[best]
+                            entry = self.entries[best_key]
+                            self.entries.move_to_end(best_key)
+                            entry["hits"] += 1
+                            self.semantic_hits += 1
+                            logger.info(f"💡 Caché semántica: '{user_input}' ≈ '{entry['input']}' ({scores[best]:.3f})")
+                            return entry["response"], "semántico"
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    # =======================
+    # 2.4 ALMACENAMIENTO
+    # =======================
+    def put(self, user_input: str, context: str, response: str):
+        """Guarda una respuesta generada y persiste la caché"""
+        if not response or not self.normalize(user_input):
+            return
+
+        key = self._key(user_input, context)
+        embedding = self._embed(self.normalize(user_input))
+
+        with self._lock:
+            self.entries[key] = {
+                "input": user_input,
+                "context": context,
+                "response": response,
+                "created": time.time(),
+                "hits": 0,
+            }
+            self.entries.move_to_end(key)
+            if embedding is not None:
+                self._embeddings[key] = embedding
+
+            while len(self.entries) > self.max_entries:
+                old_key, _ = self.entries.popitem(last=False)
+                self._embeddings.pop(old_key, None)
+
+            self._save()
+
+    def _purge_expired(self, now: float):
+        expired = [k for k, e in self.entries.items() if self._expired(e, now)]
+        for k in expired:
+            del self.entries[k]
+            self._embeddings.pop(k, None)
+        if expired:
+            logger.debug(f"🗑️ {len(expired)} respuestas caducadas eliminadas de la caché")
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self._embeddings.clear()
+            self._save()
+
+    # =======================
+    # 2.5 PERSISTENCIA
+    # =======================
+    def _load(self):
+        if not self.storage_path.exists():
+            return
+        try:
+            with open(self.storage_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+
+            now = time.time()
+            for item in data.get("entries", []):
+                entry = {k: item[k] for k in ("input", "context", "response", "created", "hits")}
+                if self._expired(entry, now):
+                    continue
+                key = self._key(entry["input"], entry["context"])
+                self.entries[key] = entry
+                if item.get("embedding"):
+                    self._embeddings[key] = np.asarray(item["embedding"], dtype=np.float32)
+
+            logger.info(f"💾 Caché de respuestas cargada: {len(self.entries)} entradas")
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo cargar la caché de respuestas: {e}")
+
+    def _save(self):
+        """Escritura atómica (tmp + replace) para no dejar un JSON a medias"""
+        try:
+            self.storage_path.parent.mkdir(parents=True, exist_ok=True)
+            data = {"entries": [
+                {**entry, "embedding": self._embeddings[key].round(5).tolist() if key in self._embeddings else None}
+                for key, entry in self.entries.items()
+            ]}
+            tmp_path = self.storage_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.storage_path)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo guardar la caché de respuestas: {e}")
+
+    # =======================
+    # 2.6 ESTADÍSTICAS
+    # =======================
+    def get_stats(self) -> dict:
+        total = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / total if total else 0.0,
+        }
+
+# ===============================================
+# ESTADO: RECURRENTEMENTE EFICIENTE (ya me lo habías preguntado)
+# ÚLTIMA ACTUALIZACIÓN: Cuando la misma pregunta dejó de costar la misma espera
+# FILOSOFÍA: "Si la respuesta no ha cambiado, el esfuerzo tampoco debería repetirse."
+# ===============================================
+#
+#           THIS IS THE CACHE WAY...
+#           (responder dos veces, pensar una)
+#
+# ===============================================
@@ -0,0 +1,135 @@
+# ===============================================
+# SENTENCE STREAMER - Troceador de Frases en Tiempo Real para TARS-BSK
+# Objetivo: Entregar frases a Piper mientras el LLM sigue pensando lo siguiente
+# Dependencias: re, y la fe en que el modelo ponga algún punto antes de los 60 tokens
+# ===============================================
+
+# ===============================================
+# 1. CONFIGURACIÓN INICIAL Y DEPENDENCIAS
+# ===============================================
+import logging
+import re
+from typing import List
+
+logger = logging.getLogger("TARS.Streamer")
+
+# ===============================================
+# 2. CLASE PRINCIPAL SENTENCESTREAMER
+# ===============================================
+class SentenceStreamer:
+    """
+    Acumula tokens de un LLM en streaming y emite frases completas en cuanto
+    aparecen. Al cerrar el stream aplica el mismo truncamiento inteligente que
+    el modo por lotes (_generate_response_async): la cola incompleta se descarta
+    si hay puntuación en el último 70% del texto, o se cierra con un punto.
+    """
+
+    # Fin de frase: puntuación terminal (+ comilla de cierre opcional) seguida de espacio
+    SENTENCE_END = re.compile(r'[.!?]+["»”]?(?=\s)')
+    TERMINAL = ('.', '!', '?')
+
+    # =======================
+    # 2.1 INICIALIZACIÓN
+    # =======================
+    def __init__(self, min_chars: int = 20):
+        """
+        :param min_chars: Longitud mínima de una frase emitida. Las frases más cortas
+                          se fusionan con la siguiente (Piper odia los fragmentos de 2 palabras).
+        """
+        self.min_chars = min_chars
+        self.buffer = ""
+        self.sentences: List[str] = []
+
+    # =======================
+    # 2.2 ALIMENTACIÓN DEL STREAM
+    # =======================
+    def feed(self, token: str) -> List[str]:
+        """
+        Añade un token y devuelve las frases que se han completado con él.
+        """
+        if not token:
+            return []
+
+        self.buffer += token
+        ready = []
+
+        search_from = 0
+        while True:
+            match = self.SENTENCE_END.search(self.buffer, search_from)
+            if not match:
+                break
+
+            candidate = self.buffer[:match.end()].strip()
+            search_from = match.end()
+
+            # Frase demasiado corta o cita abierta: esperar a tener más texto
+            if len(candidate) < self.min_chars or candidate.count('"') % 2 != 0:
+                continue
+
+            ready.append(candidate)
+            self.buffer = self.buffer[match.end():]
+            search_from = 0
+
+        self.sentences.extend(ready)
+        return ready
+
+    # =======================
+    # 2.3 CIERRE DEL STREAM
+    # =======================
+    def finish(self) -> List[str]:
+        """
+        Cierra el stream y devuelve lo que quede por emitir, ya truncado.
+        """
+        tail = re.sub(r'\s+', ' ', self.buffer).strip()
+        self.buffer = ""
+
+        if not tail:
+            return []
+
+        if tail.endswith(self.TERMINAL) or tail.endswith(('."', '!"', '?"')):
+            self.sentences.append(tail)
+            return [tail]
+
+        emitted = self.text
+        full = f"{emitted} {tail}" if emitted else tail
+        offset = len(full) - len(tail)
+
+        last_punctuation = max(full.rfind('.'), full.rfind('?'), full.rfind('!'))
+        open_quotes = full.count('"') % 2 != 0
+
+        # Mismo criterio que el modo por lotes: solo truncar si la puntuación está en el último 70%
+        if last_punctuation > 0 and last_punctuation > len(full) * 0.3:
+            if open_quotes and '"' in full[last_punctuation:]:
+                next_quote = full.find('"', last_punctuation)
+                truncated = full[:next_quote + 1] + "."
+                logger.info("✂️ Truncamiento preservando cita")
+            else:
+                truncated = full[:last_punctuation + 1]
+                logger.info("✂️ Truncamiento en puntuación")
+            remainder = truncated[offset:].strip()
+        else:
+            remainder = tail + "."
+            logger.info("✂️ Añadido punto final sin truncar")
+
+        if not remainder:
+            logger.info(f"🔍 Cola incompleta descartada: '{tail}'")
+            return []
+
+        self.sentences.append(remainder)
+        return [remainder]
+
+    @property
+    def text(self) -> str:
+        """Texto completo emitido hasta el momento"""
+        return " ".join(self.sentences)
+
+# ===============================================
+# ESTADO: FRASEOLÓGICAMENTE IMPACIENTE (pero puntual)
+# ÚLTIMA ACTUALIZACIÓN: Cuando descubrí que un punto a tiempo vale más que 60 tokens perfectos
+# FILOSOFÍA: "No esperes a que termine de pensar. Yo tampoco lo hago."
+# ===============================================
+#
+#           THIS IS THE STREAMING WAY...
+#           (hablar primero, terminar de pensar después)
+#
+# ===============================================
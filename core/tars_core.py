@@ -44,11 +44,27 @@ import json
 import threading
 import argparse
 import re
+import queue
+from concurrent.futures import CancelledError
 from typing import Any, List, Optional
 from pathlib import Path
 from llama_cpp import Llama
 from tts.piper_tts import PiperTTS
+from tts.speech_pipeline import SpeechPipeline
+from tts.audio_cache import RenderedAudioCache
+from tts.phrase_bank import PhraseBank
+from tts.audio_output import AudioOutput
+from tts.speech_scheduler import SpeechScheduler, PRIORITY_ALARM, PRIORITY_ANSWER
+from tts.reminder_announcer import ReminderAnnouncer
 from tars_brain import TARSBrain
+from sentence_streamer import SentenceStreamer
+from prefix_cache import PrefixStateCache
+from generation_control import GenerationToken, StoppingCriteriaList
+from llm_worker import LLMWorker, LLMQueueFull, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from model_router import ModelRouter, ModelTier, TIER_FAST, TIER_FULL
+from llm_process import RemotePrefixCache
+from response_cache import ResponseCache
+from throughput_model import ThroughputModel, ThroughputProbe
 # from tars_learning_module import TarsLearningModule
 from modules.emotional_engine import TARSPersonality
 from modules.led_controller import LEDController
@@ -188,6 +204,17 @@ class TARS:
     Clase principal que implementa el asistente TARS.
     Integra LLM, TTS, memoria, personalidad y sensores.
     """
+    # Preámbulo común de casi todos los prompts (su KV-cache se reutiliza entre turnos)
+    # BASE_INSTRUCTION = "Respondes con sarcasmo seco, lógica militar y desprecio elegante." # <- Cuidado con los Tokens (Usa frases cortas)
+    BASE_INSTRUCTION = "Sarcasmo clínico. Sin compasión. Sin rodeos. Solo lógica y desprecio. Respuesta corta. "
+
+    # Respuestas de emergencia de la generación: nunca se guardan en la caché de respuestas
+    GENERATION_FALLBACKS = {
+        "No puedo elaborar una respuesta coherente ahora.",
+        "No puedo procesar eso ahora.",
+        "Disculpa, estoy teniendo dificultades para responder.",
+    }
+
     # =======================
     # 3.1 INICIALIZACIÓN
     # =======================
@@ -239,7 +266,13 @@ class TARS:
                 radio_filter_enabled=settings["piper_tuning"].get("radio_filter_enabled", False),
                 radio_filter_band=settings["piper_tuning"].get("radio_filter_band", [300, 3400]),
                 radio_filter_noise=settings["piper_tuning"].get("radio_filter_noise", True),
-                radio_filter_compression=settings["piper_tuning"].get("radio_filter_compression", True)
+                radio_filter_compression=settings["piper_tuning"].get("radio_filter_compression", True),
+
+                # Voz residente: el modelo ONNX se carga una vez, no por fragmento
+                resident_voice=settings["piper_tuning"].get("resident_voice", True),
+                export_wav=settings["piper_tuning"].get("export_wav", False),
+                radio_filter_streaming=settings["piper_tuning"].get("radio_filter_streaming", False),
+                stream_block_size=settings["piper_tuning"].get("stream_block_size", 1024)
             )
         except Exception as e:
             logger.error(f"❌ Error inicializando TTS: {e}")
@@ -253,6 +286,51 @@ class TARS:
         # Se aplican DESPUÉS de RadioFilter para evitar conflictos de frecuencia
         self.tts.audio_effects_config = settings.get("audio_effects", {"enabled": False})
 
+        # Salida de audio residente: voz, pitidos y relleno mezclados en un solo stream
+        self.audio_output = None
+        if settings["audio"].get("output_stream", {}).get("enabled", False):
+            audio_output = AudioOutput.from_settings(settings)
+            if audio_output.start():
+                self.audio_output = audio_output
+                self.tts.audio_output = audio_output
+                self.sensory.use_output(audio_output)
+
+        # Pipeline de voz: el fragmento N+1 se sintetiza mientras suena el N
+        self.speech_pipeline = None
+        self.speech_scheduler = None
+        self.phrase_bank = None
+        if hasattr(self.tts, "render"):
+            speech_settings = settings.get("speech", {})
+
+            # Audio final cacheado por texto + configuración de voz (frases que se repiten)
+            audio_cache_mb = speech_settings.get("audio_cache_mb", 64)
+            if audio_cache_mb > 0:
+                self.tts.audio_cache = RenderedAudioCache(base_path / "data" / "audio_cache",
+                                                          max_bytes=audio_cache_mb * 1024 * 1024)
+
+            # Frases fijas pre-renderizadas (scripts/prerender_phrases.py), solo si la voz coincide
+            self.phrase_bank = PhraseBank(base_path / "audios" / "phrase_bank")
+            if self.phrase_bank.bind(self.tts.render_fingerprint()):
+                self.tts.phrase_bank = self.phrase_bank
+                self.sensory.phrase_bank = self.phrase_bank
+
+            self.speech_pipeline = SpeechPipeline(
+                self.tts,
+                queue_size=speech_settings.get("queue_size", 2),
+                sentence_pause=speech_settings.get("sentence_pause", 0.35),
+                clause_pause=speech_settings.get("clause_pause", 0.2),
+                fragment_pause=speech_settings.get("fragment_pause", 0.15)
+            )
+            self.speech_pipeline.start()
+
+            # Planificador de voz: chat, recordatorios y plugins hablan por turnos con prioridad
+            self.speech_scheduler = SpeechScheduler(self.speech_pipeline, audio_output=self.audio_output)
+            self.speech_scheduler.start()
+
+        # Streaming LLM → TTS: cada frase terminada se reproduce mientras se generan las siguientes
+        self.llm_settings = settings.get("llm", {})
+        self.streaming_enabled = self.llm_settings.get("streaming", False)
+
         # Inicializar sistema de memoria dual
         self.conversation_memory = ConversationMemory(max_items=5)  # Memoria a corto plazo
         self.memory = TarsMemoryManager()  # Memoria a largo plazo
@@ -291,8 +369,48 @@ class TARS:
         # Cargar modelo LLM
         start_time = time.time()
         self.model_path = Path(model_path)
+        self.n_ctx = self.llm_settings.get("n_ctx", 144)
         self._load_model()
 
+        # Presupuesto de contexto con el tokenizer real del modelo
+        self.token_budget = self.model_router.token_budget(TIER_FULL)
+
+        # Caché de prefijos del KV-cache: el preámbulo de instrucciones se evalúa una sola vez
+        prefix_cache_mb = self.llm_settings.get("prefix_cache_mb", 64)
+        self.prefix_cache = None
+        if prefix_cache_mb > 0:
+            if self.model_router.tier(TIER_FULL).remote:
+                # Los snapshots viven junto al Llama, en el proceso de inferencia
+                self.prefix_cache = RemotePrefixCache(self.llm)
+            else:
+                self.prefix_cache = PrefixStateCache(self.llm, self.token_budget, max_bytes=prefix_cache_mb * 1024 * 1024)
+            try:
+                self.prefix_cache.warm(self.BASE_INSTRUCTION)
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo precalentar el prefijo de instrucciones: {e}")
+
+        # Worker de inferencia: único dueño del Llama, cola con prioridad y límite de profundidad
+        self.llm_worker = LLMWorker(self.llm, max_queue=self.llm_settings.get("worker_queue_size", 4))
+        self.llm_worker.start()
+
+        # Velocidad medida del LLM (tokens/s) para ajustar max_tokens al objetivo de latencia
+        self.throughput = ThroughputModel(base_path / "data" / "throughput_history.json")
+        self.latency_target = self.llm_settings.get("response_latency_target", 10.0)
+
+        # Caché de respuestas (exacta + semántica con MiniLM) delante del LLM
+        cache_settings = self.llm_settings.get("response_cache", {})
+        self.response_cache = None
+        if cache_settings.get("enabled", True):
+            self.response_cache = ResponseCache(
+                base_path / "data" / "response_cache.json",
+                semantic_engine=semantic_engine,
+                ttl_seconds=cache_settings.get("ttl_hours", 168) * 3600,
+                max_entries=cache_settings.get("max_entries", 200),
+                similarity_threshold=cache_settings.get("similarity_threshold", 0.92)
+            )
+        self._active_generation: Optional[GenerationToken] = None
+        self._continuation_prefetch = None
+
         # Ahora puedes inicializar TARSBrain aquí si quieres
         self.brain = TARSBrain(self.memory, self.llm, is_simple=False)
 
@@ -316,8 +434,10 @@ class TARS:
         # Inicializar ReminderPlugin
         try:
             def speak_callback(text, emotion="neutral"):
-                """Callback para que el scheduler pueda hablar"""
-                if hasattr(self, 'tts') and self.tts:
+                """Callback para que el scheduler pueda hablar (prioridad de alarma, sin bloquear su hilo)"""
+                if self.speech_scheduler is not None:
+                    self.speak_from_producer(text, PRIORITY_ALARM, source="scheduler")
+                elif hasattr(self, 'tts') and self.tts:
                     self.tts.speak(text)
                 else:
                     logger.info(f"🔊 TTS: {text}")
@@ -328,6 +448,14 @@ class TARS:
                 plugin_system=self.plugin_system
             )
             logger.info("✅ SchedulerPlugin inicializado")
+
+            # Avisos sintetizados al programar: al sonar solo se reproduce el buffer
+            if self.speech_scheduler is not None:
+                self.scheduler_plugin.set_announcer(ReminderAnnouncer(
+                    self.tts,
+                    lambda fragment: self.speech_scheduler.submit([fragment], PRIORITY_ALARM, source="scheduler"),
+                    base_path / "data" / "reminder_audio"
+                ))
             
         except Exception as e:
             logger.error(f"❌ Error inicializando SchedulerPlugin: {e}")
@@ -349,31 +477,82 @@ class TARS:
     # =======================
     def _load_model(self):
         """Carga optimizada del modelo LLM para Raspberry Pi 5"""
-        logger.info(f"✅ Cargando modelo desde {self.model_path}...")
-        load_start = time.time()
-
         if not self.model_path.exists():
             logger.error(f"Modelo no encontrado en: {self.model_path}")
             raise FileNotFoundError("¡Archivo GGUF no existe!")
 
-        try:
-            # OPTIMIZACIÓN CLAVE: Configuración optimizada para RPi5
-            self.llm = Llama(
-                model_path=str(self.model_path),
-                n_ctx=144,           # Contexto mínimo funcional
-                n_threads=3,         # 3 hilos es óptimo para RPi5 (deja 1 libre)
-                n_batch=64,          # Batch pequeño para menor consumo de memoria
-                f16_kv=True,         # KV cache optimizado (crucial)
-                n_gpu_layers=0,      # No usar GPU para este modelo específico
-                seed=-1,             # Semilla aleatoria
-                logits_all=False,    # Desactivar cálculo de todos los logits
-                verbose=False
+        # OPTIMIZACIÓN CLAVE: Configuración optimizada para RPi5 (pesos mapeados con mmap)
+        router_settings = self.llm_settings.get("router", {})
+        process_options = self._process_options()
+        full_tier = ModelTier(
+            TIER_FULL,
+            self.model_path,
+            n_ctx=self.n_ctx,    # Contexto mínimo funcional (144 por defecto)
+            n_threads=3,         # 3 hilos es óptimo para RPi5 (deja 1 libre)
+            n_batch=64,          # Batch pequeño para menor consumo de memoria
+            process_options=process_options
+        )
+
+        # Modelo pequeño opcional para turnos simples: se carga la primera vez que se usa
+        fast_tier = None
+        fast_model_path = router_settings.get("fast_model_path")
+        if fast_model_path:
+            fast_tier = ModelTier(
+                TIER_FAST,
+                Path(__file__).resolve().parent.parent / fast_model_path,
+                n_ctx=router_settings.get("fast_n_ctx", 256),
+                n_threads=3,
+                n_batch=64,
+                process_options=dict(process_options, prefix_cache_mb=0) if process_options else None
             )
-            logger.info(f"✅ Modelo cargado en {time.time() - load_start:.2f} segundos")
+            if not fast_tier.available:
+                logger.warning(f"⚠️ Modelo rápido no encontrado en {fast_tier.model_path}, todo irá al modelo completo")
+
+        self.model_router = ModelRouter(
+            full_tier,
+            fast_tier,
+            simple_max_words=router_settings.get("simple_max_words", 6),
+            latency_target=router_settings.get("latency_target", 4.0)
+        )
+
+        try:
+            # El modelo completo se carga ya: presupuesto, caché de prefijos y TARSBrain dependen de él
+            self.llm = self.model_router.get_llm(TIER_FULL)
         except Exception as e:
             logger.error(f"❌ Error cargando modelo: {e}")
             raise RuntimeError(f"Error inicializando LLM: {e}")
 
+        full = self.model_router.tier(TIER_FULL)
+        if full.remote and self.llm_settings.get("process", {}).get("host_semantic_engine", False):
+            # MiniLM también fuera: el proceso principal solo conserva audio y lógica
+            try:
+                semantic_engine.model = self.llm.encoder(semantic_engine.model_path)
+                logger.info("🧩 Motor semántico alojado en el proceso de inferencia")
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo alojar el motor semántico en el proceso de inferencia: {e}")
+
+    def _process_options(self) -> Optional[dict]:
+        """Opciones del proceso de inferencia aislado (None = Llama dentro de este proceso)"""
+        process_settings = self.llm_settings.get("process", {})
+        if not process_settings.get("enabled", False):
+            return None
+
+        # El proceso principal (captura de audio, TTS) se queda con sus propios núcleos
+        main_cpus = process_settings.get("main_cpus")
+        if main_cpus:
+            try:
+                os.sched_setaffinity(0, set(main_cpus))
+            except (AttributeError, OSError) as e:
+                logger.warning(f"⚠️ No se pudo fijar el proceso principal a {main_cpus}: {e}")
+
+        return {
+            "cpus": process_settings.get("cpus") or None,
+            "nice": process_settings.get("nice", 0),
+            "restart_on_crash": process_settings.get("restart_on_crash", True),
+            "buffer_kb": process_settings.get("shm_kb", 64),
+            "prefix_cache_mb": self.llm_settings.get("prefix_cache_mb", 64),
+        }
+
     def extract_and_sanitize_response(self, data):
         """
         Método Mandaloriano para extraer y sanitizar respuestas.
@@ -549,54 +728,70 @@ class TARS:
         else:
             return "Ha ocurrido un problema. Este no es el camino. ¿Podemos intentar otra aproximación?"          
 
-    # ============================================ 
+    # ============================================
     # ⏱️ TIMEOUTS Y RENDIMIENTO - INSTRUMENTADO
-    # ============================================       
-    def _generate_response_async(self, prompt: str, is_simple: bool, response_holder: list, event: threading.Event, continuacion_detectada: bool = False):
+    # ============================================
+    def _compute_max_tokens(self, prompt: str, is_simple: bool, model_tier: str = TIER_FULL) -> int:
+        """Calcula max_tokens a partir del hueco exacto que deja el prompt en el contexto"""
+        # Consultas simples: menos tokens. Complejas: más, pero nunca fuera del contexto
+        desired_tokens = 40 if is_simple else 60
+
+        budget = self.model_router.token_budget(model_tier)
+        prompt_token_count = budget.prompt_tokens(prompt)
+        max_tokens = budget.max_tokens_for(prompt, desired_tokens)
+
+        # Objetivo de latencia: solo los tokens que dé tiempo a generar con la velocidad medida
+        eval_tokens = self._uncached_prompt_tokens(prompt, model_tier)
+        deadline_tokens = self.throughput.max_tokens_for_deadline(model_tier, eval_tokens, max_tokens, self.latency_target)
+        if deadline_tokens < max_tokens:
+            logger.info(f"⏱️ Recorte por latencia: {max_tokens} → {deadline_tokens} tokens "
+                        f"(objetivo {self.latency_target:.1f}s, {self.throughput.generation_tps(model_tier):.1f} tok/s)")
+            max_tokens = deadline_tokens
+
+        estimated = self.throughput.estimate(model_tier, eval_tokens, max_tokens)
+        logger.info(f"⚙️ Tokens: prompt={prompt_token_count} ({eval_tokens} por evaluar), contexto={budget.n_ctx}, "
+                    f"asignados={max_tokens}, estimado={estimated:.1f}s")
+        return max_tokens
+
+    def _uncached_prompt_tokens(self, prompt: str, model_tier: str = TIER_FULL) -> int:
+        """Tokens del prompt que habrá que evaluar (el preámbulo cacheado no cuenta)"""
+        budget = self.model_router.token_budget(model_tier)
+        tokens = budget.prompt_tokens(prompt)
+        if model_tier == TIER_FULL and self.prefix_cache is not None and prompt.startswith(self.BASE_INSTRUCTION):
+            tokens -= budget.prompt_tokens(self.BASE_INSTRUCTION)
+        return max(0, tokens)
+
+    def _generate_response_async(self, prompt: str, is_simple: bool, response_holder: list, event: threading.Event,
+                                 continuacion_detectada: bool = False, cancel_token: Optional[GenerationToken] = None,
+                                 model_tier: str = TIER_FULL):
         """Generación adaptativa optimizada con truncamiento inteligente y tokens dinámicos"""
         try:
             logger.info("🧠 Generando respuesta...")
             overall_start = time.time()
-            
-            # Calcular tokens aproximados del prompt
-            prompt_token_count = len(prompt.split())
-            context_limit = 160  
-            
-            # Margen de seguridad ampliado
-            safety_margin = 20
-            
-            # Calcular tokens disponibles, garantizando mínimo 10
-            available_tokens = max(10, context_limit - prompt_token_count - safety_margin)
-            
-            # Asignar tokens según tipo de consulta con límites firmes
-            if is_simple:
-                # Consultas simples: menos tokens
-                max_tokens = min(40, available_tokens)
-            else:
-                # Consultas complejas: más tokens pero siempre dentro del límite seguro
-                max_tokens = min(60, available_tokens)
-                
-            logger.info(f"⚙️ Tokens: prompt≈{prompt_token_count}, disponibles={available_tokens}, asignados={max_tokens}")
-            
-            # Forzar reinicio si prompt es grande o complejo
-            if prompt_token_count > 50 and hasattr(self.llm, 'reset'):
-                logger.info("🔄 Reinicio forzado por prompt extenso")
-                self.llm.reset()
-                time.sleep(0.1)
-            
+
+            max_tokens = self._compute_max_tokens(prompt, is_simple, model_tier)
+
             # Generar respuesta con temporizador
             gen_start = time.time()
             try:
                 logger.info(f"🚨 PROMPT COMPLETO REAL: '{prompt}'")
-                logger.info(f"🚨 LONGITUD REAL: {len(prompt.split())} palabras")
+                logger.info(f"🚨 LONGITUD REAL: {len(prompt.split())} palabras, {self.token_budget.prompt_tokens(prompt)} tokens")
                 output = self._safe_generate(
                     prompt,
                     max_tokens=max_tokens,
                     temperature=0.7,
-                    top_p=0.9
+                    top_p=0.9,
+                    cancel_token=cancel_token,
+                    model_tier=model_tier
                 )
                 generation_time = time.time() - gen_start
                 logger.info(f"⏱️ Tiempo generando tokens: {generation_time:.2f}s")
+
+                # Nadie espera ya esta respuesta: no refinar ni tocar el audio del turno siguiente
+                if cancel_token is not None and cancel_token.is_cancelled():
+                    logger.warning(f"🛑 Respuesta descartada ({cancel_token.reason})")
+                    event.set()
+                    return
                 
                 # Extraer texto de respuesta
                 if isinstance(output, dict) and 'choices' in output:
@@ -609,9 +804,9 @@ class TARS:
                     logger.warning("⚠️ Respuesta vacía del modelo")
                     response_holder[0] = "No puedo elaborar una respuesta coherente ahora."
                     
-                    # Esperar a que termine el audio de pensamiento si está reproduciéndose
+                    # Fundir el audio de pensamiento (con aplay, esperarlo) antes de hablar
                     if hasattr(self, "sensory") and hasattr(self.sensory, "audio_playing") and self.sensory.audio_playing:
-                        self.sensory.wait_for_audio()
+                        self.sensory.finish_filler()
                         
                     event.set()
                     return
@@ -657,9 +852,9 @@ class TARS:
                 refined_result = self.brain.refine_response_if_needed(truncated_result, prompt) # Comentando esta línea desactivas el procesamiento de TARSBrain
                 response_holder[0] = refined_result
                 
-                # Esperar a que termine el audio de pensamiento si está reproduciéndose
+                # Fundir el audio de pensamiento (con aplay, esperarlo) antes de hablar
                 if hasattr(self, "sensory") and hasattr(self.sensory, "audio_playing") and self.sensory.audio_playing:
-                    self.sensory.wait_for_audio()
+                    self.sensory.finish_filler()
                     
                 event.set()
                 
@@ -667,9 +862,9 @@ class TARS:
                 logger.error(f"❌ Error en generación: {e}")
                 response_holder[0] = "No puedo procesar eso ahora."
                 
-                # Esperar a que termine el audio de pensamiento si está reproduciéndose
+                # Fundir el audio de pensamiento (con aplay, esperarlo) antes de hablar
                 if hasattr(self, "sensory") and hasattr(self.sensory, "audio_playing") and self.sensory.audio_playing:
-                    self.sensory.wait_for_audio()
+                    self.sensory.finish_filler()
                     
                 event.set()
                 
@@ -679,125 +874,413 @@ class TARS:
             logger.error(f"❌ Error global: {e}")
             response_holder[0] = "Disculpa, estoy teniendo dificultades para responder."
             
-            # Esperar a que termine el audio de pensamiento si está reproduciéndose
+            # Fundir el audio de pensamiento (con aplay, esperarlo) antes de hablar
             if hasattr(self, "sensory") and hasattr(self.sensory, "audio_playing") and self.sensory.audio_playing:
-                self.sensory.wait_for_audio()
+                self.sensory.finish_filler()
                 
             event.set()
 
 
     # ======================================================================================
-    # 🔄 Genera texto con reinicio selectivo de KV-cache para evitar errores de broadcasting  
+    # 🔄 Genera texto reutilizando el prefijo del KV-cache (reinicio solo ante errores de broadcasting)
     # ======================================================================================
-    def _safe_generate(self, prompt, max_tokens, temperature=0.7, top_p=0.9):
-        """Versión mejorada con reinicio estratégico y manejo avanzado de errores"""
+    def _begin_generation(self, timeout: Optional[float] = None, label: str = "generación") -> GenerationToken:
+        """Crea el token de la nueva generación y cancela la anterior si sigue viva"""
+        previous = self._active_generation
+        if previous is not None and not previous.is_cancelled():
+            previous.cancel("reemplazada por un turno nuevo")
+
+        token = GenerationToken(timeout=timeout, label=label)
+        self._active_generation = token
+        return token
+
+    def _prepare_kv_cache(self, prompt: str) -> int:
+        """Deja el KV-cache listo para el prompt: restaura el prefijo común o reinicia (legacy).
+        Devuelve cuántos tokens del prompt ya están en el KV-cache"""
+        if self.prefix_cache is None:
+            # Sin caché de prefijos: comportamiento original
+            if len(prompt.split()) > 15 and hasattr(self.llm, 'reset'):
+                self.llm.reset()
+                logger.info("🔄 Reinicio preventivo del KV-cache")
+            return 0
+
         try:
-            # Determinar si necesitamos reiniciar basado en la longitud/complejidad
-            should_reset = len(prompt.split()) > 15 and hasattr(self.llm, 'reset')
-            
-            # ⚠️ FIXED: Verificación adicional de longitud total
-            total_tokens = len(prompt.split()) + max_tokens
-            context_limit = 160 
-            
-            # Ajustar max_tokens si es necesario para evitar desbordamiento
-            if total_tokens > context_limit - 5:  # Margen de seguridad
-                adjusted_tokens = max(10, context_limit - len(prompt.split()) - 10)
+            prefix = getattr(self, '_last_prompt_prefix', None)
+            if prefix and prompt.startswith(prefix):
+                self.prefix_cache.warm(prefix)
+            return self.prefix_cache.prepare(prompt)
+        except Exception as e:
+            logger.warning(f"⚠️ Caché de prefijos no disponible para este prompt: {e}")
+            self.llm.reset()
+            return 0
+
+    @staticmethod
+    def _stopping_criteria(cancel_token: Optional[GenerationToken] = None,
+                           probe: Optional[ThroughputProbe] = None) -> StoppingCriteriaList:
+        """Criterios de parada por token: sonda de velocidad y cancelación"""
+        criteria = StoppingCriteriaList()
+        if probe is not None:
+            criteria.append(probe)
+        if cancel_token is not None:
+            criteria.append(cancel_token)
+        return criteria
+
+    def _safe_generate(self, prompt, max_tokens, temperature=0.7, top_p=0.9,
+                       cancel_token: Optional[GenerationToken] = None, priority: int = PRIORITY_INTERACTIVE,
+                       model_tier: str = TIER_FULL):
+        """Versión mejorada con enrutado de modelo, reutilización de prefijo, cancelación y manejo de errores"""
+        probe = None
+
+        def _generate(_):
+            nonlocal max_tokens, probe
+            # Modelo del nivel elegido (el rápido se carga aquí la primera vez, dentro del worker)
+            llm = self.model_router.get_llm(model_tier)
+
+            # Verificación exacta de longitud total con el tokenizer del modelo que va a generar
+            adjusted_tokens = self.model_router.token_budget(model_tier).max_tokens_for(prompt, max_tokens)
+            if adjusted_tokens != max_tokens:
                 logger.warning(f"⚠️ Ajustando tokens de respuesta: {max_tokens} → {adjusted_tokens}")
                 max_tokens = adjusted_tokens
-            
-            # Reiniciar para consultas complejas
-            if should_reset:
-                self.llm.reset()
-                logger.info("🔄 Reinicio preventivo del KV-cache")
-                time.sleep(0.1)
-            
+
+            # Restaurar el prefijo compartido (el preámbulo no se vuelve a evaluar)
+            reused_tokens = self._prepare_kv_cache(prompt) if llm is self.llm else 0
+
+            # Sonda de velocidad: mide evaluación del prompt y generación de esta petición
+            probe = ThroughputProbe(self.model_router.token_budget(model_tier).prompt_tokens(prompt) - reused_tokens)
+            stopping = self._stopping_criteria(cancel_token, probe)
+
             # ⚠️ CAMBIO: Solo 1 intento sin reducir tokens a menos que haya error real
             try:
-                return self.llm(
-                    prompt, 
+                return llm(
+                    prompt,
                     max_tokens=max_tokens,  # ← Usar los tokens calculados, no reducidos
                     temperature=temperature,
                     top_p=top_p,
-                    stop=["\n", "Usuario:"]
+                    stop=["\n", "Usuario:"],
+                    stopping_criteria=stopping
                 )
             except Exception as e:
                 error_str = str(e).lower()
                 logger.warning(f"⚠️ Error en primer intento: {e}")
-                
+
                 # Solo si hay error real, intentar con menos tokens
                 if "exceed context" in error_str or "token limit" in error_str:
                     reduced_tokens = max(10, max_tokens // 2)
                     logger.warning(f"⚠️ Reintentando con tokens reducidos: {max_tokens} → {reduced_tokens}")
-                    return self.llm(
-                        prompt, 
+                    return llm(
+                        prompt,
                         max_tokens=reduced_tokens,
                         temperature=temperature,
                         top_p=top_p,
-                        stop=["\n", "Usuario:"]
+                        stop=["\n", "Usuario:"],
+                        stopping_criteria=stopping
+                    )
+                elif "broadcast" in error_str and hasattr(llm, 'reset'):
+                    # KV-cache inconsistente: reinicio completo y un único reintento
+                    logger.warning("🔄 Reinicio del KV-cache por error de broadcasting")
+                    llm.reset()
+                    return llm(
+                        prompt,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        top_p=top_p,
+                        stop=["\n", "Usuario:"],
+                        stopping_criteria=stopping
                     )
                 else:
                     raise e
-                        
+
+        def _timed_generate(llm):
+            start = time.time()
+            try:
+                return _generate(llm)
+            finally:
+                self.model_router.record(model_tier, time.time() - start)
+                if probe is not None:
+                    self.throughput.record(model_tier, probe)
+
+        try:
+            # Todo acceso al Llama pasa por el worker: sin hilos concurrentes sobre el KV-cache
+            return self.llm_worker.run(_timed_generate, priority=priority, label=f"respuesta ({model_tier})",
+                                       cancel_token=cancel_token)
+        except CancelledError:
+            logger.warning("🛑 Generación cancelada antes de empezar")
+            return {"choices": [{"text": ""}]}
         except Exception as e:
             logger.error(f"❌ Error en generación: {e}")
             raise e
 
+    # ======================================================================================
+    # 🌊 STREAMING LLM → TTS
+    # El LLM genera en modo stream y cada frase terminada pasa a síntesis mientras
+    # se siguen produciendo tokens. Tiempo hasta el primer audio = primera frase + síntesis.
+    # ======================================================================================
+    def _stream_generate(self, prompt, max_tokens, temperature=0.7, top_p=0.9,
+                         cancel_token: Optional[GenerationToken] = None, priority: int = PRIORITY_INTERACTIVE,
+                         model_tier: str = TIER_FULL):
+        """Genera en modo stream (en el worker) y devuelve un iterador de fragmentos de texto"""
+        chunks = queue.Queue()
+
+        def _generate(_):
+            start = time.time()
+            llm = self.model_router.get_llm(model_tier)
+
+            # Misma preparación del KV-cache y sonda de velocidad que _safe_generate
+            reused_tokens = self._prepare_kv_cache(prompt) if llm is self.llm else 0
+            probe = ThroughputProbe(self.model_router.token_budget(model_tier).prompt_tokens(prompt) - reused_tokens)
+            stopping = self._stopping_criteria(cancel_token, probe)
+
+            for chunk in llm(
+                prompt,
+                max_tokens=self.model_router.token_budget(model_tier).max_tokens_for(prompt, max_tokens),
+                temperature=temperature,
+                top_p=top_p,
+                stop=["\n", "Usuario:"],
+                stopping_criteria=stopping,
+                stream=True
+            ):
+                text = chunk.get("choices", [{}])[0].get("text", "")
+                if text:
+                    chunks.put(text)
+
+            self.model_router.record(model_tier, time.time() - start)
+            self.throughput.record(model_tier, probe)
+
+        future = self.llm_worker.submit(_generate, priority=priority, label=f"respuesta en streaming ({model_tier})",
+                                        cancel_token=cancel_token)
+        future.add_done_callback(lambda _: chunks.put(None))
+
+        while True:
+            text = chunks.get()
+            if text is None:
+                break
+            yield text
+
+        if future.cancelled():
+            logger.warning("🛑 Generación en streaming cancelada antes de empezar")
+        elif future.exception() is not None:
+            raise future.exception()
+
+    def _generate_response_streaming(self, prompt: str, is_simple: bool, sentence_queue: queue.Queue,
+                                     response_holder: list, event: threading.Event, cancel_token: GenerationToken,
+                                     model_tier: str = TIER_FULL):
+        """Productor: genera en streaming y encola cada frase completa (None marca el final)"""
+        streamer = SentenceStreamer()
+        refined_text = None
+        try:
+            logger.info("🌊 Generando respuesta en streaming...")
+            overall_start = time.time()
+            max_tokens = self._compute_max_tokens(prompt, is_simple, model_tier)
+            first_sentence_logged = False
+
+            for token in self._stream_generate(prompt, max_tokens=max_tokens, cancel_token=cancel_token,
+                                               model_tier=model_tier):
+                if cancel_token.is_cancelled():
+                    logger.warning("🛑 Generación en streaming cancelada")
+                    break
+
+                for sentence in streamer.feed(token):
+                    if not first_sentence_logged:
+                        logger.info(f"⏱️ Primera frase lista en {time.time() - overall_start:.2f}s")
+                        first_sentence_logged = True
+                    sentence_queue.put(sentence)
+
+            queued_before_finish = len(streamer.sentences)
+            remainder = streamer.finish()
+
+            if queued_before_finish == 0 and remainder:
+                # Respuesta de una sola pieza: TARSBrain la refina como en el modo por lotes
+                refined = self.brain.refine_response_if_needed(" ".join(remainder), prompt)
+                streamer.sentences = [refined]
+                remainder = [refined]
+            elif streamer.sentences:
+                # Varias frases: TARSBrain decide sobre el texto completo (longitud y final), no por frase.
+                # El texto devuelto/guardado queda igual que en el modo por lotes; de lo hablado solo
+                # se puede corregir el final. Hueco conocido: el prefijo que añade la refinación
+                # ("Para que se entienda bien, ...") no se dice, la primera frase ya sonó
+                raw_text = streamer.text
+                refined_text = self.brain.refine_response_if_needed(raw_text, prompt)
+                start = refined_text.find(raw_text)
+                tail = refined_text[start + len(raw_text):].strip() if start >= 0 else ""
+                if remainder and tail and all(c in ".!?" for c in tail):
+                    remainder[-1] += tail
+
+            for sentence in remainder:
+                sentence_queue.put(sentence)
+
+            if not streamer.sentences:
+                logger.warning("⚠️ Respuesta vacía del modelo")
+                fallback = "No puedo elaborar una respuesta coherente ahora."
+                streamer.sentences = [fallback]
+                sentence_queue.put(fallback)
+
+            logger.info(f"🧪 Total proceso respuesta (streaming): {time.time() - overall_start:.2f}s")
+
+        except Exception as e:
+            logger.error(f"❌ Error en generación streaming: {e}")
+            if not streamer.sentences:
+                fallback = "No puedo procesar eso ahora."
+                streamer.sentences = [fallback]
+                sentence_queue.put(fallback)
+        finally:
+            response_holder[0] = refined_text or streamer.text
+            sentence_queue.put(None)
+            event.set()
+
+    def _speak_streamed_response(self, sentence_queue: queue.Queue, cancel_token: GenerationToken,
+                                 timeout: float = 34, prefix: Optional[str] = None) -> bool:
+        """Consumidor: reproduce cada frase según llega. Devuelve True si se habló algo"""
+        spoken_any = False
+        last_utterance = None
+        # Con planificador, toda la respuesta es un único turno abierto que se va llenando
+        turn = self.speech_scheduler.open(PRIORITY_ANSWER, source="chat") if self.speech_scheduler else None
+
+        try:
+            while True:
+                try:
+                    # El timeout se aplica a la espera de cada frase, no a la respuesta completa
+                    sentence = sentence_queue.get(timeout=timeout)
+                except queue.Empty:
+                    logger.warning("⚠️ Timeout esperando la siguiente frase del stream")
+                    cancel_token.cancel("por timeout")
+                    sentence = None
+
+                if sentence is None:
+                    # Lo encolado en el pipeline de voz debe terminar de sonar antes de volver
+                    if turn is not None:
+                        turn.close()
+                        turn.wait()
+                    if last_utterance is not None:
+                        last_utterance.wait()
+                    return spoken_any
+
+                if not spoken_any:
+                    # Fundir el audio de pensamiento (con aplay, esperarlo) antes de la primera frase
+                    if hasattr(self, "sensory") and hasattr(self.sensory, "audio_playing") and self.sensory.audio_playing:
+                        self.sensory.finish_filler()
+                    if prefix:
+                        if turn is not None:
+                            turn.add(self._smart_split_text(prefix, max_len=180))
+                        else:
+                            self._safe_speak(prefix)
+
+                if turn is not None:
+                    turn.add(self._smart_split_text(sentence, max_len=180))
+                elif self.speech_pipeline is not None:
+                    # Sin esperar: la siguiente frase se sintetiza mientras suena esta
+                    last_utterance = self.speech_pipeline.speak(self._smart_split_text(sentence, max_len=180))
+                else:
+                    self._safe_speak(sentence)
+                spoken_any = True
+        except BaseException:
+            # Un consumidor que falla no puede dejar su turno a medias en el planificador
+            if turn is not None:
+                turn.cancel()
+            raise
+        finally:
+            # Cerrado siempre: un turno abierto bloquearía al despachador (y se reanudaría tras una alarma)
+            if turn is not None:
+                turn.close()
+
+    def _store_cached_response(self, user_input: str, cache_context: Optional[str], text: str) -> None:
+        """Guarda una respuesta recién generada en la caché (nunca las de emergencia)"""
+        if self.response_cache is None or cache_context is None:
+            return
+        if not text or text in self.GENERATION_FALLBACKS:
+            return
+        try:
+            self.response_cache.put(user_input, cache_context, text)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo guardar la respuesta en caché: {e}")
+
     def _get_fallback_response(self, prompt, is_simple):
         """Respuestas predeterminadas contextuales"""
         if "?" in prompt:
             return "No pude procesar tu pregunta. ¿Podrías reformularla?"
         return "Disculpa, estoy teniendo dificultades. ¿Podemos intentarlo de nuevo?"
 
-    def _handle_continuation_request(self, user_message: str, response_holder: list, event: threading.Event):
+    def _continuation_context(self) -> tuple:
+        """Tema activo y fragmento de la última respuesta para construir una continuación"""
+        # Obtener tema actual simplificado
+        tema_actual = "general"
+        if hasattr(self, 'theme') and self.theme and self.theme != "desconocido":
+            tema_actual = self.theme
+        elif hasattr(self, 'last_theme') and self.last_theme:
+            tema_actual = self.last_theme
+
+        # Obtener última respuesta para contexto (simplificado)
+        last_response = ""
+        if hasattr(self, 'conversation_memory') and self.conversation_memory.exchanges:
+            last_exchange = self.conversation_memory.exchanges[-1]
+            last_response = last_exchange.get("response", "")
+            # Limitar a un fragmento relevante
+            last_response = last_response[:70] + "..." if len(last_response) > 70 else last_response
+
+        return tema_actual, last_response
+
+    def _build_continuation_prompt(self, tema_actual: str, last_response: str, user_message: str) -> str:
+        """Prompt directo y efectivo - ENFOQUE EN CONTINUIDAD"""
+        # Recortado por presupuesto: primero la última respuesta, luego las instrucciones
+        sections = self.token_budget.fit([
+            ("intro", f"Continúa la conversación directamente sin repetir información. "
+                      f"El usuario está haciendo una pregunta de seguimiento sobre {tema_actual}. ", 3),
+            ("ultima_respuesta", f"Tu última respuesta fue: '{last_response}'. " if last_response else "", 1),
+            ("usuario", f"Ahora el usuario dice: '{user_message}'. ", None),
+            ("estilo", f"Continúa la conversación de forma natural, sin frases introductorias ni definiciones, "
+                       f"Revisa que tu ortografía sea correcta, "
+                       f"como si ya estuvieras en medio de la explicación.", 2),
+            ("cierre", "\nTARS:", None),
+        ], self.token_budget.prompt_budget(30))
+        return "".join(sections.values())
+
+    def _continuation_job(self, prompt: str, cancel_token: Optional[GenerationToken] = None):
+        """Trabajo para el worker: genera la continuación y la devuelve saneada (None si se canceló)"""
+        def _generate(llm):
+            self._prepare_kv_cache(prompt)
+            output = llm(
+                prompt,
+                max_tokens=self.token_budget.max_tokens_for(prompt, 30),  # Hueco exacto, máximo 30
+                temperature=0.8,
+                top_p=0.9,
+                stop=["\nUsuario:", "\nTú:", "###"],
+                stopping_criteria=self._stopping_criteria(cancel_token)
+            )
+            if cancel_token is not None and cancel_token.is_cancelled():
+                return None
+
+            result = self.extract_and_sanitize_response(output)
+
+            # Aplicar correcciones ortográficas generalizadas
+            return self._fix_common_spanish_errors(result)
+
+        return _generate
+
+    def _handle_continuation_request(self, user_message: str, response_holder: list, event: threading.Event,
+                                     cancel_token: Optional[GenerationToken] = None):
         """Manejador de continuaciones con un enfoque simplificado y efectivo"""
         logger.info("🔄 Procesando solicitud de continuación...")
 
         try:
-            # Obtener tema actual simplificado
-            tema_actual = "general"
-            if hasattr(self, 'theme') and self.theme and self.theme != "desconocido":
-                tema_actual = self.theme
-            elif hasattr(self, 'last_theme') and self.last_theme:
-                tema_actual = self.last_theme
-            
+            tema_actual, last_response = self._continuation_context()
             logger.info(f"🔄 Tema activo en continuación: {tema_actual}")
-            
-            # Obtener última respuesta para contexto (simplificado)
-            last_response = ""
-            if hasattr(self, 'conversation_memory') and self.conversation_memory.exchanges:
-                last_exchange = self.conversation_memory.exchanges[-1]
-                last_response = last_exchange.get("response", "")
-                # Limitar a un fragmento relevante
-                last_response = last_response[:70] + "..." if len(last_response) > 70 else last_response
-            
-            # Prompt directo y efectivo - ENFOQUE EN CONTINUIDAD
-            prompt = (
-                f"Continúa la conversación directamente sin repetir información. " 
-                f"El usuario está haciendo una pregunta de seguimiento sobre {tema_actual}. "
-                f"Tu última respuesta fue: '{last_response}'. "
-                f"Ahora el usuario dice: '{user_message}'. "
-                f"Continúa la conversación de forma natural, sin frases introductorias ni definiciones, "
-                f"Revisa que tu ortografía sea correcta, "
-                f"como si ya estuvieras en medio de la explicación.\nTARS:"
-            )
-            
+
+            prompt = self._build_continuation_prompt(tema_actual, last_response, user_message)
             logger.info(f"🧠 Prompt de continuación: {prompt[:100]}...")
             
             # Generar respuesta con un límite estricto de tokens
             try:
-                output = self.llm(
-                    prompt,
-                    max_tokens=30,  # Reducir para evitar desbordamientos
-                    temperature=0.8,
-                    top_p=0.9,
-                    stop=["\nUsuario:", "\nTú:", "###"]
-                )
-                
-                result = self.extract_and_sanitize_response(output)
+                try:
+                    result = self.llm_worker.run(self._continuation_job(prompt, cancel_token),
+                                                 priority=PRIORITY_INTERACTIVE, label="continuación",
+                                                 cancel_token=cancel_token)
+                except CancelledError:
+                    logger.warning("🛑 Continuación cancelada antes de empezar")
+                    return
+
+                if result is None:
+                    logger.warning(f"🛑 Continuación descartada ({cancel_token.reason})")
+                    return
 
-                # Aplicar correcciones ortográficas generalizadas
-                result = self._fix_common_spanish_errors(result)
-                
                 # Si tenemos resultado válido, usarlo
                 if result and len(result) > 5:
                     response_holder[0] = result
@@ -815,6 +1298,63 @@ class TARS:
         finally:
             event.set()
 
+    # ======================================================================================
+    # 🔮 PRECARGA ESPECULATIVA DE CONTINUACIONES
+    # Tras cada respuesta, el worker genera en segundo plano la continuación probable
+    # ("dime más"). Cualquier entrada nueva la cancela si no ha terminado; si el usuario
+    # pide de verdad una continuación de esa misma respuesta, se sirve al instante.
+    # ======================================================================================
+    def _start_continuation_prefetch(self) -> None:
+        """Lanza la precarga de la continuación de la última respuesta (prioridad baja)"""
+        if not self.llm_settings.get("continuation_prefetch", True):
+            return
+
+        self._cancel_continuation_prefetch(keep_finished=False)
+
+        tema_actual, last_response = self._continuation_context()
+        if not last_response:
+            return
+
+        prompt = self._build_continuation_prompt(tema_actual, last_response, "Cuéntame más.")
+        token = GenerationToken(timeout=self.llm_settings.get("prefetch_timeout", 30.0), label="precarga de continuación")
+
+        try:
+            future = self.llm_worker.submit(self._continuation_job(prompt, token), priority=PRIORITY_BACKGROUND,
+                                            label="precarga de continuación", cancel_token=token)
+        except LLMQueueFull:
+            logger.debug("🔮 Cola de inferencia llena: sin precarga de continuación")
+            return
+
+        self._continuation_prefetch = {"last_response": last_response, "token": token, "future": future}
+        logger.info(f"🔮 Precargando continuación sobre '{tema_actual}' en segundo plano")
+
+    def _cancel_continuation_prefetch(self, keep_finished: bool = True) -> None:
+        """Cancela la precarga en curso (las ya terminadas se conservan si keep_finished)"""
+        prefetch = getattr(self, '_continuation_prefetch', None)
+        if not prefetch:
+            return
+        if keep_finished and prefetch["future"].done():
+            return
+        prefetch["token"].cancel("por entrada nueva")
+        self._continuation_prefetch = None
+
+    def _take_prefetched_continuation(self) -> Optional[str]:
+        """Devuelve la continuación precargada si corresponde a la última respuesta y terminó bien"""
+        prefetch = getattr(self, '_continuation_prefetch', None)
+        self._continuation_prefetch = None
+        if not prefetch:
+            return None
+
+        _, last_response = self._continuation_context()
+        future = prefetch["future"]
+        if prefetch["last_response"] != last_response or not future.done() or future.cancelled():
+            return None
+        if future.exception() is not None:
+            return None
+
+        result = future.result()
+        return result if result and len(result) > 5 else None
+
     def _fix_common_spanish_errors(self, text):
         """Corrector simple centrado en problemas específicos (l/ll)"""
         
@@ -867,14 +1407,28 @@ class TARS:
     # =======================
     # 3.3 TTS Y VOICE
     # =======================
-    def _safe_speak(self, text: str) -> None:
+    def _safe_speak(self, text: str, priority: int = PRIORITY_ANSWER, source: str = "chat") -> None:
         """Versión mejorada: habla por fragmentos más largos."""
         if not text:
             return
 
         try:
             # Dividir pero con fragmentos más largos (80 vs 60 caracteres)
-            fragments = self._smart_split_text(text, max_len=180)
+            # Frase fija del banco: entera, sin trocear, para que coincida con lo pre-renderizado
+            if self.phrase_bank is not None and self.phrase_bank.contains(text):
+                fragments = [text]
+            else:
+                fragments = self._smart_split_text(text, max_len=180)
+
+            if self.speech_scheduler is not None:
+                # Turno de palabra con prioridad; síntesis y reproducción solapadas en el pipeline
+                self.speech_scheduler.submit(fragments, priority, source).wait()
+                return
+
+            if self.speech_pipeline is not None:
+                # Síntesis y reproducción solapadas; las pausas las pone el pipeline
+                self.speech_pipeline.speak(fragments).wait()
+                return
 
             for fragment in fragments:
                 if not fragment.strip():
@@ -886,6 +1440,19 @@ class TARS:
         except Exception as e:
             logger.error(f"❌ Error en TTS: {e}")
 
+    def speak_from_producer(self, text: str, priority: int, source: str, coalesce_key: Optional[str] = None):
+        """
+        Voz para productores en otros hilos (scheduler, plugins): encola con prioridad y vuelve enseguida.
+        Sin planificador se habla en el hilo llamante, como antes.
+        """
+        if not text:
+            return None
+        if self.speech_scheduler is not None:
+            return self.speech_scheduler.submit(self._smart_split_text(text, max_len=180), priority,
+                                                source, coalesce_key=coalesce_key)
+        self._safe_speak(text)
+        return None
+
     def _smart_split_text(self, text: str, max_len: int = 180) -> list:
         """Divide el texto respetando frases lógicas, con fragmentos más largos"""
         # Aumentar max_len de 60 a 80 para reducir fragmentos
@@ -1338,6 +1905,9 @@ class TARS:
         start_time = time.time()
         response_handled = False
         leds_active = False
+
+        # Entrada nueva: la precarga especulativa deja paso (si ya terminó, se conserva)
+        self._cancel_continuation_prefetch()
         
         try:
             # PRIMERA PRIORIDAD: Verificar si es un comando para un plugin
@@ -1467,13 +2037,21 @@ class TARS:
 
                 # Preparamos generación con el manejador específico para continuaciones
                 response_ready = threading.Event()
-                response = ["Elaborando respuesta..."]
-                
-                # Lanzar el hilo optimizado para continuaciones
-                threading.Thread(
-                    target=self._handle_continuation_request,
-                    args=(user_input, response, response_ready)
-                ).start()
+                prefetched = self._take_prefetched_continuation()
+                if prefetched:
+                    # 🔮 La continuación ya se generó mientras el usuario escuchaba
+                    logger.info("🔮 Continuación precargada servida al instante")
+                    response = [prefetched]
+                    response_ready.set()
+                else:
+                    response = ["Elaborando respuesta..."]
+                    generation = self._begin_generation(timeout=15.0, label="continuación")
+
+                    # Lanzar el hilo optimizado para continuaciones
+                    threading.Thread(
+                        target=self._handle_continuation_request,
+                        args=(user_input, response, response_ready, generation)
+                    ).start()
                 
                 # Desactivar cualquier modo de sarcasmo forzado
                 if hasattr(self.personality, 'force_sarcasm_next_response'):
@@ -1491,9 +2069,9 @@ class TARS:
                     leds_active = True
                     self._safe_led_control(self.leds.thinking)
                 
-                # 🔊 Lanzar reproducción de audio pregrabado de continuación
+                # 🔊 Lanzar reproducción de audio pregrabado de continuación (no hace falta si ya está precargada)
                 audio_thread = None
-                if hasattr(self, "sensory"):
+                if hasattr(self, "sensory") and not prefetched:
                     audio_thread = self.sensory.play_phrase_async("continuation_responses")
                 
                 # Timeout más corto para continuaciones - 15 segundos máximo
@@ -1501,7 +2079,9 @@ class TARS:
                 
                 if not got_response:
                     logger.warning("⚠️ Timeout en la generación de continuación")
-                    response[0] = "Lo siento, no puedo continuar con esta explicación ahora mismo. ¿Podemos hablar de otra cosa?"
+                    generation.cancel("por timeout")
+                    # Lista nueva: el hilo cancelado ya no puede sobrescribir la disculpa
+                    response = ["Lo siento, no puedo continuar con esta explicación ahora mismo. ¿Podemos hablar de otra cosa?"]
                     self._safe_speak(response[0])  # Solo hablamos aquí en caso de timeout
                 
                 # ✅ Esperar a que el audio termine si sigue sonando
@@ -1532,6 +2112,10 @@ class TARS:
                 # Guardar respuesta y finalizar
                 self.response = response[0]
                 response_handled = True
+
+                # Mientras escucha, preparar la siguiente continuación
+                if got_response:
+                    self._start_continuation_prefetch()
             
             # 3.3 Consultas de identidad (tercera prioridad)
             if not response_handled and analysis["is_identity_query"]:
@@ -1650,6 +2234,8 @@ class TARS:
                 
                 # 4.2 Configurar parámetros según tipo de consulta
                 is_simple = len(user_input.strip().split()) < 6
+                model_tier = self.model_router.route(user_input, analysis)
+                logger.info(f"⚡ Modelo elegido para este turno: {model_tier}")
                 
                 # 4.3 Buscar posibles transiciones para cambios de tema
                 transition = None
@@ -1664,7 +2250,8 @@ class TARS:
                         logger.error(f"❌ Error al obtener frase de transición: {e}")
                 
                 # 4.4 Construir prompt integrado
-                prompt = self._build_integrated_prompt(user_input, analysis)
+                prompt = self._build_integrated_prompt(user_input, analysis, answer_tokens=self.llm_settings.get("min_answer_tokens", 40),
+                                                       model_tier=model_tier)
 
                 # 🆕 4.4.5 Detector de contexto insuficiente -> punto 4.5.
                 if self._insufficient_context(user_input, prompt):
@@ -1692,50 +2279,114 @@ class TARS:
                     self.response = refined_response
                     return refined_response  # Salir temprano, no continuar con LLM
 
+                # 4.4.6 Caché de respuestas: las preguntas repetidas no pasan por el LLM
+                cache_context = None
+                cached_response = None
+                if self.response_cache is not None:
+                    cache_context = self.response_cache.context_key(analysis["emotion_data"].get("emotion"), analysis["tema"])
+                    cache_hit = self.response_cache.lookup(user_input, cache_context)
+                    if cache_hit:
+                        cached_response = cache_hit[0]
+
                 # 4.5 🔊 Lanzar reproducción de audio pregrabado mientras se genera la respuesta
                 audio_thread = None
-                if hasattr(self, "sensory"):  # Cambiado de "feedback" a "sensory"
+                if hasattr(self, "sensory") and cached_response is None:  # Cambiado de "feedback" a "sensory"
                     audio_thread = self.sensory.play_phrase_async("thinking_responses")
 
                 # 4.6 Iniciar hilo de generación
                 response_ready = threading.Event()
                 response = ["Pensando..."]
 
-                # 🧠 Hilo de generación de respuesta
-                thinking_thread = threading.Thread(
-                    target=self._generate_response_async, 
-                    args=(prompt, is_simple, response, response_ready, analysis["is_continuation"])
-                )
-                thinking_thread.start()
+                if self.streaming_enabled and cached_response is None:
+                    # 🌊 Modo streaming: las frases se reproducen mientras el LLM sigue generando
+                    sentence_queue = queue.Queue()
+                    cancel_generation = self._begin_generation(label="respuesta en streaming")
 
-                # 4.7 Esperar respuesta con timeout
-                last_filler_end_time = time.time()
-                got_response = response_ready.wait(34)
-                real_wait_time = time.time() - last_filler_end_time
-                logger.info(f"⏱️ Tiempo de espera real tras última frase: {real_wait_time:.2f}s")
+                    thinking_thread = threading.Thread(
+                        target=self._generate_response_streaming,
+                        args=(prompt, is_simple, sentence_queue, response, response_ready, cancel_generation, model_tier)
+                    )
+                    thinking_thread.start()
+
+                    # 4.7 Reproducir frases según llegan (la transición va delante de la primera)
+                    stream_start_time = time.time()
+                    spoken_prefix = transition if topic_changed and transition else None
+                    got_response = self._speak_streamed_response(sentence_queue, cancel_generation, timeout=34, prefix=spoken_prefix)
+                    logger.info(f"⏱️ Respuesta en streaming reproducida en {time.time() - stream_start_time:.2f}s")
+
+                    # 4.8 Manejar timeout o error
+                    if not got_response:
+                        logger.warning("⚠️ Timeout en la generación de respuesta")
+                        # Lista nueva: el hilo cancelado ya no puede sobrescribir la disculpa
+                        response = ["Lo siento, estoy teniendo problemas para responder. ¿Puedes intentar de nuevo?"]
+                        self._safe_speak(response[0])
+                    elif not cancel_generation.is_cancelled():
+                        # Solo respuestas completas: un stream cortado no se cachea
+                        self._store_cached_response(user_input, cache_context, response[0])
+
+                    # 4.9 Post-procesamiento: la referencia emocional se reproduce como cierre
+                    try:
+                        tema = self.personality.maybe_add_reference(user_input)
+                        if tema:
+                            logger.info(f"🧠 Referencia emocional añadida: {tema}")
+                            self._safe_speak(tema)
+                            response[0] += " " + tema
+                    except Exception as e:
+                        logger.error(f"❌ Error añadiendo referencia emocional: {e}")
 
-                # 4.8 Manejar timeout o error
-                if not got_response:
-                    logger.warning("⚠️ Timeout en la generación de respuesta")
-                    response[0] = "Lo siento, estoy teniendo problemas para responder. ¿Puedes intentar de nuevo?"
+                    if spoken_prefix and got_response:
+                        response[0] = f"{transition} {response[0]}"
+                        logger.info(f"🔄 Añadida transición a la respuesta: '{transition}'")
 
-                # 4.9 Post-procesamiento de respuesta
-                # Añadir referencia emocional si aplica
-                try:
-                    tema = self.personality.maybe_add_reference(user_input)
-                    if tema:
-                        logger.info(f"🧠 Referencia emocional añadida: {tema}")
-                        response[0] += " " + tema
-                except Exception as e:
-                    logger.error(f"❌ Error añadiendo referencia emocional: {e}")
+                else:
+                    if cached_response is not None:
+                        # 💡 Acierto de caché: sin LLM. Se guardó ya refinada por TARSBrain (no se refina dos veces);
+                        # el post-procesamiento (referencia emocional, transición) sí se aplica igual
+                        response[0] = cached_response
+                        got_response = True
+                    else:
+                        # 🧠 Hilo de generación de respuesta (con el mismo plazo que la espera)
+                        generation = self._begin_generation(timeout=34, label="respuesta")
+                        thinking_thread = threading.Thread(
+                            target=self._generate_response_async,
+                            args=(prompt, is_simple, response, response_ready, analysis["is_continuation"], generation, model_tier)
+                        )
+                        thinking_thread.start()
+
+                        # 4.7 Esperar respuesta con timeout
+                        last_filler_end_time = time.time()
+                        got_response = response_ready.wait(34)
+                        real_wait_time = time.time() - last_filler_end_time
+                        logger.info(f"⏱️ Tiempo de espera real tras última frase: {real_wait_time:.2f}s")
+
+                        # 4.8 Manejar timeout o error
+                        if not got_response:
+                            logger.warning("⚠️ Timeout en la generación de respuesta")
+                            generation.cancel("por timeout")
+                            # Lista nueva: el hilo cancelado ya no puede sobrescribir la disculpa
+                            response = ["Lo siento, estoy teniendo problemas para responder. ¿Puedes intentar de nuevo?"]
+                        else:
+                            self._store_cached_response(user_input, cache_context, response[0])
+
+                    # 4.9 Post-procesamiento de respuesta
+                    # Añadir referencia emocional si aplica
+                    try:
+                        tema = self.personality.maybe_add_reference(user_input)
+                        if tema:
+                            logger.info(f"🧠 Referencia emocional añadida: {tema}")
+                            response[0] += " " + tema
+                    except Exception as e:
+                        logger.error(f"❌ Error añadiendo referencia emocional: {e}")
 
-                # Añadir transición si hubo cambio de tema
-                if topic_changed and transition:
-                    response[0] = f"{transition} {response[0]}"
-                    logger.info(f"🔄 Añadida transición a la respuesta: '{transition}'")
+                    # Añadir transición si hubo cambio de tema
+                    if topic_changed and transition:
+                        response[0] = f"{transition} {response[0]}"
+                        logger.info(f"🔄 Añadida transición a la respuesta: '{transition}'")
 
-                # 4.10 Emitir respuesta y guardar en memoria
-                self._safe_speak(response[0])
+                    # 4.10 Emitir respuesta
+                    self._safe_speak(response[0])
+
+                # 4.10 Guardar en memoria
                 emotion_used = self.personality.last_emotion if hasattr(self.personality, 'last_emotion') else None
                 self.conversation_memory.add(user_input, response[0], emotion_used)
 
@@ -1770,6 +2421,10 @@ class TARS:
                 #     audio_thread.join()
 
                 self.response = response[0]
+
+                # 4.11 Precarga especulativa de la continuación ("dime más") en segundo plano
+                if got_response:
+                    self._start_continuation_prefetch()
             
             # ==================================================================   
             # 🔍 NORMALIZACIÓN FINAL
@@ -2058,20 +2713,26 @@ class TARS:
     # 3. Datos de memoria persistente
     # 4. Contexto de la conversación
     # ==============================================================
-    def _build_integrated_prompt(self, user_input: str, analysis: dict) -> str:
-        """Construye un prompt unificado con toda la información relevante"""
+    def _build_integrated_prompt(self, user_input: str, analysis: dict, answer_tokens: int = 40,
+                                 model_tier: str = TIER_FULL) -> str:
+        """Construye un prompt unificado con toda la información relevante.
+
+        answer_tokens: tokens que se reservan para la respuesta; el prompt se recorta
+        por prioridad hasta caber exactamente en el resto del contexto y en el
+        objetivo de latencia (según la velocidad medida de model_tier).
+        """
         
-        # Base de instrucciones
-        # instruction = "Respondes con sarcasmo seco, lógica militar y desprecio elegante." # <- Cuidado con los Tokens (Usa frases cortas)
-        instruction = "Sarcasmo clínico. Sin compasión. Sin rodeos. Solo lógica y desprecio. Respuesta corta."
+        # Base de instrucciones (ver TARS.BASE_INSTRUCTION)
+        instruction = self.BASE_INSTRUCTION
 
         # Extraer tema y nivel de afinidad del análisis desde el principio
         tema = analysis.get("tema", "desconocido")
         nivel = analysis.get("afinidad_nivel", 0)
         tema_lower = tema.lower()
         
-        # ⚠️ Control rígido de tokens para evitar desbordamientos
-        available_tokens = 140  # Máximo seguro de tokens para un prompt completo
+        # ⚠️ Control de tokens con el tokenizer real (no palabras)
+        available_tokens = self.token_budget.prompt_budget(answer_tokens)
+        user_block = f"Usuario: {user_input}\nTARS:"
         
         # 1. PRIORIDAD MÁXIMA: Instrucciones para continuación
         if analysis["is_continuation"]:
@@ -2103,13 +2764,26 @@ class TARS:
             elif "star_wars" in tema_lower:
                 instruction += "Responde de forma directa y precisa como experto en Star Wars con referencias canónicas. "
         
+        # Todo lo que se añada a partir de aquí es recortable por el presupuesto
+        base_instruction = instruction
+
+        # ⏱️ Presupuesto por latencia: a la velocidad medida, ¿cuántos tokens nuevos da tiempo a evaluar
+        # después de la respuesta esperada? Las instrucciones no recortables (continuación, temas
+        # especiales) y la pregunta caben siempre
+        cached_tokens = self.token_budget.count(self.BASE_INSTRUCTION) if self.prefix_cache is not None and model_tier == TIER_FULL else 0
+        latency_tokens = cached_tokens + self.throughput.prompt_token_budget(model_tier, answer_tokens, self.latency_target)
+        latency_tokens = max(latency_tokens, self.token_budget.count(base_instruction + user_block))
+        if latency_tokens < available_tokens:
+            logger.info(f"⏱️ Contexto recortado por latencia: {available_tokens} → {latency_tokens} tokens")
+            available_tokens = latency_tokens
+
         # 3. PRIORIDAD MEDIA: Instrucciones básicas
         if hasattr(self, 'simplify_output') and self.simplify_output:
             instruction += "Responde con claridad y evita tecnicismos. "
         
         # 4. PRIORIDAD BAJA: Emociones 
-        current_tokens = len(instruction.split())
-        remaining_tokens = available_tokens - current_tokens - len(user_input.split()) - 5
+        current_tokens = self.token_budget.count(instruction)
+        remaining_tokens = available_tokens - current_tokens - self.token_budget.count(user_block)
 
         if remaining_tokens > 15 and not is_special_topic:
             
@@ -2166,16 +2840,12 @@ class TARS:
             elif nivel == -1:
                 instruction += f"Responde con sarcasmo sobre '{tema}'. "
         
-        # === CONTROL DE LONGITUD ===
-        instruction_tokens = len(instruction.split())
-        if instruction_tokens > 60:
-            logger.warning(f"⚠️ Instrucciones demasiado largas ({instruction_tokens} tokens). Reduciendo...")
-            parts = instruction.split(". ")
-            instruction = ". ".join(parts[:3]) + ". "  # Mantener solo 3 instrucciones principales
-        
+        # === ESPACIO LIBRE PARA MEMORIA ===
+        free_tokens = available_tokens - self.token_budget.count(instruction) - self.token_budget.count(user_block)
+
         # === INYECCIÓN DE MEMORIA ===
         memory_context = ""
-        if tema != "desconocido" and len(instruction.split()) < 65:
+        if tema != "desconocido" and free_tokens > 0:
             # Memoria de preferencias
             tema_relevante = False
             tema_likes = []
@@ -2202,7 +2872,7 @@ class TARS:
                     memory_context += f"Al usuario no le gusta {tema_dislikes[0]}. "
         
         # Memoria episódica (opcional)
-        if tema != "desconocido" and len(instruction.split()) < 60:
+        if tema != "desconocido" and free_tokens > 10:
             try:
                 related_memories = getattr(self, 'memory', None) and self.memory.find_related_memories(tema, threshold=0.60, max_results=1)
                 if related_memories and not memory_context:
@@ -2211,19 +2881,29 @@ class TARS:
             except Exception as e:
                 logger.error(f"❌ Error inyectando memoria episódica: {e}")
         
-        if memory_context:
-            instruction = memory_context + instruction
-            logger.info(f"🧠 Memoria inyectada: '{memory_context}'")
-        
+        # === CONTROL DE LONGITUD (PRESUPUESTO EXACTO) ===
+        # Orden de recorte: memoria → instrucciones de estilo → instrucción base → entrada del usuario
+        # La instrucción base va delante para que su KV-cache sea un prefijo reutilizable
+        sections = self.token_budget.fit([
+            ("instruccion_base", base_instruction, 3),
+            ("memoria", memory_context, 1),
+            ("instruccion_estilo", instruction[len(base_instruction):], 2),
+            ("usuario", user_block, None),
+        ], available_tokens)
+
+        if sections["memoria"]:
+            logger.info(f"🧠 Memoria inyectada: '{sections['memoria']}'")
+
         # === CONSTRUCCIÓN FINAL ===
-        prompt = f"{instruction}Usuario: {user_input}\nTARS:"
+        prompt = sections["instruccion_base"] + sections["memoria"] + sections["instruccion_estilo"] + sections["usuario"]
+        self._last_prompt_prefix = sections["instruccion_base"]
         
         # Verificación final
         if analysis["is_continuation"] and "CONTINUACIÓN" not in prompt:
             logger.error("❌ ERROR CRÍTICO: instrucción de continuación perdida")
             prompt = f"CONTINUACIÓN del tema {tema}. {prompt}"
         
-        logger.info(f"📝 Prompt final ({len(prompt.split())} tokens): {prompt[:100]}...")
+        logger.info(f"📝 Prompt final ({self.token_budget.prompt_tokens(prompt)}/{available_tokens} tokens): {prompt[:100]}...")
         return prompt
 
     # ==================================================================
@@ -2861,6 +3541,10 @@ def main():
             time.sleep(2)
             
     # Guardar estadísticas antes de salir
+    if listener:
+        logger.info(f"📊 Captura de voz: {listener.get_stats()}")
+        listener.close()
+
     try:
         tars.personality.save_stats()
         logger.info("✅ Estadísticas guardadas correctamente")
@@ -2874,6 +3558,34 @@ def main():
     except Exception as e:
         logger.error(f"❌ Error cerrando sesión de memoria: {e}")
 
+    try:
+        if hasattr(tars, 'llm_worker') and tars.llm_worker:
+            logger.info(f"📊 Worker de inferencia: {tars.llm_worker.get_stats()}")
+            logger.info(f"📊 Latencias por modelo: {tars.model_router.get_stats()}")
+            if tars.response_cache:
+                logger.info(f"📊 Caché de respuestas: {tars.response_cache.get_stats()}")
+            logger.info(f"📊 Velocidad del LLM: {tars.throughput.get_stats()}")
+            tars.llm_worker.stop()
+            tars.model_router.close()
+            if tars.speech_pipeline:
+                logger.info(f"📊 Pipeline de voz: {tars.speech_pipeline.get_stats()}")
+                if tars.tts.audio_cache:
+                    logger.info(f"📊 Caché de voz: {tars.tts.audio_cache.get_stats()}")
+                if tars.phrase_bank and tars.phrase_bank.active:
+                    logger.info(f"📊 Banco de frases: {tars.phrase_bank.get_stats()}")
+                if tars.speech_scheduler:
+                    logger.info(f"📊 Planificador de voz: {tars.speech_scheduler.get_stats()}")
+                    tars.speech_scheduler.stop()
+                tars.speech_pipeline.stop()
+                if tars.tts.audio_cache:
+                    # Índice con escritura diferida: lo pendiente se guarda al apagar
+                    tars.tts.audio_cache.flush()
+            if tars.audio_output:
+                logger.info(f"📊 Salida de audio: {tars.audio_output.get_stats()}")
+                tars.audio_output.close()
+    except Exception as e:
+        logger.error(f"❌ Error deteniendo el worker de inferencia: {e}")
+
 # ===============================================
 # 6. FUNCIONES DEL PROMPT
 # Emocones y afinidades inyectadas al LLM
@@ -0,0 +1,202 @@
+# ===============================================
+# THROUGHPUT MODEL - Velocidad Medida del LLM para TARS-BSK
+# Objetivo: Pedir los tokens que dé tiempo a generar, no los que queden bonitos
+# Dependencias: json para el historial, y un termómetro implícito (la CPU caliente se nota aquí)
+# Advertencia: 60 tokens a 3 tok/s son 20 segundos. El usuario no es tan paciente.
+# ===============================================
+
+# ===============================================
+# 1. CONFIGURACIÓN INICIAL Y DEPENDENCIAS
+# ===============================================
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger("TARS.Throughput")
+
+# Valores de arranque en frío para Phi-3-mini Q4 en una Raspberry Pi 5 (3 hilos).
+# Con los de settings (10 s, 40 tokens de respuesta) dejan ~66 tokens de prompt: nunca presupuesto cero
+DEFAULT_PROMPT_TPS = 20.0
+DEFAULT_GENERATION_TPS = 6.0
+
+# Tokens de prompt nuevos que se conceden siempre, aunque la respuesta sola ya agote el objetivo:
+# sin ellos memoria, emoción y estilo desaparecerían justo cuando la Pi va más lenta
+MIN_PROMPT_TOKENS = 48
+
+# ===============================================
+# 2. SONDA POR PETICIÓN
+# ===============================================
+class ThroughputProbe:
+    """
+    Criterio de parada que nunca detiene nada: solo anota cuándo llega cada token.
+    La primera llamada marca el final de la evaluación del prompt.
+    """
+
+    def __init__(self, eval_tokens: int):
+        self.eval_tokens = eval_tokens
+        self.started_at = time.time()
+        self.first_token_at: Optional[float] = None
+        self.last_token_at: Optional[float] = None
+        self.generated = 0
+
+    def __call__(self, input_ids, logits) -> bool:
+        now = time.time()
+        if self.first_token_at is None:
+            self.first_token_at = now
+        self.last_token_at = now
+        self.generated += 1
+        return False
+
+    @property
+    def prompt_time(self) -> Optional[float]:
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def generation_time(self) -> Optional[float]:
+        if self.first_token_at is None or self.generated < 2:
+            return None
+        return self.last_token_at - self.first_token_at
+
+# ===============================================
+# 3. CLASE PRINCIPAL THROUGHPUTMODEL
+# ===============================================
+class ThroughputModel:
+    """
+    Modelo móvil de velocidad (tokens/s) por nivel de modelo:
+
+    - prompt_tps: tokens de prompt evaluados por segundo
+    - generation_tps: tokens generados por segundo
+    - Mediana de las últimas muestras, persistida para arrancar en caliente
+    """
+
+    # =======================
+    # 3.1 INICIALIZACIÓN
+    # =======================
+    def __init__(self, storage_path, history_size: int = 30):
+        """
+        :param storage_path: JSON con el historial de muestras
+        :param history_size: Muestras por nivel que se conservan
+        """
+        self.storage_path = Path(storage_path)
+        self.history_size = history_size
+        self.samples: Dict[str, Dict[str, deque]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _tier_samples(self, tier: str) -> Dict[str, deque]:
+        if tier not in self.samples:
+            self.samples[tier] = {
+                "prompt_tps": deque(maxlen=self.history_size),
+                "generation_tps": deque(maxlen=self.history_size),
+            }
+        return self.samples[tier]
+
+    # =======================
+    # 3.2 REGISTRO DE MEDIDAS
+    # =======================
+    def record(self, tier: str, probe: ThroughputProbe):
+        """Incorpora las medidas de una petición terminada"""
+        prompt_time = probe.prompt_time
+        generation_time = probe.generation_time
+
+        with self._lock:
+            samples = self._tier_samples(tier)
+            # Con pocos tokens que evaluar la medida es puro ruido (prefijo restaurado)
+            if prompt_time and probe.eval_tokens >= 8:
+                samples["prompt_tps"].append(round(probe.eval_tokens / prompt_time, 2))
+            if generation_time:
+                samples["generation_tps"].append(round((probe.generated - 1) / generation_time, 2))
+            self._save()
+
+        logger.info(f"📈 Velocidad [{tier}]: prompt {self.prompt_tps(tier):.1f} tok/s, "
+                    f"generación {self.generation_tps(tier):.1f} tok/s")
+
+    @staticmethod
+    def _median(values, default: float) -> float:
+        if not values:
+            return default
+        ordered = sorted(values)
+        return ordered[len(ordered) // 2]
+
+    def prompt_tps(self, tier: str) -> float:
+        return self._median(self.samples.get(tier, {}).get("prompt_tps"), DEFAULT_PROMPT_TPS)
+
+    def generation_tps(self, tier: str) -> float:
+        return self._median(self.samples.get(tier, {}).get("generation_tps"), DEFAULT_GENERATION_TPS)
+
+    # =======================
+    # 3.3 PLANIFICACIÓN CONTRA EL OBJETIVO DE LATENCIA
+    # =======================
+    def estimate(self, tier: str, eval_tokens: int, max_tokens: int) -> float:
+        """Segundos estimados para evaluar eval_tokens y generar max_tokens"""
+        return eval_tokens / self.prompt_tps(tier) + max_tokens / self.generation_tps(tier)
+
+    def max_tokens_for_deadline(self, tier: str, eval_tokens: int, desired: int,
+                                target_seconds: float, minimum: int = 12) -> int:
+        """max_tokens que caben en target_seconds tras evaluar el prompt (nunca menos de minimum)"""
+        remaining = target_seconds - eval_tokens / self.prompt_tps(tier)
+        affordable = int(remaining * self.generation_tps(tier))
+        return max(minimum, min(desired, affordable))
+
+    def prompt_token_budget(self, tier: str, answer_tokens: int, target_seconds: float,
+                            minimum: int = MIN_PROMPT_TOKENS) -> int:
+        """
+        Tokens de prompt nuevos (no cacheados) que caben en el tiempo que deja la respuesta esperada.
+        Nunca menos de minimum: si la respuesta sola ya no cabe, el objetivo se incumple igual
+        y recortar el contexto a cero solo empeora la respuesta.
+        """
+        remaining = max(0.0, target_seconds - answer_tokens / self.generation_tps(tier))
+        return max(minimum, int(remaining * self.prompt_tps(tier)))
+
+    # =======================
+    # 3.4 PERSISTENCIA
+    # =======================
+    def _load(self):
+        if not self.storage_path.exists():
+            return
+        try:
+            with open(self.storage_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for tier, samples in data.items():
+                target = self._tier_samples(tier)
+                for name in ("prompt_tps", "generation_tps"):
+                    target[name].extend(samples.get(name, []))
+            logger.info(f"📈 Historial de velocidad cargado: "
+                        + ", ".join(f"{t}={self.generation_tps(t):.1f} tok/s" for t in self.samples))
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo cargar el historial de velocidad: {e}")
+
+    def _save(self):
+        try:
+            self.storage_path.parent.mkdir(parents=True, exist_ok=True)
+            data = {tier: {name: list(values) for name, values in samples.items()}
+                    for tier, samples in self.samples.items()}
+            tmp_path = self.storage_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.storage_path)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo guardar el historial de velocidad: {e}")
+
+    def get_stats(self) -> dict:
+        return {tier: {"prompt_tps": self.prompt_tps(tier), "generation_tps": self.generation_tps(tier),
+                       "samples": len(samples["generation_tps"])}
+                for tier, samples in self.samples.items()}
+
+# ===============================================
+# ESTADO: CRONOMÉTRICAMENTE REALISTA (sabe lo lento que es)
+# ÚLTIMA ACTUALIZACIÓN: Cuando los 60 tokens fijos se toparon con una CPU a 80 °C
+# FILOSOFÍA: "Prometer menos palabras y cumplir el plazo."
+# ===============================================
+#
+#           THIS IS THE THROUGHPUT WAY...
+#           (medir antes de prometer)
+#
+# ===============================================
@@ -0,0 +1,171 @@
+# ===============================================
+# TOKEN BUDGET - Contabilidad Exacta de Tokens para TARS-BSK
+# Objetivo: Dejar de contar palabras y fingir que son tokens
+# Dependencias: El tokenizer del propio Llama, y una caché para no tokenizar 40 veces lo mismo
+# Advertencia: En español "desoxirribonucleico" no es 1 token. Nunca lo fue.
+# ===============================================
+
+# ===============================================
+# 1. CONFIGURACIÓN INICIAL Y DEPENDENCIAS
+# ===============================================
+import logging
+import math
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("TARS.TokenBudget")
+
+# ===============================================
+# 2. CLASE PRINCIPAL TOKENBUDGET
+# ===============================================
+class TokenBudget:
+    """
+    Presupuesto de contexto basado en el tokenizer real del modelo.
+
+    - count(): tokens exactos de un fragmento (con caché LRU)
+    - fit(): recorta secciones del prompt por prioridad hasta que caben
+    - max_tokens_for(): max_tokens a partir del hueco exacto que deja el prompt
+    """
+
+    # =======================
+    # 2.1 INICIALIZACIÓN
+    # =======================
+    def __init__(self, llm, n_ctx: int, safety_margin: int = 4, cache_size: int = 256):
+        """
+        :param llm: Instancia Llama (usa llm.tokenize / llm.detokenize)
+        :param n_ctx: Tamaño de contexto con el que se cargó el modelo
+        :param safety_margin: Tokens de reserva para evitar el "exceed context" por redondeos
+        :param cache_size: Fragmentos tokenizados que se guardan en la caché LRU
+        """
+        self.llm = llm
+        self.n_ctx = n_ctx
+        self.safety_margin = safety_margin
+        self._tokenize_cached = lru_cache(maxsize=cache_size)(self._tokenize)
+
+    # =======================
+    # 2.2 TOKENIZACIÓN CON CACHÉ
+    # =======================
+    def _tokenize(self, text: str) -> Tuple[int, ...]:
+        """Tokeniza sin BOS. Si el modelo no expone tokenizer, devuelve tupla vacía"""
+        if not text:
+            return ()
+        try:
+            return tuple(self.llm.tokenize(text.encode("utf-8"), add_bos=False))
+        except Exception as e:
+            logger.debug(f"⚠️ Tokenizer no disponible ({e}), usando estimación")
+            return ()
+
+    def tokens(self, text: str) -> Tuple[int, ...]:
+        """Tokens del fragmento (cacheados)"""
+        return self._tokenize_cached(text or "")
+
+    def count(self, text: str) -> int:
+        """Número de tokens del fragmento"""
+        if not text:
+            return 0
+        tokens = self.tokens(text)
+        if tokens:
+            return len(tokens)
+        # Estimación conservadora para español si no hay tokenizer (~3 caracteres por token)
+        return math.ceil(len(text) / 3)
+
+    def prompt_tokens(self, prompt: str) -> int:
+        """Tokens que ocupará el prompt completo en el contexto (incluye BOS)"""
+        return self.count(prompt) + 1
+
+    def cache_info(self):
+        """Estadísticas de la caché LRU de tokenización"""
+        return self._tokenize_cached.cache_info()
+
+    # =======================
+    # 2.3 PRESUPUESTOS
+    # =======================
+    def prompt_budget(self, reserve_tokens: int) -> int:
+        """Tokens disponibles para el prompt si se reservan reserve_tokens para la respuesta"""
+        return max(0, self.n_ctx - reserve_tokens - self.safety_margin - 1)
+
+    def max_tokens_for(self, prompt: str, desired: int, minimum: int = 8) -> int:
+        """
+        max_tokens ajustado al hueco exacto que deja el prompt.
+        Nunca supera desired; si el hueco es menor que minimum, devuelve el hueco (puede ser 0).
+        """
+        available = self.n_ctx - self.prompt_tokens(prompt) - self.safety_margin
+        if available < minimum:
+            logger.warning(f"⚠️ Prompt casi llena el contexto: solo quedan {max(0, available)} tokens")
+            return max(0, available)
+        return min(desired, available)
+
+    # =======================
+    # 2.4 RECORTE POR PRIORIDAD
+    # =======================
+    def truncate(self, text: str, max_tokens: int, keep_end: bool = False) -> str:
+        """Recorta un texto a max_tokens exactos (por el final, o por el principio si keep_end)"""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+
+        tokens = self.tokens(text)
+        if tokens:
+            kept = tokens[-max_tokens:] if keep_end else tokens[:max_tokens]
+            try:
+                return self.llm.detokenize(list(kept)).decode("utf-8", errors="ignore")
+            except Exception:
+                pass
+
+        # Sin tokenizer: recorte por caracteres con la misma estimación
+        chars = max_tokens * 3
+        return text[-chars:] if keep_end else text[:chars]
+
+    def fit(self, sections: List[Tuple[str, str, Optional[int]]], budget: int) -> Dict[str, str]:
+        """
+        Recorta secciones hasta que su concatenación cabe en budget tokens.
+
+        :param sections: Lista ordenada (nombre, texto, prioridad). Prioridad más baja = se recorta
+                         antes; None = obligatoria (solo se trunca si no queda otra opción).
+        :param budget: Tokens máximos para la concatenación de todas las secciones
+        :return: Diccionario nombre → texto recortado
+        """
+        texts = {name: text or "" for name, text, _ in sections}
+        order = [name for name, _, _ in sections]
+        priorities = {name: priority for name, _, priority in sections}
+
+        def total() -> int:
+            return self.count("".join(texts[name] for name in order))
+
+        # 1. Secciones opcionales: quitar frases del final, de menor a mayor prioridad
+        optional = sorted((n for n in order if priorities[n] is not None), key=lambda n: priorities[n])
+        for name in optional:
+            while texts[name] and total() > budget:
+                sentences = re.split(r'(?<=[.!?])\s+', texts[name].strip())
+                if len(sentences) > 1:
+                    texts[name] = " ".join(sentences[:-1]) + " "
+                else:
+                    texts[name] = ""
+                logger.info(f"✂️ Presupuesto: recortada sección '{name}'")
+            if total() <= budget:
+                return texts
+
+        # 2. Último recurso: truncar la sección obligatoria más larga conservando su final
+        overflow = total() - budget
+        if overflow > 0:
+            required = [n for n in order if priorities[n] is None and texts[n]]
+            if required:
+                longest = max(required, key=lambda n: self.count(texts[n]))
+                keep = max(0, self.count(texts[longest]) - overflow)
+                texts[longest] = self.truncate(texts[longest], keep, keep_end=True)
+                logger.warning(f"⚠️ Presupuesto: sección obligatoria '{longest}' truncada a {keep} tokens")
+
+        return texts
+
+# ===============================================
+# ESTADO: CONTABLEMENTE PRECISO (por primera vez en la historia de TARS)
+# ÚLTIMA ACTUALIZACIÓN: Cuando "len(prompt.split())" fue condenado por falsificación de cuentas
+# FILOSOFÍA: "Una palabra no es un token. Un token no es una promesa."
+# ===============================================
+#
+#           THIS IS THE BUDGET WAY...
+#           (cada token cuenta, literalmente)
+#
+# ===============================================
@@ -0,0 +1,134 @@
+# ===============================================
+# CAPTURE RING - Memoria Circular del Micrófono de TARS-BSK
+# Objetivo: Un único stream de captura escribiendo sin parar en un buffer NumPy reservado de antemano
+# Dependencias: NumPy, threading
+# Advertencia: Lo que dices mientras TARS contesta "te escucho" también queda grabado. Eso es la idea.
+# ===============================================
+
+# ===============================================
+# 1. CONFIGURACIÓN INICIAL Y DEPENDENCIAS
+# ===============================================
+import logging
+import threading
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger("TARS.CaptureRing")
+
+# ===============================================
+# 2. BUFFER CIRCULAR
+# ===============================================
+class CaptureRing:
+    """
+    Buffer circular int16 alimentado desde el callback de sounddevice.
+
+    - write() copia el bloque directamente al buffer (sin bytes() ni colas por bloque)
+    - Las posiciones son absolutas y crecientes (muestras desde que se abrió el stream):
+      cada modo de escucha es un RingCursor que lee desde la posición que quiera
+    - Un lector que se queda más de capacity atrás pierde lo más antiguo y lo registra como overrun
+    """
+
+    def __init__(self, capacity: int, block_size: int = 8192):
+        """
+        :param capacity: Muestras que caben en el anillo (segundos * frecuencia)
+        :param block_size: Bloque máximo que entrega el callback (margen de seguridad del lector)
+        """
+        self.capacity = int(capacity)
+        self.block_size = int(block_size)
+        self._buffer = np.zeros(self.capacity, dtype=np.int16)
+        self._written = 0
+        self._cond = threading.Condition()
+        self.overruns = 0
+
+    @property
+    def position(self) -> int:
+        """Posición absoluta de la próxima muestra que se escribirá"""
+        return self._written
+
+    def write(self, samples: np.ndarray):
+        """Llamado desde el callback de audio: copia en el anillo y despierta a los lectores"""
+        count = len(samples)
+        if count > self.capacity:
+            samples = samples[-self.capacity:]
+            self._written += count - self.capacity
+            count = self.capacity
+
+        start = self._written % self.capacity
+        first = min(count, self.capacity - start)
+        self._buffer[start:start + first] = samples[:first]
+        self._buffer[:count - first] = samples[first:]
+
+        with self._cond:
+            self._written += count
+            self._cond.notify_all()
+
+    def cursor(self, start: Optional[int] = None, block_size: Optional[int] = None) -> "RingCursor":
+        """Cursor de lectura desde start (por defecto, ahora mismo)"""
+        position = self.position if start is None else max(start, self.oldest())
+        return RingCursor(self, position, block_size or self.block_size)
+
+    def oldest(self) -> int:
+        """Posición más antigua que aún se puede leer con seguridad"""
+        return max(0, self._written - self.capacity + 2 * self.block_size)
+
+    def _copy(self, position: int, out: np.ndarray):
+        start = position % self.capacity
+        first = min(len(out), self.capacity - start)
+        out[:first] = self._buffer[start:start + first]
+        out[first:] = self._buffer[:len(out) - first]
+
+    def get_stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "written": self._written,
+            "overruns": self.overruns,
+        }
+
+# ===============================================
+# 3. CURSOR DE LECTURA
+# ===============================================
+class RingCursor:
+    """Lector independiente sobre el anillo, con su propio buffer de salida reservado"""
+
+    def __init__(self, ring: CaptureRing, position: int, block_size: int):
+        self.ring = ring
+        self.position = position
+        self._out = np.empty(block_size, dtype=np.int16)
+
+    def lag(self) -> int:
+        """Muestras capturadas pendientes de leer"""
+        return self.ring.position - self.position
+
+    def read(self, timeout: float = 0.5) -> Optional[np.ndarray]:
+        """
+        Devuelve hasta block_size muestras nuevas (vista sobre el buffer del cursor, válida hasta
+        la siguiente lectura) o None si no llegó audio en timeout segundos.
+        """
+        ring = self.ring
+        with ring._cond:
+            if not ring._cond.wait_for(lambda: ring._written > self.position, timeout):
+                return None
+
+        oldest = ring.oldest()
+        if self.position < oldest:
+            logger.warning(f"⚠️ Lector {oldest - self.position} muestras por detrás del anillo: se descartan")
+            ring.overruns += 1
+            self.position = oldest
+
+        count = min(ring.position - self.position, len(self._out))
+        out = self._out[:count]
+        ring._copy(self.position, out)
+        self.position += count
+        return out
+
+# ===============================================
+# ESTADO: SIEMPRE OYENDO (escuchar ya es otra cosa)
+# ÚLTIMA ACTUALIZACIÓN: Cuando "oye TARS, ¿qué hora es?" dejó de llegar como "...hora es?"
+# FILOSOFÍA: "No se puede rebobinar lo que nunca se grabó."
+# ===============================================
+#
+#           THIS IS THE ALWAYS-ON WAY...
+#           (un stream, un anillo, tantos cursores como haga falta)
+#
+# ===============================================
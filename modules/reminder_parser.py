@@ -1590,16 +1590,8 @@ class ReminderParser:
         if filter_text:
             return self.scheduler.find_jobs(filter_text)
         
-        # Devolvemos todos los jobs como lista
-        jobs = []
-        for job_id, data in self.scheduler.jobs.items():
-            jobs.append({
-                "id": job_id,
-                "msg": data.get("msg", ""),
-                "time": data.get("time", data.get("datetime", "")),
-                "recurrente": data.get("recurrente", False)
-            })
-        return jobs
+        # Devolvemos todos los jobs como lista (el scheduler los copia bajo su lock)
+        return self.scheduler.list_jobs()
     
     def list_reminders_text(self, filter_text: str = None) -> str:
         """Lista recordatorios como texto formateado"""
@@ -1739,6 +1731,9 @@ if __name__ == "__main__":
                         "recurrente": data["recurrente"]
                     })
             return results
+            
+        def list_jobs(self):
+            return self.find_jobs("")
     
     # Testing
     mock_scheduler = MockScheduler()
@@ -35,6 +35,22 @@ class SensoryFeedback:
         self.settings = settings.get("feedback", {})
         self.audio_playing = False  # Nuevo: estado de reproducción
         self.audio_thread = None    # Nuevo: referencia al hilo
+        self.phrase_bank = None     # PhraseBank activo (lo asigna tars_core si coincide con la voz)
+        self.audio_output = None    # AudioOutput residente (use_output); None = simpleaudio/aplay
+        self.filler_voice = None    # Fuente del relleno en curso en el mezclador
+        self._filler_stop = threading.Event()  # TARS ya contesta: el relleno no debe empezar ni seguir
+        self._phrase_files = {}     # Listado de audios/phrases/<categoría> (una vez por categoría)
+
+    def use_output(self, audio_output):
+        """Reproduce por la salida residente y precarga en memoria los WAV de feedback."""
+        self.audio_output = audio_output
+        feedback_dir = "audios/feedback"
+        paths = []
+        for folder in (feedback_dir, os.path.join(feedback_dir, "ok")):
+            if os.path.isdir(folder):
+                paths.extend(os.path.join(folder, f) for f in sorted(os.listdir(folder)) if f.lower().endswith(".wav"))
+        loaded = audio_output.preload(paths)
+        logger.info(f"🔔 {loaded} sonidos de feedback precargados en memoria")
 
     # =======================
     # 2.2 FEEDBACK DE EVENTOS
@@ -67,6 +83,9 @@ class SensoryFeedback:
     def _play_sound(self, filepath):
         """Reproduce un archivo WAV de forma bloqueante para evitar conflictos de audio."""
         try:
+            if self.audio_output is not None and self.audio_output.available:
+                if self.audio_output.wait(self.audio_output.play_clip(filepath)):
+                    return
             wave_obj = sa.WaveObject.from_wave_file(filepath)
             play_obj = wave_obj.play()
             play_obj.wait_done()
@@ -93,31 +112,37 @@ class SensoryFeedback:
 
     def play_phrase_async(self, category="thinking_responses", initial_delay=2.0):
         """Lanza en segundo plano una frase de audio pregrabada."""
-        folder = os.path.join("audios", "phrases", category)
-
-        if not os.path.exists(folder):
-            logger.warning(f"⚠️ Carpeta de frases no encontrada: {folder}")
-            return None
-
-        files = [f for f in os.listdir(folder) if f.endswith(".wav")]
-        if not files:
-            logger.warning(f"⚠️ No hay frases .wav en: {folder}")
-            return None
-
-        chosen = os.path.join(folder, random.choice(files))
+        # Primero el banco pre-renderizado con la voz actual; si no, la carpeta clásica
+        bank_files = self.phrase_bank.category_files(category) if self.phrase_bank else []
+        if bank_files:
+            chosen = random.choice(bank_files)
+        else:
+            files = self._list_phrase_files(category)
+            if not files:
+                return None
+            chosen = random.choice(files)
         logger.info(f"🔊 Seleccionado archivo de audio: {os.path.basename(chosen)}")
+        self._filler_stop.clear()
 
         def play():
             try:
                 self.audio_playing = True  # Marcar inicio de reproducción
                 
-                # Retraso inicial para simular tiempo de "pensamiento"
-                if initial_delay > 0:
-                    time.sleep(initial_delay)
+                # Retraso inicial para simular tiempo de "pensamiento" (si la respuesta llega antes, no suena)
+                if initial_delay > 0 and self._filler_stop.wait(initial_delay):
+                    logger.info("🔇 Respuesta lista antes que el audio de pensamiento: se omite")
+                    return
                 
-                # Reproducir audio
+                # Reproducir audio (en el mezclador se atenúa solo si TARS empieza a hablar)
                 logger.info(f"🔊 Reproduciendo audio de pensamiento...")
-                subprocess.run(["aplay", chosen], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                if self.audio_output is not None and self.audio_output.available:
+                    self.filler_voice = self.audio_output.play_clip(chosen, channel="filler", cache=False)
+                    if self._filler_stop.is_set():
+                        self.audio_output.stop("filler")  # stop_filler llegó mientras arrancaba
+                    self.audio_output.wait(self.filler_voice)
+                    self.filler_voice = None
+                else:
+                    subprocess.run(["aplay", chosen], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
                 logger.info(f"✅ Audio de pensamiento finalizado")
             except Exception as e:
                 logger.error(f"❌ Error al reproducir audio: {e}")
@@ -128,6 +153,36 @@ class SensoryFeedback:
         self.audio_thread.start()
         return self.audio_thread
 
+    def _list_phrase_files(self, category):
+        """WAV de audios/phrases/<categoría>, listados una sola vez."""
+        if category in self._phrase_files:
+            return self._phrase_files[category]
+
+        folder = os.path.join("audios", "phrases", category)
+        if not os.path.exists(folder):
+            logger.warning(f"⚠️ Carpeta de frases no encontrada: {folder}")
+            files = []
+        else:
+            files = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(".wav")]
+            if not files:
+                logger.warning(f"⚠️ No hay frases .wav en: {folder}")
+        self._phrase_files[category] = files
+        return files
+
+    def stop_filler(self, fade=True):
+        """Corta (con fundido) la frase de relleno en curso, o evita que empiece si aún está en el retraso."""
+        self._filler_stop.set()
+        if self.audio_output is not None and self.filler_voice is not None:
+            self.audio_output.stop("filler", fade=fade)
+
+    def finish_filler(self):
+        """
+        Antes de que TARS conteste: con mezclador el relleno se funde ya; con aplay solo se
+        evita si aún no había empezado, y si no se espera a que termine.
+        """
+        self.stop_filler()
+        self.wait_for_audio()
+
     def wait_for_audio(self):
         """Espera a que termine la reproducción de audio actual"""
         if self.audio_thread and self.audio_playing:
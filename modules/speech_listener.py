@@ -1,7 +1,7 @@
 # ===============================================  
 # SPEECH LISTENER - Diplomático Digital entre el Caos Acústico y Vosk  
 # Objetivo: Traducir balbuceos humanos a comandos que TARS pueda fingir que entiende  
-# Dependencias: Vosk, SoundDevice, SciPy, y fe ciega en la tecnología de reconocimiento  
+# Dependencias: Vosk, SoundDevice, CaptureRing, StreamResampler, VoiceActivityGate, y fe ciega en la tecnología de reconocimiento  
 # ===============================================
 
 # =======================================================================
@@ -9,13 +9,15 @@
 # =======================================================================
 
 import sounddevice as sd
-import queue
 import json
 import time
 import threading
 from vosk import Model, KaldiRecognizer
 from modules.sensory_feedback import SensoryFeedback
 from modules.settings_loader import load_settings
+from modules.stream_resampler import StreamResampler
+from modules.voice_activity import VoiceActivityGate
+from modules.capture_ring import CaptureRing
 
 # =======================================================================
 # 2. CLASE SPEECHLISTENER - SISTEMA DE RECONOCIMIENTO DE VOZ
@@ -28,7 +30,6 @@ class SpeechListener:
     # =======================================================================
     
     def __init__(self, model_path="ai_models/vosk/es", device=None, samplerate=None):
-        self.q = queue.Queue()
         self.device, self.samplerate = self._select_input_device(device, samplerate)
         
         # Tamaño de buffer aumentado para evitar overflow
@@ -58,13 +59,29 @@ class SpeechListener:
         self.is_listening = False
         self.current_stream = None
         
-        # Para resampling si es necesario
+        # Para resampling si es necesario (polifásico con estado, filtro diseñado una sola vez)
         self.do_resample = (self.samplerate != 16000)
+        self.resampler = None
         if self.do_resample:
-            import numpy as np
-            from scipy import signal
-            self.resample_ratio = 16000 / self.samplerate
+            self.resampler = StreamResampler(self.samplerate, 16000, block_size=self.blocksize)
             print(f"✅ Configurado resampling de {self.samplerate}Hz a 16000Hz")
+
+        settings = load_settings()
+
+        # Puerta de actividad de voz: Vosk solo decodifica tramos que suenan a voz (None = desactivada)
+        try:
+            self.vad = VoiceActivityGate.from_settings(settings, block_size=self.blocksize)
+        except Exception as e:
+            print(f"⚠️ VAD no disponible, Vosk decodificará todo: {e}")
+            self.vad = None
+
+        # Captura continua: un stream siempre abierto escribiendo en un anillo; los modos de escucha son cursores
+        capture = settings.get("audio", {}).get("capture", {})
+        ring_seconds = capture.get("ring_seconds", 20)
+        self.command_backlog = capture.get("command_backlog_s", 5.0)
+        self.ring = CaptureRing(int(ring_seconds * self.samplerate), block_size=self.blocksize)
+        self._resume_position = None  # Donde acabó la wakeword: ahí empieza el comando
+        print(f"✅ Anillo de captura: {ring_seconds}s a {self.samplerate}Hz")
     
     def _select_input_device(self, preferred_device, preferred_rate):
         """Selecciona el dispositivo de entrada más adecuado."""
@@ -97,38 +114,84 @@ class SpeechListener:
     # =======================================================================
     
     def _resample_audio(self, audio_data):
-        """Convierte el audio de la frecuencia nativa a 16000Hz para Vosk."""
-        import numpy as np
-        from scipy import signal
-        
-        # Convertir bytes a array numpy
-        audio_array = np.frombuffer(audio_data, dtype=np.int16)
-        
-        # Calcular nuevo tamaño
-        output_size = int(len(audio_array) * self.resample_ratio)
-        
-        # Resamplear
-        resampled = signal.resample(audio_array, output_size)
-        
-        # Convertir de vuelta a int16 y luego a bytes
-        resampled_int16 = np.int16(resampled)
-        return resampled_int16.tobytes()
+        """Convierte el audio de la frecuencia nativa a 16000Hz para Vosk (continuación del bloque anterior)."""
+        return self.resampler.process(audio_data)
+
+    def _gate_audio(self, data):
+        """
+        Pasa el bloque (ya a 16 kHz) por la puerta de voz y lo entrega a Vosk.
+        Devuelve el JSON de resultado si se cerró una frase, o None.
+        """
+        if self.vad is None:
+            data = data if isinstance(data, bytes) else data.tobytes()
+            return self.recognizer.Result() if self.recognizer.AcceptWaveform(data) else None
+
+        voiced, ended = self.vad.process(data)
+        if voiced and self.recognizer.AcceptWaveform(voiced):
+            return self.recognizer.Result()
+        if ended:
+            # La puerta se cerró tras el hangover: cerrar también la frase en Vosk
+            return self.recognizer.FinalResult()
+        return None
+
+    def get_stats(self):
+        stats = {"capture": self.ring.get_stats()}
+        if self.vad:
+            stats["vad"] = self.vad.get_stats()
+        return stats
 
     def _callback(self, indata, frames, time, status):
-        """Callback para procesar datos de audio."""
+        """Callback para procesar datos de audio: copia directa al anillo, siempre."""
         if status and status.input_overflow:
             print("⚠️ Input overflow - considera aumentar el blocksize")
         elif status:
             print(f"⚠️ Estado de audio: {status}")
         
-        # Solo encolamos si hay datos válidos y estamos escuchando
-        if self.is_listening and indata is not None and len(indata) > 0:
-            self.q.put(bytes(indata))
+        if indata is not None and len(indata) > 0:
+            self.ring.write(indata[:, 0])
 
-    def _stop_stream(self):
-        """Detiene el stream de audio de forma segura."""
+    def _ensure_stream(self):
+        """Abre el stream de captura si no lo está ya (una vez; solo se reabre tras un error)."""
         if self.current_stream is not None and self.current_stream.active:
-            self.is_listening = False
+            return
+        self._stop_stream()
+        self.current_stream = sd.InputStream(
+            samplerate=self.samplerate,
+            blocksize=self.blocksize,  # Tamaño de bloque aumentado
+            device=self.device,
+            dtype='int16',
+            channels=1,
+            callback=self._callback,
+            latency='low'  # Cambiado de 'high' a 'low' para reducir buffer
+        )
+        self.current_stream.start()
+        print("🎙️ Stream de captura abierto (permanece abierto entre wakeword y comandos)")
+
+    def _start_listening(self, start=None):
+        """Nuevo cursor sobre el anillo desde start (o desde ahora) y decodificación desde cero."""
+        self._ensure_stream()
+        self.is_listening = True
+        self.recognizer.Reset()  # Reiniciamos el reconocedor
+        if self.resampler:
+            self.resampler.reset()  # El cursor puede saltar: el historial del anterior no es continuación
+        if self.vad:
+            self.vad.reset()  # Puerta cerrada; el suelo de ruido aprendido se conserva
+        return self.ring.cursor(start)
+
+    def _read_block(self, cursor):
+        """Siguiente bloque del cursor listo para Vosk (16 kHz), o None si no llegó audio."""
+        data = cursor.read(timeout=0.5)
+        if data is None:
+            return None
+        # Aplicar resampling si es necesario
+        if self.do_resample:
+            data = self._resample_audio(data)
+        return data
+
+    def _stop_stream(self):
+        """Detiene el stream de audio de forma segura (al salir o para reabrirlo tras un error)."""
+        self.is_listening = False
+        if self.current_stream is not None:
             try:
                 self.current_stream.stop()
                 self.current_stream.close()
@@ -136,6 +199,10 @@ class SpeechListener:
                 print(f"⚠️ Error al cerrar stream: {e}")
             finally:
                 self.current_stream = None
+
+    def close(self):
+        """Cierra la captura al apagar TARS."""
+        self._stop_stream()
     
     # =======================================================================
     # 2.3 DETECCIÓN DE PALABRAS DE ACTIVACIÓN
@@ -143,45 +210,22 @@ class SpeechListener:
     
     def listen_for_wakeword(self, wakewords, on_failure=None):
         """Escucha para detectar palabras de activación con timeout."""
-        # Detener cualquier stream anterior
-        self._stop_stream()
-        
-        # Vaciar la cola
-        while not self.q.empty():
-            try:
-                self.q.get_nowait()
-            except queue.Empty:
-                break
-        
-        self.is_listening = True
-        self.recognizer.Reset()  # Reiniciamos el reconocedor
+        self._resume_position = None
         
         try:
-            # Iniciar nuevo stream de audio con buffer más grande
-            self.current_stream = sd.InputStream(
-                samplerate=self.samplerate,
-                blocksize=self.blocksize,  # Tamaño de bloque aumentado
-                device=self.device,
-                dtype='int16',
-                channels=1,
-                callback=self._callback,
-                latency='low'  # Cambiado de 'high' a 'low' para reducir buffer
-            )
-            
-            self.current_stream.start()
+            # Cursor desde ahora: el stream sigue abierto desde la escucha anterior
+            cursor = self._start_listening()
             print("🎤 Escuchando... Di 'oye TARS' o algo parecido")
             
             while self.is_listening:
                 try:
                     # Usar timeout para evitar bloqueos
-                    data = self.q.get(timeout=0.5)
-                    
-                    # Aplicar resampling si es necesario
-                    if self.do_resample:
-                        data = self._resample_audio(data)
+                    data = self._read_block(cursor)
+                    if data is None:
+                        continue
                         
-                    if self.recognizer.AcceptWaveform(data):
-                        result = self.recognizer.Result()
+                    result = self._gate_audio(data)
+                    if result is not None:
                         text = json.loads(result)["text"].lower()
                         if text:
                             print(f"🗣️ Escuchado: {text}")
@@ -191,7 +235,9 @@ class SpeechListener:
 
                             if is_wakeword_match(text, wakewords, threshold=0.7):
                                 print("🔥 Wakeword detectada por coincidencia difusa")
-                                self._stop_stream()
+                                # El comando se decodificará desde aquí, aunque llegue durante la respuesta de TARS
+                                self._resume_position = cursor.position
+                                self.is_listening = False
                                 return text
                             else:
                                 print("❌ No coincide con ninguna wakeword (ni siquiera por aproximación)")
@@ -206,8 +252,6 @@ class SpeechListener:
                                     print(f"⚠️ Error en sensory feedback de fallo: {e}")
 
 
-                except queue.Empty:
-                    continue
                 except Exception as e:
                     print(f"⚠️ Error en reconocimiento: {e}")
                     time.sleep(0.5)
@@ -226,18 +270,12 @@ class SpeechListener:
     
     def listen_for_command(self, timeout=10):
         """Escucha comandos con timeout estricto."""
-        # Detener cualquier stream anterior
-        self._stop_stream()
-        
-        # Vaciar la cola
-        while not self.q.empty():
-            try:
-                self.q.get_nowait()
-            except queue.Empty:
-                break
-        
-        self.is_listening = True
-        self.recognizer.Reset()  # Reiniciamos el reconocedor
+        # Justo tras la wakeword se retoma donde acabó (hasta command_backlog segundos atrás):
+        # lo dicho durante la respuesta de activación no se pierde. En turnos siguientes, desde ahora
+        start = None
+        if self._resume_position is not None:
+            start = max(self._resume_position, self.ring.position - int(self.command_backlog * self.samplerate))
+            self._resume_position = None
         
         result_text = ""
         command_received = threading.Event()
@@ -245,39 +283,29 @@ class SpeechListener:
         def timeout_handler():
             if not command_received.is_set():
                 print("⏳ Tiempo agotado esperando comando")
-                self._stop_stream()
+                self.is_listening = False
         
         # Configurar timer para timeout
         timer = threading.Timer(timeout, timeout_handler)
         timer.start()
         
         try:
-            # Iniciar nuevo stream de audio con buffer más grande
-            self.current_stream = sd.InputStream(
-                samplerate=self.samplerate,
-                blocksize=self.blocksize,  # Tamaño de bloque aumentado
-                device=self.device,
-                dtype='int16',
-                channels=1,
-                callback=self._callback,
-                latency='low'  # Cambiado para mejorar la respuesta
-            )
-            
-            self.current_stream.start()
+            cursor = self._start_listening(start)
+            if start is not None:
+                print(f"⏪ Decodificando desde la wakeword ({cursor.lag() / self.samplerate:.1f}s ya capturados)")
             print("🎤 Escuchando tu pregunta...")
             
             start_time = time.time()
             
             while self.is_listening and time.time() - start_time < timeout:
                 try:
-                    data = self.q.get(timeout=0.5)
-                    
-                    # Aplicar resampling si es necesario
-                    if self.do_resample:
-                        data = self._resample_audio(data)
+                    data = self._read_block(cursor)
+                    if data is None:
+                        continue
                         
-                    if self.recognizer.AcceptWaveform(data):
-                        result = json.loads(self.recognizer.Result())
+                    result = self._gate_audio(data)
+                    if result is not None:
+                        result = json.loads(result)
                         text = result.get("text", "")
                         conf = result.get("conf", 1.0)
                         print(f"[VOSK] Texto detectado: '{text}' (confianza: {conf:.2f})")
@@ -333,17 +361,15 @@ class SpeechListener:
                             command_received.set()
                             break
 
-                except queue.Empty:
-                    continue
                 except Exception as e:
                     print(f"⚠️ Error en reconocimiento: {e}")
             
         except Exception as e:
             print(f"❌ Error escuchando comando: {e}")
         finally:
-            # Limpieza final
+            # Limpieza final (el stream sigue abierto para la siguiente escucha)
             timer.cancel()
-            self._stop_stream()
+            self.is_listening = False
             
         return result_text
 
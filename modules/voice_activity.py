@@ -0,0 +1,235 @@
+# ===============================================
+# VOICE ACTIVITY - Portero Acústico entre el Micrófono y Vosk para TARS-BSK
+# Objetivo: Dejar pasar solo lo que suena a voz; el ventilador, la nevera y el silencio se quedan fuera
+# Dependencias: NumPy
+# Advertencia: La tele también habla. Esto ahorra CPU con el silencio, no hace milagros con Netflix.
+# ===============================================
+
+# ===============================================
+# 1. CONFIGURACIÓN INICIAL Y DEPENDENCIAS
+# ===============================================
+import logging
+import math
+
+import numpy as np
+
+logger = logging.getLogger("TARS.VAD")
+
+# Banda de voz para la planitud espectral (fuera de ella solo hay zumbidos y sibilantes)
+FLATNESS_BAND_HZ = (100, 4000)
+
+# ===============================================
+# 2. CLASE PRINCIPAL VOICEACTIVITYGATE
+# ===============================================
+class VoiceActivityGate:
+    """
+    Puerta de actividad de voz por tramas (30 ms por defecto) sobre PCM int16 a 16 kHz.
+
+    - Una trama es voz si supera el suelo de ruido en margin_db y además es tonal
+      (planitud espectral baja) o tiene pocos cruces por cero. El ruido de banda ancha no cumple ninguna
+    - El suelo de ruido se adapta: baja rápido, sube despacio, y durante la voz casi no se mueve
+    - La puerta se abre tras onset_ms de voz seguida, entregando antes el pre-roll guardado,
+      y se cierra tras hangover_ms sin voz (ended=True para que Vosk cierre la frase)
+    """
+
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = 30, margin_db: float = 9.0,
+                 min_speech_db: float = -55.0, flatness_max: float = 0.45, zcr_max: float = 0.25,
+                 onset_ms: int = 60, hangover_ms: int = 600, preroll_ms: int = 300,
+                 floor_down_s: float = 0.3, floor_up_s: float = 3.0, floor_speech_s: float = 20.0,
+                 block_size: int = 8192):
+        """
+        :param margin_db: dB por encima del suelo de ruido para considerar una trama candidata
+        :param min_speech_db: Nivel mínimo absoluto (dBFS), para que el silencio total no dispare nada
+        :param flatness_max: Planitud espectral máxima de una trama tonal (ruido blanco ≈ 0.56)
+        :param zcr_max: Cruces por cero por muestra por debajo de los cuales la trama no es ruido
+        :param floor_down_s / floor_up_s / floor_speech_s: Constantes de tiempo del suelo de ruido
+        """
+        self.sample_rate = sample_rate
+        self.frame_len = int(sample_rate * frame_ms / 1000)
+        self.frame_s = self.frame_len / sample_rate
+        self.margin_db = margin_db
+        self.min_speech_db = min_speech_db
+        self.flatness_max = flatness_max
+        self.zcr_max = zcr_max
+
+        self.onset_frames = max(1, round(onset_ms / frame_ms))
+        self.hangover_frames = max(1, round(hangover_ms / frame_ms))
+        self.preroll_frames = max(self.onset_frames, round(preroll_ms / frame_ms))
+
+        # Coeficientes de seguimiento por trama a partir de constantes de tiempo
+        self._floor_down = 1.0 - math.exp(-self.frame_s / floor_down_s)
+        self._floor_up = 1.0 - math.exp(-self.frame_s / floor_up_s)
+        self._floor_speech = 1.0 - math.exp(-self.frame_s / floor_speech_s)
+
+        self._window = np.hanning(self.frame_len).astype(np.float32)
+        bin_hz = sample_rate / self.frame_len
+        self._band = slice(int(FLATNESS_BAND_HZ[0] / bin_hz), int(FLATNESS_BAND_HZ[1] / bin_hz) + 1)
+
+        self._preroll = np.zeros((self.preroll_frames, self.frame_len), dtype=np.int16)
+        self._allocate(block_size)
+
+        self.noise_floor_db = None
+        self.frames_skipped = 0
+        self.frames_decoded = 0
+        self.segments = 0
+        self.reset()
+
+    @classmethod
+    def from_settings(cls, settings: dict, sample_rate: int = 16000, block_size: int = 8192):
+        """Crea la puerta desde settings['audio']['vad']; None si está desactivada"""
+        vad = settings.get("audio", {}).get("vad", {})
+        if not vad.get("enabled", True):
+            logger.info("ℹ️ VAD desactivado: Vosk decodifica todo lo que capta el micrófono")
+            return None
+        options = {k: v for k, v in vad.items()
+                   if not k.startswith("_") and k != "enabled"}
+        return cls(sample_rate=sample_rate, block_size=block_size, **options)
+
+    # ===============================================
+    # 3. BUFFERS Y ESTADO
+    # ===============================================
+    def _allocate(self, block_size: int):
+        """Trabajo para resto + bloque y salida para pre-roll + bloque entero"""
+        self.block_size = int(block_size)
+        self._work = np.zeros(self.frame_len + self.block_size, dtype=np.int16)
+        self._frames = np.zeros(self._work.shape, dtype=np.float32)
+        self._output = np.zeros((self.preroll_frames + len(self._work) // self.frame_len + 1)
+                                * self.frame_len, dtype=np.int16)
+
+    def reset(self):
+        """Cierra la puerta y vacía el pre-roll; el suelo de ruido aprendido se conserva"""
+        self._carry = 0
+        self._open = False
+        self._onset = 0
+        self._hang = 0
+        self._preroll_count = 0
+        self._preroll_pos = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self._open
+
+    # ===============================================
+    # 4. ANÁLISIS POR TRAMAS
+    # ===============================================
+    def _analyze(self, frames: np.ndarray):
+        """Energía (dBFS), planitud espectral en banda de voz y tasa de cruces por cero de cada trama"""
+        energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+
+        spectrum = np.abs(np.fft.rfft(frames * self._window, axis=1)[:, self._band]) ** 2 + 1e-12
+        flatness = np.exp(np.mean(np.log(spectrum), axis=1)) / np.mean(spectrum, axis=1)
+
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / self.frame_len
+        return energy_db, flatness, zcr
+
+    def _track_floor(self, energy_db: float, speech: bool):
+        if self.noise_floor_db is None:
+            self.noise_floor_db = energy_db
+            return
+        if speech:
+            rate = self._floor_speech
+        elif energy_db < self.noise_floor_db:
+            rate = self._floor_down
+        else:
+            rate = self._floor_up
+        self.noise_floor_db += (energy_db - self.noise_floor_db) * rate
+
+    # ===============================================
+    # 5. PUERTA
+    # ===============================================
+    def process(self, pcm) -> tuple:
+        """
+        Evalúa un bloque PCM int16 y devuelve (audio_para_vosk, ended).
+        audio_para_vosk es b"" con la puerta cerrada; ended indica que un tramo de voz acaba de terminar.
+        """
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        if self._carry + len(samples) > len(self._work):
+            carry = self._work[:self._carry].copy()
+            self._allocate(self._carry + len(samples))
+            self._work[:len(carry)] = carry
+
+        total = self._carry + len(samples)
+        self._work[self._carry:total] = samples
+        count = total // self.frame_len
+        used = count * self.frame_len
+
+        written = 0
+        ended = False
+        if count:
+            frames_i16 = self._work[:used].reshape(count, self.frame_len)
+            frames = self._frames[:used].reshape(count, self.frame_len)
+            np.multiply(frames_i16, 1.0 / 32768, out=frames, casting="unsafe")
+            energy_db, flatness, zcr = self._analyze(frames)
+
+            for i in range(count):
+                threshold = max(self.noise_floor_db if self.noise_floor_db is not None else energy_db[i],
+                                self.min_speech_db - self.margin_db) + self.margin_db
+                speech = energy_db[i] > threshold and (flatness[i] < self.flatness_max or zcr[i] < self.zcr_max)
+                self._track_floor(float(energy_db[i]), speech)
+                written, segment_ended = self._step(frames_i16[i], speech, written)
+                ended = ended or segment_ended
+
+        # Resto (menos de una trama) al principio del buffer para el bloque siguiente
+        self._carry = total - used
+        self._work[:self._carry] = self._work[used:total]
+        return self._output[:written].tobytes(), ended
+
+    def _step(self, frame: np.ndarray, speech: bool, written: int) -> tuple:
+        """Máquina de estados de una trama: cerrada (pre-roll) → abierta (con hangover) → cerrada"""
+        if not self._open:
+            self._preroll[self._preroll_pos] = frame
+            self._preroll_pos = (self._preroll_pos + 1) % self.preroll_frames
+            self._preroll_count = min(self._preroll_count + 1, self.preroll_frames)
+            self._onset = self._onset + 1 if speech else 0
+
+            if self._onset < self.onset_frames:
+                self.frames_skipped += 1
+                return written, False
+
+            # Apertura: el pre-roll (que incluye las tramas de arranque) sale en orden cronológico
+            self._open = True
+            self._hang = self.hangover_frames
+            self.segments += 1
+            start = (self._preroll_pos - self._preroll_count) % self.preroll_frames
+            for k in range(self._preroll_count):
+                written = self._emit(self._preroll[(start + k) % self.preroll_frames], written)
+            # Las tramas de arranque ya se contaron como descartadas; pasan a decodificadas
+            self.frames_skipped -= self._preroll_count - 1
+            self.frames_decoded += self._preroll_count
+            self._preroll_count = 0
+            self._onset = 0
+            return written, False
+
+        written = self._emit(frame, written)
+        self.frames_decoded += 1
+        self._hang = self.hangover_frames if speech else self._hang - 1
+        if self._hang > 0:
+            return written, False
+        self._open = False
+        return written, True
+
+    def _emit(self, frame: np.ndarray, written: int) -> int:
+        self._output[written:written + self.frame_len] = frame
+        return written + self.frame_len
+
+    def get_stats(self) -> dict:
+        total = self.frames_skipped + self.frames_decoded
+        return {
+            "frames_skipped": self.frames_skipped,
+            "frames_decoded": self.frames_decoded,
+            "skipped_ratio": round(self.frames_skipped / total, 3) if total else 0.0,
+            "segments": self.segments,
+            "noise_floor_db": round(self.noise_floor_db, 1) if self.noise_floor_db is not None else None,
+        }
+
+# ===============================================
+# ESTADO: SELECTIVAMENTE SORDO (escucho todo, decodifico solo lo que merece la pena)
+# ÚLTIMA ACTUALIZACIÓN: Cuando Vosk dejó de transcribir el ventilador a las tres de la mañana
+# FILOSOFÍA: "El silencio no necesita traducción."
+# ===============================================
+#
+#           THIS IS THE GATEKEEPER WAY...
+#           (energía, planitud y paciencia: solo pasa la voz)
+#
+# ===============================================
@@ -72,7 +72,8 @@ def generate_base_audio(text: str, output_file: str = "audio_effects_processor_b
             radio_filter_band=[200, 3500],
             radio_filter_noise=True,
             radio_filter_compression=True,
-            gain_before_filter=1.5
+            gain_before_filter=1.5,
+            export_wav=True  # El tester necesita el WAV en disco
         )
         
         # Audio effects config vacía (sin efectos en la base)
@@ -239,6 +240,66 @@ def analyze_presets_technical():
     except Exception as e:
         print(f"   ❌ Error en análisis técnico: {e}")
 
+# =======================================================================
+# 5.1 BENCHMARK DE RENDIMIENTO POR PRESET
+# =======================================================================
+def _legacy_modulated_delay(audio, delay_variation, base_delay):
+    """Bucle muestra a muestra original del chorus (referencia para el benchmark)"""
+    import numpy as np
+    voice_signal = np.zeros_like(audio)
+    for i in range(len(audio)):
+        delay_total = base_delay + int(delay_variation[i])
+        if i >= delay_total and delay_total > 0:
+            frac = delay_variation[i] - int(delay_variation[i])
+            if i >= delay_total + 1:
+                voice_signal[i] = audio[i - delay_total] * (1 - frac) + audio[i - delay_total - 1] * frac
+            else:
+                voice_signal[i] = audio[i - delay_total]
+    return voice_signal
+
+def benchmark_presets(seconds: float = 5.0, sample_rate: int = 22050, repeats: int = 3):
+    """
+    Mide cada preset con el chorus vectorizado frente al bucle original.
+    Usa una señal sintética tipo voz: no necesita Piper ni archivos.
+    """
+    import time
+    import numpy as np
+
+    print(f"\n⏱️ BENCHMARK DE PRESETS ({seconds:.0f}s de audio a {sample_rate} Hz):")
+    print("="*70)
+
+    # Señal de prueba: armónicos con envolvente silábica (~4 Hz) y algo de ruido
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    audio = sum(np.sin(2 * np.pi * f * t) / (k + 1) for k, f in enumerate([140, 280, 420, 1100, 2300]))
+    audio *= 0.5 * (1 + np.sin(2 * np.pi * 4 * t))
+    audio += 0.01 * np.random.default_rng(0).standard_normal(len(t))
+    audio = (audio / np.max(np.abs(audio)) * 0.8).astype(np.float32)
+
+    def best_time(processor):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            output = processor.process_buffer(audio, sample_rate)
+            timings.append(time.perf_counter() - start)
+        return min(timings), output
+
+    print(f"   {'preset':<16}{'original':>12}{'vectorizado':>14}{'speedup':>10}{'máx. dif.':>12}")
+    for preset in AudioEffectsProcessor.PRESETS:
+        if preset == "none":
+            continue
+        fast = AudioEffectsProcessor({"enabled": True, "preset": preset})
+        slow = AudioEffectsProcessor({"enabled": True, "preset": preset})
+        slow._modulated_delay = _legacy_modulated_delay
+
+        fast_time, fast_out = best_time(fast)
+        # El bucle original es lento: una sola pasada basta para medirlo
+        start = time.perf_counter()
+        slow_out = slow.process_buffer(audio, sample_rate)
+        slow_time = time.perf_counter() - start
+
+        difference = float(np.max(np.abs(fast_out - slow_out)))
+        print(f"   {preset:<16}{slow_time:>11.3f}s{fast_time:>13.3f}s{slow_time / fast_time:>9.1f}x{difference:>12.2e}")
+
 # =======================================================================
 # 6. REPORTES Y RESÚMENES
 # =======================================================================
@@ -305,6 +366,11 @@ def print_results_summary(results, current_settings_file):
 # =======================================================================
 def main():
     """Función principal del tester."""
+    # Solo benchmark: python scripts/audio_effects_tester.py --benchmark
+    if "--benchmark" in sys.argv:
+        benchmark_presets()
+        return
+    
     # Texto de prueba técnico (para análisis de efectos)
     if len(sys.argv) > 1:
         text = " ".join(sys.argv[1:])
@@ -174,10 +174,7 @@ def _safe_speak(tts, text: str, silent_mode: bool = False, settings: dict = None
 
     try:
         from pydub import AudioSegment
-        
-        # SIEMPRE deshabilitar reproducción para controlar el orden
-        original_play_audio = tts._play_audio
-        tts._play_audio = lambda: None
+        import numpy as np
 
         # Dividir en fragmentos
         fragments = _smart_split_text(text, max_len=180)
@@ -192,37 +189,25 @@ def _safe_speak(tts, text: str, silent_mode: bool = False, settings: dict = None
             action_text = "Generando" if silent_mode else "Reproduciendo"
             logger.info(f"➡️ {action_text} fragmento: '{fragment}'")
             
-            # Generar en archivo TEMPORAL
-            temp_output = str(tts.output_path).replace('.wav', f'_temp_{i}.wav')
-            original_output = tts.output_path
-            tts.output_path = Path(temp_output)
-            
-            # Generar archivo temporal
-            tts.speak(fragment)
+            # Generar en memoria (síntesis + filtro de radio)
+            audio, sample_rate = tts.render(fragment)
+            if not len(audio):
+                continue
             
-            # Aplicar AudioEffects al archivo temporal
-            if settings and os.path.exists(temp_output):
+            # Aplicar AudioEffects al buffer
+            if settings:
                 audio_effects = AudioEffectsProcessor.from_settings(settings)
                 if audio_effects.enabled:
-                    audio_effects.apply_effects(temp_output)
+                    audio = audio_effects.process_buffer(audio, sample_rate)
             
-            # Cargar audio y añadir a la lista
-            if os.path.exists(temp_output):
-                audio_segment = AudioSegment.from_wav(temp_output)
-                audio_segments.append(audio_segment)
-                
-                # Limpiar archivo temporal
-                os.remove(temp_output)
-            
-            # Restaurar ruta original
-            tts.output_path = original_output
+            # Añadir a la lista (PCM 16 bits, sin archivo temporal)
+            pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+            audio_segments.append(AudioSegment(data=pcm.tobytes(), sample_width=2,
+                                               frame_rate=sample_rate, channels=1))
             
             # Reproducir solo si NO es modo silencioso
-            if not silent_mode and audio_segments:
-                # Reproducir este fragmento (temporal para testing)
-                audio_segments[-1].export(temp_output, format="wav")
-                original_play_audio()
-                os.remove(temp_output)
+            if not silent_mode:
+                tts.play_buffer(audio, sample_rate)
                 time.sleep(1.0)
 
         # CONCATENAR TODOS LOS FRAGMENTOS
@@ -233,9 +218,6 @@ def _safe_speak(tts, text: str, silent_mode: bool = False, settings: dict = None
             
             # Guardar archivo final concatenado
             combined_audio.export(str(tts.output_path), format="wav")
-
-        # Restaurar reproducción original
-        tts._play_audio = original_play_audio
             
     except Exception as e:
         logger.error(f"❌ Error en TTS: {e}")
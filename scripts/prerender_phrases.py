@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# =======================================================================
+# PRERENDER PHRASES - Construcción del banco de frases fijas de TARS-BSK
+# Objetivo: Renderizar en paralelo TODAS las frases fijas (data/phrases/*.json + respuestas fijas)
+#           con la misma cadena que tars_core (Piper + filtro de radio + audio effects)
+# Dependencias: PiperTTS, PhraseBank, settings_loader, concurrent.futures
+# Advertencia: Solo se renderiza lo que ha cambiado. Lo demás ya lo dije, y sonaba igual.
+# =======================================================================
+
+# =======================================================================
+# 1. IMPORTACIONES Y CONFIGURACIÓN INICIAL
+# =======================================================================
+import os
+import sys
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("TARS-Prerender")
+
+# Directorio base de TARS (las rutas de settings.json son relativas a él)
+SCRIPT_DIR = Path(__file__).parent.absolute()
+BASE_PATH = SCRIPT_DIR.parent
+os.chdir(BASE_PATH)
+sys.path.insert(0, str(BASE_PATH))
+
+try:
+    from tts.piper_tts import PiperTTS
+    from tts.phrase_bank import PhraseBank, collect_phrases, write_wav
+    from modules.settings_loader import load_settings
+except ImportError as e:
+    logger.error(f"❌ Error importando módulos: {e}")
+    sys.exit(1)
+
+DEFAULT_BANK_DIR = BASE_PATH / "audios" / "phrase_bank"
+
+# =======================================================================
+# 2. TTS IDÉNTICO AL DE EJECUCIÓN
+# =======================================================================
+def build_runtime_tts(settings: dict) -> PiperTTS:
+    """Mismos parámetros que TARS.__init__ en tars_core.py (la huella debe coincidir)"""
+    piper_tuning = settings["piper_tuning"]
+    tts = PiperTTS(
+        model_path=BASE_PATH / settings["voice_model"],
+        config_path=BASE_PATH / settings["voice_config"],
+        espeak_path=Path(settings["espeak_data"]),
+        output_path=BASE_PATH / settings["output_wav"],
+        audio_device=settings["audio"].get("playback_device"),
+        length_scale=piper_tuning.get("length_scale"),
+        noise_scale=piper_tuning.get("noise_scale"),
+        noise_w=piper_tuning.get("noise_w"),
+        radio_filter_enabled=piper_tuning.get("radio_filter_enabled", False),
+        radio_filter_band=piper_tuning.get("radio_filter_band", [300, 3400]),
+        radio_filter_noise=piper_tuning.get("radio_filter_noise", True),
+        radio_filter_compression=piper_tuning.get("radio_filter_compression", True),
+        resident_voice=piper_tuning.get("resident_voice", True),
+        export_wav=False,
+        radio_filter_streaming=piper_tuning.get("radio_filter_streaming", False),
+        stream_block_size=piper_tuning.get("stream_block_size", 1024)
+    )
+    tts.audio_effects_config = settings.get("audio_effects", {"enabled": False})
+    return tts
+
+# =======================================================================
+# 3. TRABAJADORES DEL POOL
+# =======================================================================
+_worker_tts = None
+
+
+def _init_worker():
+    """Cada proceso carga su propia voz una sola vez"""
+    global _worker_tts
+    logging.getLogger().setLevel(logging.WARNING)
+    _worker_tts = build_runtime_tts(load_settings())
+
+
+def _render_phrase(key: str, text: str, bank_dir: str):
+    """Renderiza una frase y escribe <clave>.wav; devuelve (clave, texto, sample_rate, muestras)"""
+    audio, sample_rate = _worker_tts.render(text)
+    if not len(audio):
+        raise RuntimeError("síntesis vacía")
+    tmp_path = Path(bank_dir) / f"{key}.tmp.wav"
+    write_wav(tmp_path, audio, sample_rate)
+    os.replace(tmp_path, Path(bank_dir) / f"{key}.wav")
+    return key, text, sample_rate, len(audio)
+
+# =======================================================================
+# 4. CONSTRUCCIÓN DEL BANCO
+# =======================================================================
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Pre-renderiza todas las frases fijas de TARS en el banco de audio",
+        epilog="""
+Ejemplos de uso:
+  # Construcción incremental (solo frases nuevas o con voz cambiada)
+  python3 scripts/prerender_phrases.py
+
+  # Rehacer todo con 2 procesos
+  python3 scripts/prerender_phrases.py --force --workers 2
+        """,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--bank-dir', default=str(DEFAULT_BANK_DIR),
+                        help='Directorio del banco (por defecto: audios/phrase_bank)')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help='Procesos de renderizado en paralelo')
+    parser.add_argument('--force', action='store_true',
+                        help='Descartar el banco existente y renderizar todo')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    bank_dir = Path(args.bank_dir)
+    bank_dir.mkdir(parents=True, exist_ok=True)
+
+    settings = load_settings()
+    fingerprint = build_runtime_tts(settings).render_fingerprint()
+
+    phrases = collect_phrases(BASE_PATH / "data" / "phrases")
+    bank = PhraseBank(bank_dir)
+    if args.force:
+        bank.plan({}, fingerprint)
+    pending = bank.plan(phrases, fingerprint)
+
+    logger.info(f"📝 {len(phrases)} frases fijas, {len(pending)} por renderizar "
+                f"({len(phrases) - len(pending)} ya en el banco)")
+    if not pending:
+        bank.save_manifest()
+        logger.info("✅ Banco de frases al día")
+        return 0
+
+    start_time = time.time()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(_render_phrase, key, text, str(bank_dir)): text for key, text in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            text = futures[future]
+            try:
+                bank.add(*future.result())
+                logger.info(f"✅ [{done}/{len(pending)}] '{text[:50]}'")
+            except Exception as e:
+                failed += 1
+                logger.error(f"❌ [{done}/{len(pending)}] '{text[:50]}': {e}")
+            # Manifiesto guardado por el camino: una interrupción no pierde lo renderizado
+            if done % 20 == 0:
+                bank.save_manifest()
+
+    bank.save_manifest()
+    elapsed = time.time() - start_time
+    logger.info(f"🎙️ {len(pending) - failed} frases renderizadas en {elapsed:.1f}s "
+                f"con {args.workers} procesos ({failed} fallidas)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# =======================================================================
+# ESTADO: ENSAYADO (todas mis ocurrencias, grabadas de antemano)
+# ÚLTIMA ACTUALIZACIÓN: Cuando cuatro scripts de generación se quedaron en uno
+# FILOSOFÍA: "La espontaneidad también se puede compilar."
+# =======================================================================
+#
+#           THIS IS THE REHEARSED WAY...
+#           (un comando, todas las frases, ninguna repetida)
+#
+# =======================================================================
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# =======================================================================
+# RESAMPLER BENCHMARK - Cronómetro para el Remuestreo del Micrófono de TARS-BSK
+# Objetivo: Medir el factor de tiempo real (RTF) del remuestreo 44.1k/48k → 16k que alimenta a Vosk
+#           y comparar el FFT por bloque de siempre con el polifásico con estado
+# Dependencias: NumPy, SciPy, modules.stream_resampler
+# Advertencia: RTF = segundos de CPU por segundo de audio. En la Pi, cada 0.01 es un poco menos de calor.
+# =======================================================================
+
+# =======================================================================
+# 1. IMPORTACIONES Y CONFIGURACIÓN INICIAL
+# =======================================================================
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from scipy import signal
+
+SCRIPT_DIR = Path(__file__).parent.absolute()
+BASE_PATH = SCRIPT_DIR.parent
+sys.path.insert(0, str(BASE_PATH))
+
+from modules.stream_resampler import StreamResampler
+
+TARGET_RATE = 16000
+INPUT_RATES = [44100, 48000]
+
+# =======================================================================
+# 2. SEÑAL DE PRUEBA Y RESAMPLERS
+# =======================================================================
+def make_test_signal(rate: int, seconds: float) -> np.ndarray:
+    """Barrido 100 Hz - 7 kHz con ruido de sala: algo parecido a voz, int16 como el micrófono"""
+    rng = np.random.default_rng(42)
+    t = np.arange(int(rate * seconds)) / rate
+    sweep = signal.chirp(t, f0=100, t1=t[-1], f1=7000, method="logarithmic")
+    noise = rng.standard_normal(len(t)) * 0.05
+    return (np.clip(sweep * 0.5 + noise, -1, 1) * 32767).astype(np.int16)
+
+
+def legacy_resample(block: bytes, ratio: float) -> bytes:
+    """El remuestreo anterior de SpeechListener: FFT completa por bloque, sin estado"""
+    audio_array = np.frombuffer(block, dtype=np.int16)
+    resampled = signal.resample(audio_array, int(len(audio_array) * ratio))
+    return np.int16(resampled).tobytes()
+
+
+def split_blocks(audio: np.ndarray, block_size: int) -> list:
+    return [audio[i:i + block_size].tobytes() for i in range(0, len(audio), block_size)]
+
+# =======================================================================
+# 3. MEDICIÓN
+# =======================================================================
+def run_case(rate: int, seconds: float, block_size: int, repeats: int) -> dict:
+    audio = make_test_signal(rate, seconds)
+    blocks = split_blocks(audio, block_size)
+    duration = len(audio) / rate
+    ratio = TARGET_RATE / rate
+
+    # Referencia: resample_poly sobre la señal entera (lo que daría un remuestreo sin cortes)
+    resampler = StreamResampler(rate, TARGET_RATE, block_size=block_size)
+    reference = signal.resample_poly(audio.astype(np.float64), resampler.up, resampler.down)
+
+    results = {}
+    for name in ("legacy_fft", "stream_polyphase"):
+        best = float("inf")
+        for _ in range(repeats):
+            resampler.reset()
+            output = []
+            start = time.perf_counter()
+            if name == "legacy_fft":
+                for block in blocks:
+                    output.append(legacy_resample(block, ratio))
+            else:
+                for block in blocks:
+                    output.append(resampler.process(block))
+            best = min(best, time.perf_counter() - start)
+
+        produced = np.frombuffer(b"".join(output), dtype=np.int16).astype(np.float64)
+        length = min(len(produced), len(reference))
+        error = produced[:length] - reference[:length]
+        snr = 10 * np.log10(np.sum(reference[:length] ** 2) / max(np.sum(error ** 2), 1e-12))
+        results[name] = {
+            "seconds": round(best, 4),
+            "rtf": round(best / duration, 5),
+            "per_block_ms": round(best / len(blocks) * 1000, 3),
+            "snr_vs_whole_signal_db": round(float(snr), 1),
+        }
+
+    results["speedup"] = round(results["legacy_fft"]["seconds"] / results["stream_polyphase"]["seconds"], 2)
+    results["taps_per_phase"] = resampler.taps
+    results["latency_ms"] = round(resampler.latency * 1000, 2)
+    return results
+
+# =======================================================================
+# 4. INTERFAZ DE LÍNEA DE COMANDOS
+# =======================================================================
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Benchmark del remuestreo de micrófono (FFT por bloque vs polifásico con estado)",
+        epilog="""
+Ejemplos:
+  python3 scripts/resampler_benchmark.py
+  python3 scripts/resampler_benchmark.py --seconds 60 --block-size 2048
+        """,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('--seconds', type=float, default=30.0,
+                        help='Duración del audio de prueba por frecuencia (s)')
+    parser.add_argument('--block-size', type=int, default=8192,
+                        help='Muestras por bloque (el blocksize de SpeechListener)')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='Repeticiones por caso (se guarda la mejor)')
+    parser.add_argument('--output', default="resampler_benchmark.json",
+                        help='Archivo JSON de resultados')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    print("=" * 60)
+    print("🎚️ TARS Resampler Benchmark")
+    print("=" * 60)
+    print(f"⏰ Iniciado: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"📦 Bloque: {args.block_size} muestras | Audio: {args.seconds:.0f}s por caso | → {TARGET_RATE} Hz")
+
+    results = {
+        "timestamp": datetime.now().isoformat(),
+        "python_version": sys.version.split()[0],
+        "platform": sys.platform,
+        "block_size": args.block_size,
+        "seconds": args.seconds,
+        "cases": {},
+    }
+
+    for rate in INPUT_RATES:
+        case = run_case(rate, args.seconds, args.block_size, args.repeats)
+        results["cases"][str(rate)] = case
+        print(f"\n🎤 {rate} Hz → {TARGET_RATE} Hz ({case['taps_per_phase']} taps/fase, retardo {case['latency_ms']} ms)")
+        for name in ("legacy_fft", "stream_polyphase"):
+            data = case[name]
+            print(f"   {name:<17} RTF {data['rtf']:.5f} | {data['per_block_ms']:.3f} ms/bloque | "
+                  f"SNR vs señal entera {data['snr_vs_whole_signal_db']:.1f} dB")
+        print(f"   ⚡ Aceleración: x{case['speedup']}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\n✅ Resultados guardados en: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+# =======================================================================
+# ESTADO: CRONOMETRADO (cada bloque, cada costura, cada milisegundo)
+# ÚLTIMA ACTUALIZACIÓN: Cuando el remuestreo dejó de ser una suposición y pasó a ser un número
+# FILOSOFÍA: "Lo que no se mide, se calienta."
+# =======================================================================
+#
+#           THIS IS THE MEASURED WAY...
+#           (RTF en la mano, FFT en el retiro)
+#
+# =======================================================================
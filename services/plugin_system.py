@@ -193,7 +193,10 @@ class PluginSystem:
             
             def speak_callback(text, emotion="neutral"):
                 """Callback para que el scheduler pueda hablar"""
-                if hasattr(self.tars, 'tts') and self.tars.tts:
+                if getattr(self.tars, 'speech_scheduler', None) is not None:
+                    from tts.speech_scheduler import PRIORITY_ALARM
+                    self.tars.speak_from_producer(text, PRIORITY_ALARM, source="scheduler")
+                elif hasattr(self.tars, 'tts') and self.tars.tts:
                     self.tars.tts.speak(text)
                 else:
                     logger.info(f"🔊 TTS: {text}")
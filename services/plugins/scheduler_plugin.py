@@ -11,6 +11,8 @@
 
 import logging
 import json
+import os
+import queue
 import re
 import threading
 from datetime import datetime, timedelta
@@ -56,13 +58,20 @@ class SchedulerPlugin:
         
         self.data_dir = Path(data_dir)
         
-        # Almacén de trabajos
+        # Almacén de trabajos (compartido por el hilo del scheduler, el de síntesis y el del chat)
         self.jobs = {}
         self.job_counter = 0
+        self._jobs_lock = threading.RLock()
         
         # Archivo de persistencia
         self.jobs_file = self.data_dir / "scheduled_jobs.json"
         
+        # Avisos pre-sintetizados (ReminderAnnouncer, asignado con set_announcer)
+        self.announcer = None
+        self._render_queue = queue.Queue()
+        self._rendering = {}   # job_id encolado -> aviso posterior a qué minuto (None = el próximo)
+        self._render_thread = None
+        
         # Cargar trabajos existentes
         self._load_jobs()
         
@@ -93,38 +102,42 @@ class SchedulerPlugin:
         :param job_date: Fecha específica para trabajos únicos
         :return: ID del trabajo
         """
-        job_id = f"job_{self.job_counter:04d}"
-        self.job_counter += 1
-        
-        if recurrente:
-            # Trabajo recurrente
-            self.jobs[job_id] = {
-                "id": job_id,
-                "msg": message,
-                "time": time_str,
-                "recurrente": True,
-                "emotion": emotion,
-                "created": datetime.now().isoformat()
-            }
-        else:
-            # Trabajo específico
-            if not job_date:
-                job_date = datetime.now().strftime("%Y-%m-%d")
+        with self._jobs_lock:
+            job_id = f"job_{self.job_counter:04d}"
+            self.job_counter += 1
             
-            self.jobs[job_id] = {
-                "id": job_id,
-                "msg": message,
-                "time": f"{job_date} {time_str}",
-                "datetime": f"{job_date} {time_str}",
-                "recurrente": False,
-                "emotion": emotion,
-                "created": datetime.now().isoformat()
-            }
-        
-        # Guardar cambios
-        self._save_jobs()
+            if recurrente:
+                # Trabajo recurrente
+                self.jobs[job_id] = {
+                    "id": job_id,
+                    "msg": message,
+                    "time": time_str,
+                    "recurrente": True,
+                    "emotion": emotion,
+                    "created": datetime.now().isoformat()
+                }
+            else:
+                # Trabajo específico
+                if not job_date:
+                    job_date = datetime.now().strftime("%Y-%m-%d")
+                
+                self.jobs[job_id] = {
+                    "id": job_id,
+                    "msg": message,
+                    "time": f"{job_date} {time_str}",
+                    "datetime": f"{job_date} {time_str}",
+                    "recurrente": False,
+                    "emotion": emotion,
+                    "created": datetime.now().isoformat()
+                }
+            
+            # Guardar cambios
+            self._save_jobs()
         
         logger.info(f"✅ Trabajo añadido: {job_id} - {message}")
+        
+        # Sintetizar ya el aviso (en segundo plano) para que al sonar solo haya que reproducirlo
+        self._prepare_announcement(job_id)
         return job_id
     
     def remove_job(self, job_id: str) -> bool:
@@ -134,12 +147,15 @@ class SchedulerPlugin:
         :param job_id: ID del trabajo
         :return: True si se eliminó correctamente
         """
-        if job_id in self.jobs:
+        with self._jobs_lock:
+            if job_id not in self.jobs:
+                return False
             del self.jobs[job_id]
             self._save_jobs()
-            logger.info(f"🗑️ Trabajo eliminado: {job_id}")
-            return True
-        return False
+        if self.announcer:
+            self.announcer.discard(job_id)
+        logger.info(f"🗑️ Trabajo eliminado: {job_id}")
+        return True
     
     def find_jobs(self, search_term: str) -> List[Dict]:
         """
@@ -149,7 +165,9 @@ class SchedulerPlugin:
         :return: Lista de trabajos que coinciden
         """
         results = []
-        for job_id, data in self.jobs.items():
+        with self._jobs_lock:
+            jobs = list(self.jobs.items())
+        for job_id, data in jobs:
             if search_term.lower() in data["msg"].lower():
                 results.append({
                     "id": job_id,
@@ -166,7 +184,9 @@ class SchedulerPlugin:
         :return: Lista de todos los trabajos
         """
         jobs_list = []
-        for job_id, data in self.jobs.items():
+        with self._jobs_lock:
+            jobs = list(self.jobs.items())
+        for job_id, data in jobs:
             jobs_list.append({
                 "id": job_id,
                 "msg": data["msg"],
@@ -180,10 +200,13 @@ class SchedulerPlugin:
     # ===================================================================
     
     def _save_jobs(self):
-        """Guarda trabajos en JSON"""
+        """Guarda trabajos en JSON (atómico: un corte a medias no deja el archivo corrupto)"""
+        tmp_file = self.jobs_file.with_name(self.jobs_file.name + ".tmp")
         try:
-            with open(self.jobs_file, 'w', encoding='utf-8') as f:
-                json.dump(self.jobs, f, indent=2, ensure_ascii=False)
+            with self._jobs_lock:
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(self.jobs, f, indent=2, ensure_ascii=False)
+                os.replace(tmp_file, self.jobs_file)
         except Exception as e:
             logger.error(f"❌ Error guardando trabajos: {e}")
     
@@ -192,17 +215,20 @@ class SchedulerPlugin:
         try:
             if self.jobs_file.exists():
                 with open(self.jobs_file, 'r', encoding='utf-8') as f:
-                    self.jobs = json.load(f)
+                    jobs = json.load(f)
                 
-                # Actualizar contador
-                if self.jobs:
-                    max_id = max([int(job_id.split('_')[1]) for job_id in self.jobs.keys()])
-                    self.job_counter = max_id + 1
+                with self._jobs_lock:
+                    self.jobs = jobs
+                    # Actualizar contador
+                    if self.jobs:
+                        max_id = max([int(job_id.split('_')[1]) for job_id in self.jobs.keys()])
+                        self.job_counter = max_id + 1
                 
-                logger.info(f"📂 Cargados {len(self.jobs)} trabajos existentes")
+                logger.info(f"📂 Cargados {len(jobs)} trabajos existentes")
         except Exception as e:
             logger.error(f"❌ Error cargando trabajos: {e}")
-            self.jobs = {}
+            with self._jobs_lock:
+                self.jobs = {}
     
     # ===================================================================
     # 2.4 THREAD DE EJECUCIÓN (EL CORAZÓN DEL TIMING)
@@ -219,13 +245,19 @@ class SchedulerPlugin:
                 current_date = now.strftime("%Y-%m-%d")
                 current_weekday = now.weekday()  # 0=lunes, 6=domingo
                 
-                for job_id, job_data in list(self.jobs.items()):
+                with self._jobs_lock:
+                    jobs = list(self.jobs.items())
+                
+                for job_id, job_data in jobs:
                     if self._should_execute_job(job_data, current_time, current_date, current_weekday):
                         self._execute_job(job_data)
-                        
+
                         # Si no es recurrente, eliminarlo
                         if not job_data.get("recurrente", False):
                             self.remove_job(job_id)
+                    elif self.announcer and self._announcement_stale(job_data):
+                        # Voz cambiada, aviso sin renderizar o ya usado (recurrentes)
+                        self._prepare_announcement(job_id)
                 
                 # Esperar 60 segundos antes de la próxima revisión
                 threading.Event().wait(60)
@@ -263,29 +295,132 @@ class SchedulerPlugin:
         
         logger.info(f"⏰ Ejecutando recordatorio: {message}")
         
-        # LÓGICA DEFINITIVA: Frases absurdas + keywords + tiempo
-        warning = self._get_sarcastic_warning()
-        keywords_message = self._extract_keywords(message)
-        time_info = self._get_current_time_info()
-        
-        final_message = f"{warning} {keywords_message}, {time_info}"
+        # Camino rápido: aviso ya sintetizado para este minuto con la voz actual
+        prepared = job_data.get("announcement")
+        fired_at = datetime.now().replace(second=0, microsecond=0)
+        fire_time = fired_at.strftime("%Y-%m-%d %H:%M")
+        if (self.announcer and prepared and prepared.get("fire") == fire_time
+                and prepared.get("fingerprint") == self.announcer.fingerprint()
+                and self.announcer.play(job_data["id"], prepared["text"])):
+            logger.info("⚡ Aviso pre-sintetizado reproducido")
+        else:
+            # LÓGICA DEFINITIVA: Frases absurdas + keywords + tiempo
+            final_message = self._compose_announcement(message, datetime.now())
+            if self.speak_callback:
+                self.speak_callback(final_message, emotion)
         
-        if self.speak_callback:
-            self.speak_callback(final_message, emotion)
+        # Recurrentes: el aviso de mañana se prepara ya (el texto lleva el día).
+        # after=fired_at: seguimos en el minuto que acaba de sonar y ese ya no cuenta
+        if job_data.get("recurrente", False):
+            with self._jobs_lock:
+                job_data.pop("announcement", None)
+                self._save_jobs()
+            self._prepare_announcement(job_data["id"], after=fired_at)
+
+    # ===================================================================
+    # 2.5.1 AVISOS PRE-SINTETIZADOS
+    # ===================================================================
+
+    def set_announcer(self, announcer):
+        """Activa la pre-síntesis y prepara los avisos de los trabajos ya guardados"""
+        self.announcer = announcer
+        with self._jobs_lock:
+            jobs = list(self.jobs.items())
+        for job_id, job_data in jobs:
+            if self._announcement_stale(job_data):
+                self._prepare_announcement(job_id)
+
+    def _next_fire_time(self, job_data: Dict, after: Optional[datetime] = None) -> Optional[datetime]:
+        """
+        Próximo minuto en que sonará el trabajo: desde el minuto actual incluido o,
+        con after, estrictamente posterior a ese minuto (recién disparado)
+        """
+        now = datetime.now().replace(second=0, microsecond=0)
+        try:
+            if job_data.get("recurrente", False):
+                hour, minute = map(int, job_data["time"].split(":"))
+                fire = now.replace(hour=hour, minute=minute)
+                pending = fire > after if after is not None else fire >= now
+                return fire if pending else fire + timedelta(days=1)
+            return datetime.strptime(job_data["datetime"], "%Y-%m-%d %H:%M")
+        except (KeyError, ValueError):
+            return None
+
+    def _announcement_stale(self, job_data: Dict) -> bool:
+        prepared = job_data.get("announcement")
+        fire = self._next_fire_time(job_data)
+        if fire is None:
+            return False
+        return (not prepared
+                or prepared.get("fire") != fire.strftime("%Y-%m-%d %H:%M")
+                or prepared.get("fingerprint") != self.announcer.fingerprint())
+
+    def _prepare_announcement(self, job_id: str, after: Optional[datetime] = None):
+        """Encola la síntesis del aviso (un solo hilo, fuera del tick del scheduler)"""
+        if not self.announcer:
+            return
+        with self._jobs_lock:
+            queued = job_id in self._rendering
+            if not queued or after is not None:
+                self._rendering[job_id] = after
+        if queued:
+            return
+        self._render_queue.put(job_id)
+        if self._render_thread is None or not self._render_thread.is_alive():
+            self._render_thread = threading.Thread(target=self._render_loop, daemon=True)
+            self._render_thread.start()
+
+    def _render_loop(self):
+        while self.running:
+            try:
+                job_id = self._render_queue.get(timeout=5)
+            except queue.Empty:
+                continue
+            try:
+                # Fuera de la cola antes de renderizar: un cambio durante la síntesis vuelve a encolarlo
+                with self._jobs_lock:
+                    after = self._rendering.pop(job_id, None)
+                    job_data = self.jobs.get(job_id)
+                fire = self._next_fire_time(job_data, after=after) if job_data else None
+                if fire is None:
+                    continue
+                # Texto resuelto para la hora del aviso, no para ahora
+                text = self._compose_announcement(job_data.get("msg", "Recordatorio"), fire)
+                fingerprint = self.announcer.render(job_id, text)
+                if fingerprint:
+                    with self._jobs_lock:
+                        if job_id not in self.jobs:
+                            continue
+                        job_data["announcement"] = {
+                            "text": text,
+                            "fire": fire.strftime("%Y-%m-%d %H:%M"),
+                            "fingerprint": fingerprint
+                        }
+                        self._save_jobs()
+            except Exception as e:
+                logger.error(f"❌ Error pre-sintetizando aviso de {job_id}: {e}")
 
     # ===================================================================
     # 2.6 GENERACIÓN DE MENSAJES FINALES
     # ===================================================================
 
+    def _compose_announcement(self, message: str, when: datetime) -> str:
+        """Frase absurda + keywords + momento del aviso"""
+        warning = self._get_sarcastic_warning()
+        keywords_message = self._extract_keywords(message)
+        time_info = self._get_time_info(when)
+        return f"{warning} {keywords_message}, {time_info}"
+
     def _get_current_time_info(self) -> str:
         """Obtiene info de tiempo actual"""
-        from datetime import datetime
-        now = datetime.now()
-        
+        return self._get_time_info(datetime.now())
+
+    def _get_time_info(self, when: datetime) -> str:
+        """Día de la semana, día del mes y hora de `when`"""
         dias = ['lunes', 'martes', 'miércoles', 'jueves', 'viernes', 'sábado', 'domingo']
-        dia_semana = dias[now.weekday()]
+        dia_semana = dias[when.weekday()]
         
-        return f"{dia_semana} {now.day} a las {now.hour:02d}:{now.minute:02d}"
+        return f"{dia_semana} {when.day} a las {when.hour:02d}:{when.minute:02d}"
 
     def _get_sarcastic_warning(self) -> str:
         """Frases absurdas de TARS para recordatorios"""
@@ -342,7 +477,9 @@ class SchedulerPlugin:
 
     def get_status(self) -> str:
         """Estado del plugin"""
-        return f"activo - {len(self.jobs)} trabajos programados"
+        with self._jobs_lock:
+            count = len(self.jobs)
+        return f"activo - {count} trabajos programados"
 
 # =======================================================================
 # 3. TESTING Y DESARROLLO
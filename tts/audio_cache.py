@@ -0,0 +1,264 @@
+# ===============================================
+# AUDIO CACHE - Caché de Voz Ya Renderizada para TARS-BSK
+# Objetivo: Que "He apagado 3 dispositivos" no pase por Piper, el filtro y los efectos cada vez
+# Dependencias: numpy (.npy en disco), hashlib, json para el índice
+# Advertencia: Si cambias un solo parámetro de voz, todo lo guardado deja de ser mi voz.
+# ===============================================
+
+# ===============================================
+# 1. CONFIGURACIÓN INICIAL Y DEPENDENCIAS
+# ===============================================
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("TARS.AudioCache")
+
+INDEX_FILE = "index.json"
+
+# El índice se reescribe como mucho cada INDEX_FLUSH_SECONDS (y en flush() al apagar)
+INDEX_FLUSH_SECONDS = 30.0
+
+# Textos vistos una sola vez que se recuerdan (en RAM) para admitirlos a la segunda
+MAX_CANDIDATES = 1024
+
+# ===============================================
+# 2. CLASE PRINCIPAL RENDEREDAUDIOCACHE
+# ===============================================
+class RenderedAudioCache:
+    """
+    Caché en disco del audio final (post filtro y efectos), direccionada por contenido:
+
+    - Clave = sha256(huella de la voz y la cadena DSP + texto)
+    - La huella resume modelo de voz, piper_tuning, filtro de radio y preset de efectos;
+      si cambia, las entradas antiguas se purgan solas
+    - Presupuesto de bytes con expulsión LRU
+    - Admisión a la segunda: un texto solo se guarda cuando se renderiza por segunda vez
+      (las frases sueltas del LLM nunca llegan a la SD); cacheable=True lo guarda ya
+    - El índice se marca como sucio y se escribe como mucho cada INDEX_FLUSH_SECONDS o en flush()
+    """
+
+    # =======================
+    # 2.1 INICIALIZACIÓN
+    # =======================
+    def __init__(self, cache_dir, max_bytes: int = 64 * 1024 * 1024):
+        """
+        :param cache_dir: Directorio de los .npy y del índice
+        :param max_bytes: Tamaño máximo en disco antes de expulsar las menos usadas
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.fingerprint: Optional[str] = None
+        self.entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+        self._candidates: "OrderedDict[str, None]" = OrderedDict()
+        self._dirty = False
+        self._saved_at = time.time()
+
+        self.hits = 0
+        self.misses = 0
+        self.deferred = 0
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    # =======================
+    # 2.2 CLAVES Y HUELLA
+    # =======================
+    @staticmethod
+    def make_fingerprint(**settings) -> str:
+        """Huella estable de todo lo que cambia el sonido (orden de claves irrelevante)"""
+        blob = json.dumps(settings, sort_keys=True, default=str)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def _key(text: str, fingerprint: str) -> str:
+        return hashlib.sha256(f"{fingerprint}\n{text.strip()}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.npy"
+
+    def _bind(self, fingerprint: str):
+        """Purga lo renderizado con otra configuración de voz (llamar con el lock tomado)"""
+        if fingerprint == self.fingerprint:
+            return
+        stale = [k for k, e in self.entries.items() if e["fingerprint"] != fingerprint]
+        for key in stale:
+            self._remove(key)
+        if stale:
+            logger.info(f"♻️ Configuración de voz cambiada: {len(stale)} audios cacheados invalidados")
+        self.fingerprint = fingerprint
+        self._candidates.clear()
+        self._mark_dirty()
+
+    # =======================
+    # 2.3 CONSULTA Y ALMACENAMIENTO
+    # =======================
+    def get(self, text: str, fingerprint: str) -> Optional[Tuple[np.ndarray, int]]:
+        """(audio float32, sample_rate) si el texto ya se renderizó con esta configuración"""
+        key = self._key(text, fingerprint)
+        with self._lock:
+            self._bind(fingerprint)
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            try:
+                audio = np.load(self._path(key))
+            except Exception as e:
+                logger.warning(f"⚠️ Audio cacheado ilegible, descartado: {e}")
+                self._remove(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            entry["last_used"] = time.time()
+            self.hits += 1
+            self._mark_dirty()
+
+        logger.info(f"💡 Voz cacheada: '{text[:40]}'")
+        return audio.astype(np.float32) / 32767.0, entry["sample_rate"]
+
+    def put(self, text: str, fingerprint: str, audio: np.ndarray, sample_rate: int,
+            cacheable: bool = False):
+        """
+        Guarda el audio final (como int16: la mitad de disco que float32).
+        Sin cacheable, la primera vez solo se anota el texto; se escribe si vuelve a renderizarse.
+        """
+        if not len(audio):
+            return
+        key = self._key(text, fingerprint)
+
+        with self._lock:
+            self._bind(fingerprint)
+            if not cacheable and key not in self.entries:
+                if key not in self._candidates:
+                    self._candidates[key] = None
+                    if len(self._candidates) > MAX_CANDIDATES:
+                        self._candidates.popitem(last=False)
+                    self.deferred += 1
+                    return
+                del self._candidates[key]
+
+            pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+            try:
+                tmp_path = self.cache_dir / f"{key}.tmp.npy"
+                np.save(tmp_path, pcm)
+                os.replace(tmp_path, self._path(key))
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo guardar el audio en caché: {e}")
+                return
+
+            if key in self.entries:
+                self.total_bytes -= self.entries[key]["bytes"]
+            self.entries[key] = {
+                "text": text[:80],
+                "fingerprint": fingerprint,
+                "sample_rate": sample_rate,
+                "bytes": pcm.nbytes,
+                "last_used": time.time(),
+            }
+            self.entries.move_to_end(key)
+            self.total_bytes += pcm.nbytes
+
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                self._remove(next(iter(self.entries)))
+            self._mark_dirty()
+
+    def _remove(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry["bytes"]
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        with self._lock:
+            for key in list(self.entries):
+                self._remove(key)
+            self._candidates.clear()
+            self._save_index()
+
+    # =======================
+    # 2.4 PERSISTENCIA DEL ÍNDICE
+    # =======================
+    def _load_index(self):
+        index_path = self.cache_dir / INDEX_FILE
+        if not index_path.exists():
+            return
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.fingerprint = data.get("fingerprint")
+            for key, entry in sorted(data.get("entries", {}).items(), key=lambda kv: kv[1]["last_used"]):
+                if self._path(key).exists():
+                    self.entries[key] = entry
+                    self.total_bytes += entry["bytes"]
+            logger.info(f"💾 Caché de voz cargada: {len(self.entries)} audios "
+                        f"({self.total_bytes / 1024 / 1024:.1f} MB)")
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo cargar el índice de la caché de voz: {e}")
+
+        # Audios guardados después del último índice escrito (apagado brusco): fuera del presupuesto, se borran
+        for path in self.cache_dir.glob("*.npy"):
+            if path.stem not in self.entries:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def _mark_dirty(self):
+        """Índice pendiente de escribir; se escribe si el último guardado ya es antiguo (llamar con el lock)"""
+        self._dirty = True
+        if time.time() - self._saved_at >= INDEX_FLUSH_SECONDS:
+            self._save_index()
+
+    def flush(self):
+        """Escribe el índice si hay cambios pendientes (al apagar)"""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    def _save_index(self):
+        self._dirty = False
+        self._saved_at = time.time()
+        try:
+            index_path = self.cache_dir / INDEX_FILE
+            tmp_path = index_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"fingerprint": self.fingerprint, "entries": self.entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, index_path)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo guardar el índice de la caché de voz: {e}")
+
+    def get_stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "megabytes": round(self.total_bytes / 1024 / 1024, 2),
+            "hits": self.hits,
+            "misses": self.misses,
+            "deferred": self.deferred,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+# ===============================================
+# ESTADO: SONORAMENTE MEMORIOSO (ya lo había dicho, y así sonaba)
+# ÚLTIMA ACTUALIZACIÓN: Cuando "Te escucho" dejó de pasar por tres etapas de DSP cada mañana
+# FILOSOFÍA: "Las frases hechas se dicen de memoria."
+# ===============================================
+#
+#           THIS IS THE ECHO WAY...
+#           (renderizar una vez, repetir siempre)
+#
+# ===============================================
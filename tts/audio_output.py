@@ -0,0 +1,398 @@
+# ===============================================
+# AUDIO OUTPUT - Salida de Audio Residente con Mezclador para TARS-BSK
+# Objetivo: Un único stream de salida abierto todo el tiempo; voz, pitidos y relleno se mezclan en él
+# Dependencias: sounddevice (PortAudio) opcional, numpy, scipy (remuestreo de clips), wave
+# Advertencia: Lanzar aplay por cada pitido era como encender la radio para decir "bip".
+# ===============================================
+
+# ===============================================
+# 1. CONFIGURACIÓN INICIAL Y DEPENDENCIAS
+# ===============================================
+import logging
+import re
+import threading
+import time
+import wave
+from collections import deque
+from math import gcd
+from typing import Dict, List, Optional
+
+import numpy as np
+import scipy.signal
+
+try:
+    import sounddevice as sd
+except ImportError:  # Sin PortAudio: cada llamador mantiene su camino con aplay
+    sd = None
+
+logger = logging.getLogger("TARS.AudioOutput")
+
+CHANNEL_SPEECH = "speech"      # Respuestas de TARS
+CHANNEL_FILLER = "filler"      # Frases de "pensando..." mientras llega la respuesta
+CHANNEL_FEEDBACK = "feedback"  # Pitidos de wakeword
+
+# Margen sobre la duración del audio antes de dar el stream por muerto (callback parado)
+STALL_MARGIN = 2.0
+
+# ===============================================
+# 2. FUENTE DE AUDIO (UNA POR CLIP O ENUNCIADO)
+# ===============================================
+class Voice:
+    """
+    Fuente encolada en el mezclador. Puede ser un buffer completo (play) o un stream
+    al que se le van escribiendo bloques (open + write + close).
+    """
+
+    def __init__(self, channel: str, gain: float = 1.0, fade_in: int = 0):
+        self.channel = channel
+        self.base_gain = gain
+        self.gain = 0.0 if fade_in > 0 else gain
+        self._target = gain
+        self._step = 0.0
+        self._ramp_left = 0
+        if fade_in > 0:
+            self._ramp_to(gain, fade_in)
+
+        self._chunks = deque()
+        self.samples = 0   # Muestras escritas (para acotar la espera)
+        self._offset = 0
+        self._closed = False
+        self._stopping = False
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self.started_at: Optional[float] = None
+
+    # =======================
+    # 2.1 CONTROL (DESDE CUALQUIER HILO)
+    # =======================
+    def write(self, block: np.ndarray):
+        with self._lock:
+            if not self._closed:
+                block = np.asarray(block, dtype=np.float32)
+                self._chunks.append(block)
+                self.samples += len(block)
+
+    def close(self):
+        """No llegarán más bloques: la fuente termina cuando se consuma lo encolado"""
+        with self._lock:
+            self._closed = True
+
+    def fade_to(self, gain: float, samples: int):
+        self._ramp_to(gain, samples)
+
+    def stop(self, fade: int = 0):
+        """Corta la fuente (con fundido de `fade` muestras si > 0)"""
+        self._stopping = True
+        self.close()
+        if fade > 0:
+            self._ramp_to(0.0, fade)
+        else:
+            self._finish()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def _ramp_to(self, gain: float, samples: int):
+        samples = max(1, int(samples))
+        self._target = gain
+        self._step = (gain - self.gain) / samples
+        self._ramp_left = samples
+
+    def _finish(self):
+        with self._lock:
+            self._chunks.clear()
+            self._closed = True
+        self._done.set()
+
+    # =======================
+    # 2.2 MEZCLA (HILO DE AUDIO)
+    # =======================
+    def _gains(self, n: int):
+        if self._ramp_left <= 0:
+            return self.gain
+        k = min(n, self._ramp_left)
+        ramp = self.gain + self._step * np.arange(1, k + 1, dtype=np.float32)
+        self._ramp_left -= k
+        self.gain = self._target if self._ramp_left == 0 else float(ramp[-1])
+        if k < n:
+            ramp = np.concatenate([ramp, np.full(n - k, self.gain, dtype=np.float32)])
+        return ramp
+
+    def _mix_into(self, out: np.ndarray):
+        """Suma sus siguientes muestras en `out`; marca la fuente terminada al agotarse"""
+        n = len(out)
+        pulled = np.zeros(n, dtype=np.float32)
+        filled = 0
+        with self._lock:
+            while filled < n and self._chunks:
+                chunk = self._chunks[0]
+                take = min(n - filled, len(chunk) - self._offset)
+                pulled[filled:filled + take] = chunk[self._offset:self._offset + take]
+                filled += take
+                self._offset += take
+                if self._offset == len(chunk):
+                    self._chunks.popleft()
+                    self._offset = 0
+            exhausted = self._closed and not self._chunks
+
+        if filled and self.started_at is None:
+            self.started_at = time.time()
+        out += pulled * self._gains(n)
+
+        if exhausted or (self._stopping and self._ramp_left <= 0):
+            self._finish()
+
+# ===============================================
+# 3. CLASE PRINCIPAL AUDIOOUTPUT
+# ===============================================
+class AudioOutput:
+    """
+    Stream de salida único (sounddevice.OutputStream, mono float32) con mezclador:
+
+    - play(): buffer completo; open(): stream por bloques (voz mientras Piper sintetiza)
+    - Clips de feedback precargados en memoria y remuestreados una sola vez
+    - Ducking: mientras suena el canal speech, el canal filler baja a duck_gain
+    - fade/stop por fuente o por canal
+    """
+
+    # =======================
+    # 3.1 INICIALIZACIÓN
+    # =======================
+    def __init__(self, device=None, sample_rate: int = 22050, blocksize: int = 512,
+                 latency="low", duck_gain: float = 0.3, fade_ms: float = 30.0):
+        """
+        :param device: Dispositivo de salida (acepta "plughw:X,Y" de settings o nombre/índice de PortAudio)
+        :param sample_rate: Frecuencia del stream (la de Piper evita remuestrear la voz)
+        :param blocksize: Muestras por callback
+        :param latency: Latencia pedida a PortAudio ("low", "high" o segundos)
+        :param duck_gain: Ganancia del relleno mientras habla TARS
+        :param fade_ms: Fundido por defecto para stop/duck
+        """
+        self.device = device
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        self.latency = latency
+        self.duck_gain = duck_gain
+        self.fade_samples = int(sample_rate * fade_ms / 1000)
+
+        self.available = False
+        self._stream = None
+        self._voices: List[Voice] = []
+        self._lock = threading.Lock()
+        self._clips: Dict[str, np.ndarray] = {}
+
+        self.played = 0
+        self.underruns = 0
+
+    @classmethod
+    def from_settings(cls, settings: dict) -> "AudioOutput":
+        audio_settings = settings.get("audio", {})
+        stream_settings = audio_settings.get("output_stream", {})
+        return cls(
+            device=audio_settings.get("playback_device"),
+            sample_rate=stream_settings.get("sample_rate", 22050),
+            blocksize=stream_settings.get("blocksize", 512),
+            latency=stream_settings.get("latency", "low"),
+            duck_gain=stream_settings.get("duck_gain", 0.3),
+            fade_ms=stream_settings.get("fade_ms", 30.0)
+        )
+
+    def start(self) -> bool:
+        """Abre el stream residente; False si no hay sounddevice o el dispositivo no abre"""
+        if sd is None:
+            logger.info("ℹ️ sounddevice no instalado: reproducción con aplay")
+            return False
+        try:
+            self._stream = sd.OutputStream(
+                samplerate=self.sample_rate,
+                blocksize=self.blocksize,
+                channels=1,
+                dtype="float32",
+                latency=self.latency,
+                device=self._resolve_device(self.device),
+                callback=self._callback
+            )
+            self._stream.start()
+            self.available = True
+            logger.info(f"🔈 Salida de audio residente abierta ({self.sample_rate} Hz, bloque {self.blocksize})")
+        except Exception as e:
+            self._stream = None
+            logger.warning(f"⚠️ No se pudo abrir la salida de audio residente ({e}), usando aplay")
+        return self.available
+
+    @staticmethod
+    def _resolve_device(device):
+        """Traduce "plughw:X,Y" / "hw:X,Y" (ALSA) al dispositivo PortAudio "(hw:X,Y)" equivalente"""
+        if not isinstance(device, str):
+            return device
+        match = re.fullmatch(r"(?:plug)?hw:(\d+),(\d+)", device.strip())
+        if not match:
+            return device
+        alsa_name = f"(hw:{match.group(1)},{match.group(2)})"
+        for index, info in enumerate(sd.query_devices()):
+            if alsa_name in info["name"] and info["max_output_channels"] > 0:
+                return index
+        logger.info(f"ℹ️ {device} no aparece en PortAudio, usando la salida por defecto")
+        return None
+
+    # =======================
+    # 3.2 ENCOLADO DE FUENTES
+    # =======================
+    def play(self, audio: np.ndarray, sample_rate: int, channel: str = CHANNEL_SPEECH,
+             gain: float = 1.0, fade_in: float = 0.0) -> Voice:
+        """Encola un buffer float32 mono completo; devuelve la fuente (wait/stop/fade_to)"""
+        voice = Voice(channel, gain, int(fade_in * self.sample_rate))
+        voice.write(self._resample(audio, sample_rate))
+        voice.close()
+        return self._add(voice)
+
+    def open(self, sample_rate: int, channel: str = CHANNEL_SPEECH, gain: float = 1.0) -> Voice:
+        """Fuente por bloques: write() según llegan y close() al terminar"""
+        if sample_rate != self.sample_rate:
+            # Remuestrear bloque a bloque dejaría costuras: se acepta solo la frecuencia del stream
+            raise ValueError(f"Stream por bloques a {sample_rate} Hz en una salida de {self.sample_rate} Hz")
+        return self._add(Voice(channel, gain))
+
+    def play_clip(self, path, channel: str = CHANNEL_FEEDBACK, gain: float = 1.0, cache: bool = True) -> Voice:
+        """Reproduce un WAV (de memoria si está precargado)"""
+        clip = self._clips.get(str(path))
+        if clip is None:
+            clip = self.load_clip(path)
+            if cache:
+                self._clips[str(path)] = clip
+        voice = Voice(channel, gain)
+        voice.write(clip)
+        voice.close()
+        return self._add(voice)
+
+    def preload(self, paths) -> int:
+        """Carga y remuestrea clips una sola vez (pitidos de feedback)"""
+        loaded = 0
+        for path in paths:
+            try:
+                self._clips[str(path)] = self.load_clip(path)
+                loaded += 1
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo precargar {path}: {e}")
+        return loaded
+
+    def load_clip(self, path) -> np.ndarray:
+        """WAV PCM (8/16/32 bits, mono o estéreo) → float32 mono a la frecuencia del stream"""
+        with wave.open(str(path), "rb") as wav:
+            width = wav.getsampwidth()
+            channels = wav.getnchannels()
+            sample_rate = wav.getframerate()
+            raw = wav.readframes(wav.getnframes())
+        if width == 1:
+            audio = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128.0
+        elif width == 2:
+            audio = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+        elif width == 4:
+            audio = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+        else:
+            raise ValueError(f"WAV de {width * 8} bits no soportado")
+        if channels > 1:
+            audio = audio.reshape(-1, channels).mean(axis=1)
+        return self._resample(audio, sample_rate)
+
+    def _resample(self, audio: np.ndarray, sample_rate: int) -> np.ndarray:
+        audio = np.asarray(audio, dtype=np.float32)
+        if sample_rate == self.sample_rate or not len(audio):
+            return audio
+        divisor = gcd(int(sample_rate), int(self.sample_rate))
+        return scipy.signal.resample_poly(audio, self.sample_rate // divisor,
+                                          int(sample_rate) // divisor).astype(np.float32)
+
+    def _add(self, voice: Voice) -> Voice:
+        with self._lock:
+            self._voices.append(voice)
+        self.played += 1
+        return voice
+
+    # =======================
+    # 3.3 CONTROL POR CANAL
+    # =======================
+    def stop(self, channel: Optional[str] = None, fade: bool = True):
+        """Detiene las fuentes del canal (todas si channel es None)"""
+        with self._lock:
+            voices = [v for v in self._voices if channel is None or v.channel == channel]
+        for voice in voices:
+            voice.stop(self.fade_samples if fade else 0)
+
+    def wait(self, voice: Voice) -> bool:
+        """
+        Espera a que suene una fuente ya cerrada, como mucho su duración + STALL_MARGIN.
+        Si no termina, el callback de PortAudio se ha parado: la salida se marca no disponible
+        (los llamantes vuelven a aplay) y se devuelve False.
+        """
+        if voice.wait(voice.samples / self.sample_rate + STALL_MARGIN):
+            return True
+        logger.error("❌ La salida de audio residente no avanza: se desactiva y se vuelve a aplay")
+        voice.stop()
+        self.available = False
+        return False
+
+    def active(self, channel: Optional[str] = None) -> bool:
+        with self._lock:
+            return any(not v.done and (channel is None or v.channel == channel) for v in self._voices)
+
+    def close(self):
+        self.stop(fade=False)
+        if self._stream is not None:
+            try:
+                self._stream.stop()
+                self._stream.close()
+            except Exception as e:
+                logger.warning(f"⚠️ Error cerrando la salida de audio: {e}")
+            self._stream = None
+        self.available = False
+
+    # =======================
+    # 3.4 CALLBACK DE MEZCLA
+    # =======================
+    def _callback(self, outdata, frames, time_info, status):
+        if status.output_underflow:
+            self.underruns += 1
+        mix = np.zeros(frames, dtype=np.float32)
+
+        with self._lock:
+            self._voices = [v for v in self._voices if not v.done]
+            voices = list(self._voices)
+
+        # Ducking: el relleno baja mientras TARS habla y vuelve después
+        speaking = any(v.channel == CHANNEL_SPEECH for v in voices)
+        for voice in voices:
+            if voice.channel == CHANNEL_FILLER and not voice._stopping:
+                wanted = voice.base_gain * (self.duck_gain if speaking else 1.0)
+                if voice._target != wanted:
+                    voice.fade_to(wanted, self.fade_samples)
+            voice._mix_into(mix)
+
+        np.clip(mix, -1.0, 1.0, out=mix)
+        outdata[:, 0] = mix
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            active = len(self._voices)
+        return {
+            "available": self.available,
+            "played": self.played,
+            "active": active,
+            "underruns": self.underruns,
+            "preloaded_clips": len(self._clips),
+        }
+
+# ===============================================
+# ESTADO: MEZCLADO, NO AGITADO (un solo altavoz, varias opiniones)
+# ÚLTIMA ACTUALIZACIÓN: Cuando el relleno y la respuesta dejaron de pelearse por ALSA
+# FILOSOFÍA: "Abrir el dispositivo una vez es ingeniería. Abrirlo por cada pitido es costumbre."
+# ===============================================
+#
+#           THIS IS THE MIXER WAY...
+#           (un stream para gobernarlos a todos)
+#
+# ===============================================
@@ -0,0 +1,283 @@
+# ===============================================
+# PHRASE BANK - Banco de Frases Fijas Pre-renderizadas para TARS-BSK
+# Objetivo: Que "Te escucho" y compañía suenen al instante, ya sintetizados, filtrados y con efectos
+# Dependencias: numpy, wave (WAV 16 bits), json para el manifiesto; se construye con scripts/prerender_phrases.py
+# Advertencia: Si cambias la voz y no reconstruyes el banco, simplemente se ignora. No improviso con audio viejo.
+# ===============================================
+
+# ===============================================
+# 1. CONFIGURACIÓN INICIAL Y DEPENDENCIAS
+# ===============================================
+import hashlib
+import json
+import logging
+import os
+import threading
+import wave
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("TARS.PhraseBank")
+
+MANIFEST_FILE = "manifest.json"
+
+# Frases que no se pronuncian (listas de detección) o plantillas con huecos
+SKIP_FILES = {"wakewords.json"}
+SKIP_KEYS = {"keywords"}
+
+# Respuestas fijas de tars_core que no viven en data/phrases/
+FIXED_RESPONSES = [
+    "Te escucho",
+    "No he podido elaborar una respuesta coherente.",
+    "Lo siento, ha ocurrido un error al procesar la respuesta.",
+    "Necesito más tiempo para procesar esto. ¿Podemos intentarlo de nuevo?",
+    "Mi memoria está sobrecargada. ¿Puedes simplificar tu pregunta?",
+    "Ha ocurrido un problema. Este no es el camino. ¿Podemos intentar otra aproximación?",
+    "No pude procesar tu pregunta. ¿Podrías reformularla?",
+    "Disculpa, estoy teniendo dificultades. ¿Podemos intentarlo de nuevo?",
+    "No tengo información almacenada sobre tus preferencias.",
+    "No tengo información específica sobre tus preferencias.",
+]
+FIXED_CATEGORY = "fixed_responses"
+
+# ===============================================
+# 2. RECOLECCIÓN DE FRASES Y UTILIDADES WAV
+# ===============================================
+def collect_phrases(phrases_dir) -> Dict[str, List[str]]:
+    """
+    Recorre todos los JSON de data/phrases/ más las respuestas fijas.
+
+    :return: {texto: [categorías]} (categoría = nombre del JSON sin extensión)
+    """
+    phrases: Dict[str, List[str]] = {}
+
+    def add(text: str, category: str):
+        text = text.strip()
+        if not text or "{" in text:
+            return
+        categories = phrases.setdefault(text, [])
+        if category not in categories:
+            categories.append(category)
+
+    def walk(node, category: str, key: str = ""):
+        if isinstance(node, dict):
+            for child_key, child in node.items():
+                walk(child, category, child_key)
+        elif isinstance(node, list) and key not in SKIP_KEYS:
+            for item in node:
+                if isinstance(item, str):
+                    add(item, category)
+                else:
+                    walk(item, category, key)
+
+    for json_path in sorted(Path(phrases_dir).glob("*.json")):
+        if json_path.name in SKIP_FILES:
+            continue
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                walk(json.load(f), json_path.stem)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudieron leer frases de {json_path.name}: {e}")
+
+    for text in FIXED_RESPONSES:
+        add(text, FIXED_CATEGORY)
+    return phrases
+
+
+def write_wav(path, audio: np.ndarray, sample_rate: int):
+    """Escribe float32 mono como WAV PCM 16 bits (reproducible directamente con aplay)"""
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+
+
+def read_wav(path) -> Tuple[np.ndarray, int]:
+    """Lee un WAV PCM 16 bits mono como (float32, sample_rate)"""
+    with wave.open(str(path), "rb") as wav:
+        sample_rate = wav.getframerate()
+        pcm = np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2")
+    return pcm.astype(np.float32) / 32767.0, sample_rate
+
+# ===============================================
+# 3. CLASE PRINCIPAL PHRASEBANK
+# ===============================================
+class PhraseBank:
+    """
+    Banco de audio final (Piper + filtro de radio + efectos) para frases fijas:
+
+    - manifest.json: huella de la configuración de voz + {clave: texto, categorías, archivo}
+    - Clave = sha256(huella + texto): cambiar la voz cambia todas las claves
+    - En ejecución solo se usa si la huella coincide con la de la voz actual (bind)
+    """
+
+    # =======================
+    # 3.1 INICIALIZACIÓN
+    # =======================
+    def __init__(self, bank_dir):
+        """
+        :param bank_dir: Directorio con manifest.json y los WAV
+        """
+        self.bank_dir = Path(bank_dir)
+        self.fingerprint: Optional[str] = None
+        self.entries: Dict[str, dict] = {}
+        self.active = False
+        self._by_text: Dict[str, dict] = {}
+        self._phrases: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        self._load_manifest()
+
+    @staticmethod
+    def make_key(text: str, fingerprint: str) -> str:
+        return hashlib.sha256(f"{fingerprint}\n{text.strip()}".encode("utf-8")).hexdigest()
+
+    def bind(self, fingerprint: str) -> bool:
+        """Activa el banco solo si se renderizó con esta configuración de voz"""
+        self.active = bool(self.entries) and fingerprint == self.fingerprint
+        if self.active:
+            logger.info(f"🎙️ Banco de frases activo: {len(self.entries)} frases pre-renderizadas")
+        elif self.entries:
+            logger.warning("⚠️ Banco de frases generado con otra configuración de voz: ignorado "
+                           "(ejecuta scripts/prerender_phrases.py)")
+        else:
+            logger.info("ℹ️ Banco de frases vacío (scripts/prerender_phrases.py lo genera)")
+        return self.active
+
+    # =======================
+    # 3.2 CONSULTA EN EJECUCIÓN
+    # =======================
+    def contains(self, text: str) -> bool:
+        return self.active and text.strip() in self._by_text
+
+    def lookup(self, text: str) -> Optional[Tuple[np.ndarray, int]]:
+        """(audio float32, sample_rate) si la frase exacta está en el banco"""
+        if not self.active:
+            return None
+        entry = self._by_text.get(text.strip())
+        if entry is None:
+            self.misses += 1
+            return None
+        try:
+            audio = read_wav(self.bank_dir / entry["file"])
+        except Exception as e:
+            logger.warning(f"⚠️ Audio del banco ilegible ({entry['file']}): {e}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        logger.info(f"🎙️ Frase pre-renderizada: '{text[:40]}'")
+        return audio
+
+    def category_files(self, category: str) -> List[str]:
+        """WAV del banco de una categoría (p.ej. 'thinking_responses'), vacío si el banco no está activo"""
+        if not self.active:
+            return []
+        return [str(self.bank_dir / entry["file"]) for entry in self.entries.values()
+                if category in entry["categories"]]
+
+    # =======================
+    # 3.3 CONSTRUCCIÓN INCREMENTAL (scripts/prerender_phrases.py)
+    # =======================
+    def plan(self, phrases: Dict[str, List[str]], fingerprint: str) -> List[Tuple[str, str]]:
+        """
+        Prepara el manifiesto para esta huella y devuelve lo que falta por renderizar.
+
+        :return: [(clave, texto)] de frases nuevas o cuyo audio no existe
+        """
+        pending = []
+        wanted = {}
+        for text, categories in phrases.items():
+            key = self.make_key(text, fingerprint)
+            wanted[key] = text
+            entry = self.entries.get(key)
+            if entry is not None and (self.bank_dir / entry["file"]).exists():
+                entry["categories"] = categories
+            else:
+                pending.append((key, text))
+
+        # Frases eliminadas de los JSON o renderizadas con otra voz
+        stale = [key for key in self.entries if key not in wanted]
+        for key in stale:
+            self._remove(key)
+        if stale:
+            logger.info(f"♻️ {len(stale)} frases obsoletas eliminadas del banco")
+
+        self.fingerprint = fingerprint
+        self._phrases = phrases
+        return pending
+
+    def add(self, key: str, text: str, sample_rate: int, samples: int):
+        """Registra un WAV ya escrito en bank_dir/<clave>.wav"""
+        with self._lock:
+            self.entries[key] = {
+                "text": text,
+                "categories": self._phrases.get(text, []),
+                "file": f"{key}.wav",
+                "sample_rate": sample_rate,
+                "seconds": round(samples / sample_rate, 3),
+            }
+            self._by_text[text] = self.entries[key]
+
+    def _remove(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        self._by_text.pop(entry["text"], None)
+        try:
+            (self.bank_dir / entry["file"]).unlink()
+        except FileNotFoundError:
+            pass
+
+    # =======================
+    # 3.4 PERSISTENCIA DEL MANIFIESTO
+    # =======================
+    def _load_manifest(self):
+        manifest_path = self.bank_dir / MANIFEST_FILE
+        if not manifest_path.exists():
+            return
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.fingerprint = data.get("fingerprint")
+            self.entries = data.get("entries", {})
+            self._by_text = {entry["text"]: entry for entry in self.entries.values()}
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo cargar el manifiesto del banco de frases: {e}")
+
+    def save_manifest(self):
+        with self._lock:
+            self.bank_dir.mkdir(parents=True, exist_ok=True)
+            manifest_path = self.bank_dir / MANIFEST_FILE
+            tmp_path = manifest_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"fingerprint": self.fingerprint, "entries": self.entries}, f,
+                          ensure_ascii=False, indent=1)
+            os.replace(tmp_path, manifest_path)
+
+    def get_stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "active": self.active,
+            "phrases": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+# ===============================================
+# ESTADO: PREMEDITADAMENTE ESPONTÁNEO (mis improvisaciones vienen de fábrica)
+# ÚLTIMA ACTUALIZACIÓN: Cuando "Te escucho" dejó de necesitar tres etapas de DSP y un modelo ONNX
+# FILOSOFÍA: "Lo que se dice siempre igual, se graba una vez."
+# ===============================================
+#
+#           THIS IS THE REPERTOIRE WAY...
+#           (ensayado en frío, servido al instante)
+#
+# ===============================================
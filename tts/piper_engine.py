@@ -0,0 +1,237 @@
+# ===============================================
+# PIPER ENGINE - Voz Residente en Memoria para TARS-BSK
+# Objetivo: Cargar el modelo de voz una vez, no una vez por frase
+# Dependencias: piper-tts (PiperVoice + onnxruntime) opcional, numpy; ./piper como plan B
+# Advertencia: Arrancar Piper para decir "Sí." costaba más que decirlo.
+# ===============================================
+
+# ===============================================
+# 1. CONFIGURACIÓN INICIAL Y DEPENDENCIAS
+# ===============================================
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger("TARS.PiperEngine")
+
+# Directorio de la instalación compilada de Piper (binario ./piper para el modo subproceso)
+PIPER_INSTALL_DIR = "/home/tarsadmin/tars_build/piper/install"
+
+BACKEND_RESIDENT = "residente"
+BACKEND_SUBPROCESS = "subproceso"
+
+# ===============================================
+# 2. CLASE PRINCIPAL PIPERENGINE
+# ===============================================
+class PiperEngine:
+    """
+    Motor de síntesis de larga vida que devuelve PCM (int16 mono) sin tocar disco:
+
+    - residente: PiperVoice (onnxruntime) cargado una sola vez en este proceso
+    - subproceso: ./piper --output_raw por fragmento (el camino de siempre, sin WAV intermedio)
+
+    Si el modo residente no se puede cargar o falla en una frase, se usa el subproceso.
+    """
+
+    # =======================
+    # 2.1 INICIALIZACIÓN
+    # =======================
+    def __init__(self, model_path, config_path, espeak_path=None, length_scale=None,
+                 noise_scale=None, noise_w=None, volume_scale: float = 1.0,
+                 prefer_resident: bool = True, piper_dir: str = PIPER_INSTALL_DIR):
+        """
+        :param model_path: Modelo ONNX de la voz
+        :param config_path: JSON de la voz (sample_rate, fonemas)
+        :param espeak_path: Datos de espeak-ng
+        :param length_scale: Velocidad (None = la del modelo)
+        :param noise_scale: Variabilidad (None = la del modelo)
+        :param noise_w: Peso del ruido (None = el del modelo)
+        :param volume_scale: Ganancia lineal aplicada al PCM
+        :param prefer_resident: Intentar cargar la voz en memoria (False = siempre subproceso)
+        :param piper_dir: Directorio con el binario ./piper
+        """
+        self.model_path = Path(model_path)
+        self.config_path = Path(config_path)
+        self.espeak_path = espeak_path
+        self.length_scale = length_scale
+        self.noise_scale = noise_scale
+        self.noise_w = noise_w
+        self.volume_scale = volume_scale
+        self.piper_dir = piper_dir
+
+        self.sample_rate = self._read_sample_rate()
+        self.voice = None
+        self.backend = BACKEND_SUBPROCESS
+        self._lock = threading.Lock()
+
+        self.syntheses = 0
+        self.fallbacks = 0
+        self.total_time = 0.0
+
+        if self.espeak_path:
+            os.environ["ESPEAK_DATA_PATH"] = str(self.espeak_path)
+        if prefer_resident:
+            self._load_resident()
+
+    def _read_sample_rate(self) -> int:
+        try:
+            with open(self.config_path, "r", encoding="utf-8") as f:
+                return int(json.load(f)["audio"]["sample_rate"])
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo leer sample_rate de {self.config_path}: {e}. Usando 22050 Hz")
+            return 22050
+
+    def _load_resident(self):
+        """Carga PiperVoice una sola vez (si piper-tts está instalado)"""
+        try:
+            from piper.voice import PiperVoice
+        except ImportError:
+            logger.info("ℹ️ piper-tts no instalado: síntesis por subproceso (./piper)")
+            return
+
+        try:
+            start = time.time()
+            self.voice = PiperVoice.load(str(self.model_path), config_path=str(self.config_path), use_cuda=False)
+            self.sample_rate = self.voice.config.sample_rate
+            self.backend = BACKEND_RESIDENT
+            logger.info(f"✅ Voz Piper residente cargada en {time.time() - start:.2f}s ({self.sample_rate} Hz)")
+        except Exception as e:
+            self.voice = None
+            logger.warning(f"⚠️ No se pudo cargar la voz residente ({e}), usando ./piper")
+
+    # =======================
+    # 2.2 SÍNTESIS
+    # =======================
+    def synthesize(self, text: str) -> np.ndarray:
+        """
+        Sintetiza texto a PCM.
+        :return: np.int16 mono a self.sample_rate (vacío si falló)
+        """
+        start = time.time()
+        with self._lock:
+            pcm = None
+            if self.voice is not None:
+                try:
+                    pcm = self._synthesize_resident(text)
+                except Exception as e:
+                    self.fallbacks += 1
+                    logger.warning(f"⚠️ Síntesis residente fallida ({e}), reintentando con ./piper")
+            if pcm is None:
+                pcm = self._synthesize_subprocess(text)
+
+        pcm = self._apply_volume(pcm)
+        elapsed = time.time() - start
+        self.syntheses += 1
+        self.total_time += elapsed
+        logger.info(f"🗣️ Voz [{self.backend}]: {len(pcm) / self.sample_rate:.2f}s de audio en {elapsed:.2f}s")
+        return pcm
+
+    def synthesize_stream(self, text: str):
+        """
+        Generador de trozos PCM int16 según los produce Piper (una frase por trozo en modo residente).
+        En modo subproceso el audio llega de una vez.
+        """
+        if self.voice is None:
+            yield self.synthesize(text)
+            return
+
+        start = time.time()
+        produced = 0
+        # El lock se mantiene entre yields: el consumidor debe cerrar el generador (contextlib.closing)
+        # si abandona antes del final, o el resto de síntesis esperarían hasta que lo recoja el GC
+        self._lock.acquire()
+        try:
+            try:
+                for raw in self.voice.synthesize_stream_raw(text, **self._synthesis_kwargs()):
+                    pcm = self._apply_volume(np.frombuffer(raw, dtype=np.int16))
+                    produced += len(pcm)
+                    yield pcm
+            except Exception as e:
+                self.fallbacks += 1
+                logger.warning(f"⚠️ Síntesis residente fallida ({e}), reintentando con ./piper")
+                if produced == 0:
+                    yield self._apply_volume(self._synthesize_subprocess(text))
+        finally:
+            self._lock.release()
+
+        elapsed = time.time() - start
+        self.syntheses += 1
+        self.total_time += elapsed
+        logger.info(f"🗣️ Voz [{self.backend}, stream]: {produced / self.sample_rate:.2f}s de audio en {elapsed:.2f}s")
+
+    def _synthesis_kwargs(self) -> dict:
+        kwargs = {}
+        if self.length_scale is not None:
+            kwargs["length_scale"] = self.length_scale
+        if self.noise_scale is not None:
+            kwargs["noise_scale"] = self.noise_scale
+        if self.noise_w is not None:
+            kwargs["noise_w"] = self.noise_w
+        return kwargs
+
+    def _synthesize_resident(self, text: str) -> np.ndarray:
+        raw = b"".join(self.voice.synthesize_stream_raw(text, **self._synthesis_kwargs()))
+        return np.frombuffer(raw, dtype=np.int16)
+
+    def _synthesize_subprocess(self, text: str) -> np.ndarray:
+        """Camino clásico (./piper por fragmento), con PCM por stdout en vez de WAV en disco"""
+        command = [
+            "./piper",
+            "--model", str(self.model_path),
+            "--config", str(self.config_path),
+            "--output_raw",
+            "--json-input",
+        ]
+        input_data = {"text": text}
+        for flag, key, value in (("--length-scale", "length_scale", self.length_scale),
+                                 ("--noise-scale", "noise_scale", self.noise_scale),
+                                 ("--noise-w", "noise_w", self.noise_w)):
+            if value is not None:
+                command.extend([flag, str(value)])
+                input_data[key] = value
+
+        process = subprocess.run(
+            command,
+            input=json.dumps(input_data).encode("utf-8"),
+            cwd=self.piper_dir,
+            capture_output=True
+        )
+        if process.returncode != 0:
+            logger.error(f"❌ Error al sintetizar voz: {process.stderr.decode(errors='ignore')}")
+            return np.zeros(0, dtype=np.int16)
+        return np.frombuffer(process.stdout, dtype=np.int16)
+
+    def _apply_volume(self, pcm: np.ndarray) -> np.ndarray:
+        if self.volume_scale == 1.0 or not len(pcm):
+            return pcm
+        scaled = pcm.astype(np.float32) * self.volume_scale
+        return np.clip(scaled, -32768, 32767).astype(np.int16)
+
+    # =======================
+    # 2.3 ESTADÍSTICAS
+    # =======================
+    def get_stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "syntheses": self.syntheses,
+            "fallbacks": self.fallbacks,
+            "avg_time": self.total_time / self.syntheses if self.syntheses else 0.0,
+        }
+
+# ===============================================
+# ESTADO: VOCALMENTE RESIDENTE (ya no me despierto para cada frase)
+# ÚLTIMA ACTUALIZACIÓN: Cuando cargar el ONNX dejó de ser el 40% de cada "Entendido."
+# FILOSOFÍA: "Una voz que hay que arrancar cada vez no es una voz. Es un trámite."
+# ===============================================
+#
+#           THIS IS THE RESIDENT WAY...
+#           (la voz se queda, las frases pasan)
+#
+# ===============================================
@@ -10,14 +10,20 @@
 # ===============================================
 import subprocess
 import os
+from contextlib import closing
 from pathlib import Path
 import logging
 import json
 import sys
 
+import numpy as np
+import soundfile as sf
+
 # Add the core directory to the Python path to import radio_filter
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from core.radio_filter import apply_radio_filter
+from core.radio_filter import radio_filter_buffer, StreamingRadioFilter
+from tts.piper_engine import PiperEngine
+from tts.audio_cache import RenderedAudioCache
 
 logger = logging.getLogger("TARS.TTS")
 
@@ -37,7 +43,8 @@ class PiperTTS:
                  audio_device=None, length_scale=None, noise_scale=None, noise_w=None,
                  radio_filter_enabled=False, radio_filter_band=None, 
                  radio_filter_noise=True, radio_filter_compression=True,
-                 mando_effect_enabled=False, gain_before_filter=0.0):
+                 mando_effect_enabled=False, gain_before_filter=0.0, resident_voice=True,
+                 export_wav=False, radio_filter_streaming=False, stream_block_size=1024):
         """
         Inicializa el sintetizador de voz Piper con opciones configurables.
         
@@ -56,6 +63,10 @@ class PiperTTS:
             radio_filter_compression: Añadir compresión al filtro
             mando_effect_enabled: Activar efecto Mandaloriano
             gain_before_filter: Ganancia a aplicar antes del filtro (en dB)
+            resident_voice: Mantener la voz cargada en memoria (False = ./piper por fragmento)
+            export_wav: Guardar también cada frase en output_path (depuración)
+            radio_filter_streaming: Filtrar por bloques mientras Piper sintetiza (StreamingRadioFilter)
+            stream_block_size: Muestras por bloque del filtro en streaming
         """
         self.model_path = model_path
         self.config_path = config_path
@@ -83,161 +94,334 @@ class PiperTTS:
                        f"ruido={self.radio_filter_noise}, compresión={self.radio_filter_compression}, " +
                        f"efecto_mando={self.mando_effect_enabled}, ganancia={self.gain_before_filter}dB")
         
-        # Create temp file path for processing
-        self.temp_output_path = os.path.join(os.path.dirname(self.output_path), 
-                                           "temp_" + os.path.basename(self.output_path))
+        # Motor de síntesis de larga vida: la voz se carga una vez y devuelve PCM
+        self.engine = PiperEngine(
+            model_path, config_path, espeak_path,
+            length_scale=length_scale, noise_scale=noise_scale, noise_w=noise_w,
+            volume_scale=10 ** (gain_before_filter / 20),  # Conversión dB a escala lineal
+            prefer_resident=resident_voice
+        )
+
+        # El audio ya no pasa por disco: output_path solo se escribe si se pide exportar
+        self.export_wav = export_wav
+
+        # Caché de audio final (RenderedAudioCache), se asigna desde fuera como audio_effects_config
+        self.audio_cache = None
+
+        # Banco de frases fijas pre-renderizadas (PhraseBank), también asignado desde fuera
+        self.phrase_bank = None
+
+        # Salida de audio residente con mezclador (AudioOutput); None = aplay por reproducción
+        self.audio_output = None
+
+        # Filtro de radio por bloques: la reproducción empieza con el primer bloque filtrado
+        self.radio_filter_streaming = radio_filter_streaming
+        self.stream_block_size = stream_block_size
 
     # =======================
     # 2.2 SÍNTESIS Y REPRODUCCIÓN
     # =======================
     def speak(self, text: str):
         """
-        Sintetiza y reproduce el texto proporcionado.
+        Sintetiza y reproduce el texto proporcionado (todo en memoria).
         
         Args:
             text: Texto a sintetizar y reproducir
         """
         try:
-            from json import dumps
-
-            # 🔍 INFO: Verificar configuración de audio effects
-            # logger.info(f"🔍 INFO: audio_effects_config en speak() = {self.audio_effects_config}")
-
-            safe_text = text.replace('"', '\\"')
-            os.environ["ESPEAK_DATA_PATH"] = str(self.espeak_path)
-
-            # Define the output path - use temp if we'll be applying radio filter
-            output_file = self.temp_output_path if self.radio_filter_enabled else self.output_path
-
-            # Preparar comando y datos para Piper
-            command = [
-                "./piper",
-                "--model", str(self.model_path),
-                "--config", str(self.config_path),
-                "--output_file", str(output_file),
-                "--json-input",
-                "--length-scale", str(self.length_scale), 
-                "--noise-scale", str(self.noise_scale),   
-                "--noise-w", str(self.noise_w)            
-            ]
+            if self._can_stream() and not self.export_wav:
+                # Bloques filtrados directos a aplay según salen de Piper.
+                # closing: si la reproducción falla a medias, el lock de Piper se libera ya, no en el GC
+                with closing(self.render_blocks(text)) as blocks:
+                    self.play_blocks(blocks, self.engine.sample_rate)
+                logger.info("🔊 Reproducción completada")
+                return
+
+            audio, sample_rate = self.render(text)
+            if not len(audio):
+                return
+
+            # Exportación solo bajo demanda (depuración, scripts)
+            if self.export_wav:
+                sf.write(str(self.output_path), audio, sample_rate)
+                logger.info(f"💾 Audio exportado a {self.output_path}")
+
+            # Reproducir el buffer directamente en el dispositivo
+            self.play_buffer(audio, sample_rate)
+            logger.info("🔊 Reproducción completada")
+
+        except Exception as e:
+            logger.exception(f"Error hablando: {e}")
+
+    def render(self, text: str):
+        """
+        Síntesis + filtro de radio + audio effects sin tocar disco.
+        
+        Args:
+            text: Texto a sintetizar
             
-            # Preparar datos de entrada JSON
-            input_data = {"text": safe_text}
-
-            # Añadir parámetros opcionales si están definidos
-            if self.length_scale is not None:
-                input_data["length_scale"] = self.length_scale
-            if self.noise_scale is not None:
-                input_data["noise_scale"] = self.noise_scale
-            if self.noise_w is not None:
-                input_data["noise_w"] = self.noise_w
+        Returns:
+            (audio float32 mono en [-1, 1], sample_rate)
+        """
+        # Frases fijas pre-renderizadas (scripts/prerender_phrases.py)
+        if self.phrase_bank is not None:
+            banked = self.phrase_bank.lookup(text)
+            if banked is not None:
+                return banked
+
+        # Frases repetidas: directo a reproducción, sin Piper ni DSP
+        fingerprint = None
+        if self.audio_cache is not None:
+            fingerprint = self.render_fingerprint()
+            cached = self.audio_cache.get(text, fingerprint)
+            if cached is not None:
+                return cached
+
+        if self._can_stream():
+            blocks = list(self.render_blocks(text, use_cache=False))
+            audio = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+            if self.audio_cache is not None:
+                self.audio_cache.put(text, fingerprint, audio, self.engine.sample_rate)
+            return audio, self.engine.sample_rate
+
+        if self.gain_before_filter != 0.0:
+            logger.info(f"🔊 Aplicando ganancia de {self.gain_before_filter}dB")
+
+        # Ejecutar síntesis de voz (voz residente; ./piper solo como respaldo)
+        logger.info(f"🗣️ Generando voz: '{text}'")
+        pcm, sample_rate = self.synthesize_pcm(text)
+        audio = pcm.astype(np.float32) / 32768.0
+        if not len(audio):
+            return audio, sample_rate
+
+        # Apply radio filter if enabled
+        if self.radio_filter_enabled:
+            # Mejorar el mensaje de log con detalles sobre el tipo de filtro
+            filter_type = "Filtro Mandaloriano" if self.mando_effect_enabled else "Filtro de radio estándar"
+            logger.info(f"🎛️ Aplicando {filter_type} [banda: {self.radio_filter_band[0]}-{self.radio_filter_band[1]}Hz]...")
             
-            # Aplicar ganancia antes del filtro si está especificada
-            if self.gain_before_filter != 0.0:
-                input_data["volume_scale"] = 10 ** (self.gain_before_filter / 20)  # Conversión dB a escala lineal
-                logger.info(f"🔊 Aplicando ganancia de {self.gain_before_filter}dB")
-
-            # Ejecutar síntesis de voz
-            logger.info(f"🗣️ Generando voz: '{text}'")
-            process = subprocess.run(
-                command,
-                input=dumps(input_data).encode("utf-8"),
-                cwd="/home/tarsadmin/tars_build/piper/install",
-                capture_output=True
-            )
-
-            if process.returncode != 0:
-                logger.error(f"❌ Error al sintetizar voz: {process.stderr.decode()}")
+            try:
+                # Configurar los parámetros del filtro utilizando los valores configurados
+                audio = radio_filter_buffer(
+                    audio, sample_rate,
+                    lowcut=self.radio_filter_band[0], 
+                    highcut=self.radio_filter_band[1],
+                    add_noise=self.radio_filter_noise,
+                    add_compression=self.radio_filter_compression,
+                    mando_effect=self.mando_effect_enabled,
+                    noise_level=0.003 if self.mando_effect_enabled else 0.002  # Aumentar ruido para efecto mando
+                )
+            except Exception as e:
+                # If filter fails, use the unfiltered audio
+                logger.error(f"❌ Error al aplicar filtro de radio: {e}")
+        
+        # ========== APLICAR AUDIO EFFECTS (MEJORADO) ==========
+        # Aplicar efectos de audio después del radio filter
+        try:
+            if self.audio_effects_config and self.audio_effects_config.get("enabled", False):
+                preset = self.audio_effects_config.get("preset", "none")
+                
+                if preset != "none":
+                    logger.info(f"🎚️ Aplicando audio effects: {preset}")
+                    
+                    # Importar solo cuando se necesite
+                    from core.audio_effects_processor import AudioEffectsProcessor
+                    
+                    # Verificar que el preset existe
+                    if preset not in AudioEffectsProcessor.PRESETS:
+                        logger.warning(f"⚠️ Preset '{preset}' no encontrado, usando 'studio'")
+                        self.audio_effects_config["preset"] = "studio"
+                        preset = "studio"
+                    
+                    # Crear procesador y aplicar efectos sobre el buffer
+                    processor = AudioEffectsProcessor(self.audio_effects_config)
+                    audio = processor.process_buffer(audio, sample_rate)
+                else:
+                    logger.debug("🔇 Audio effects preset: none")
+            else:
+                logger.debug("🔇 Audio effects deshabilitados")
+                    
+        except ImportError:
+            logger.warning("⚠️ Módulo audio_effects_processor no disponible")
+        except Exception as e:
+            logger.warning(f"⚠️ Error aplicando audio effects: {e}")
+            # Continuar sin efectos - no fallar por esto
+        # ========== FIN AUDIO EFFECTS ==========
+
+        if self.audio_cache is not None:
+            self.audio_cache.put(text, fingerprint, audio, sample_rate)
+
+        return audio, sample_rate
+
+    def _can_stream(self) -> bool:
+        """El streaming por bloques solo aplica si no hay efectos temporales (esos van sobre el buffer entero)"""
+        effects = self.audio_effects_config or {}
+        effects_active = effects.get("enabled", False) and effects.get("preset", "none") != "none"
+        return self.radio_filter_streaming and not effects_active
+
+    def render_blocks(self, text: str, use_cache: bool = True):
+        """
+        Generador de bloques float32 filtrados según Piper los produce.
+        Latencia por bloque acotada: stream_block_size muestras tras cada trozo de síntesis.
+        
+        Args:
+            text: Texto a sintetizar
+            use_cache: Consultar y alimentar la caché de audio
+        """
+        sample_rate = self.engine.sample_rate
+        if use_cache and self.phrase_bank is not None:
+            banked = self.phrase_bank.lookup(text)
+            if banked is not None:
+                yield banked[0]
                 return
 
-            # Apply radio filter if enabled
+        fingerprint = None
+        if use_cache and self.audio_cache is not None:
+            fingerprint = self.render_fingerprint()
+            cached = self.audio_cache.get(text, fingerprint)
+            if cached is not None:
+                yield cached[0]
+                return
+
+        logger.info(f"🗣️ Generando voz (streaming): '{text}'")
+        rendered = []
+        # Cerrar este generador cierra también el de Piper (y suelta su lock)
+        with closing(self.engine.synthesize_stream(text)) as stream:
+            chunks = (pcm.astype(np.float32) / 32768.0 for pcm in stream)
+
             if self.radio_filter_enabled:
-                # Mejorar el mensaje de log con detalles sobre el tipo de filtro
-                filter_type = "Filtro Mandaloriano" if self.mando_effect_enabled else "Filtro de radio estándar"
-                logger.info(f"🎛️ Aplicando {filter_type} [banda: {self.radio_filter_band[0]}-{self.radio_filter_band[1]}Hz]...")
-                
-                try:
-                    # Configurar los parámetros del filtro utilizando los valores configurados
-                    apply_radio_filter(
-                        input_wav_path=self.temp_output_path, 
-                        output_wav_path=self.output_path,
-                        lowcut=self.radio_filter_band[0], 
-                        highcut=self.radio_filter_band[1],
-                        add_noise=self.radio_filter_noise,
-                        add_compression=self.radio_filter_compression,
-                        mando_effect=self.mando_effect_enabled,
-                        noise_level=0.003 if self.mando_effect_enabled else 0.002  # Aumentar ruido para efecto mando
-                    )
-                    
-                    # Remove temporary file
-                    if os.path.exists(self.temp_output_path):
-                        os.remove(self.temp_output_path)
-                        
-                except Exception as e:
-                    logger.error(f"❌ Error al aplicar filtro de radio: {e}")
-                    # If filter fails, try to use the unfiltered audio
-                    if os.path.exists(self.temp_output_path) and not os.path.exists(self.output_path):
-                        os.rename(self.temp_output_path, self.output_path)
+                radio = StreamingRadioFilter(
+                    sample_rate,
+                    lowcut=self.radio_filter_band[0],
+                    highcut=self.radio_filter_band[1],
+                    add_noise=self.radio_filter_noise,
+                    add_compression=self.radio_filter_compression,
+                    mando_effect=self.mando_effect_enabled,
+                    noise_level=0.003 if self.mando_effect_enabled else 0.002,
+                    block_size=self.stream_block_size
+                )
+                chunks = radio.process_stream(chunks)
+
+            for block in chunks:
+                rendered.append(block)
+                yield block
+
+        if fingerprint is not None and rendered:
+            self.audio_cache.put(text, fingerprint, np.concatenate(rendered), sample_rate)
+
+    def render_fingerprint(self) -> str:
+        """Huella de todo lo que cambia el sonido final (voz, piper_tuning, filtro y efectos)"""
+        effects = self.audio_effects_config or {}
+        return RenderedAudioCache.make_fingerprint(
+            # Rutas resueltas: from_settings (relativas) y tars_core (absolutas) dan la misma huella
+            voice_model=str(Path(self.model_path).resolve()),
+            voice_config=str(Path(self.config_path).resolve()),
+            length_scale=self.length_scale,
+            noise_scale=self.noise_scale,
+            noise_w=self.noise_w,
+            gain_before_filter=self.gain_before_filter,
+            radio_filter=[self.radio_filter_enabled, self.radio_filter_band, self.radio_filter_noise,
+                          self.radio_filter_compression, self.mando_effect_enabled],
+            audio_effects=[effects.get("preset", "none"), effects.get("ir_file")] if effects.get("enabled", False) else "none",
+            radio_filter_streaming=self._can_stream(),
+        )
+    
+    def synthesize_pcm(self, text: str):
+        """
+        Sintetiza sin reproducir ni escribir a disco.
+
+        Returns:
+            (pcm int16 mono, sample_rate)
+        """
+        return self.engine.synthesize(text), self.engine.sample_rate
+
+    def play_buffer(self, audio: np.ndarray, sample_rate: int):
+        """
+        Reproduce un buffer float32 enviando PCM crudo a aplay por stdin (sin archivo).
+        
+        Args:
+            audio: Audio float32 mono en [-1, 1]
+            sample_rate: Frecuencia de muestreo del buffer
+        """
+        if self.audio_output is not None and self.audio_output.available:
+            if self.audio_output.wait(self.audio_output.play(audio, sample_rate)):
+                return
+            # Stream residente atascado: el fragmento entero se repite por aplay
+
+        try:
+            pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+            play_command = [
+                "aplay",
+                "-t", "raw", "-f", "S16_LE", "-c", "1", "-r", str(sample_rate),
+                "-q"
+            ]
+            if self.audio_device:
+                play_command.extend(["-D", self.audio_device])
             
-            # ========== APLICAR AUDIO EFFECTS (MEJORADO) ==========
-            # Aplicar efectos de audio después del radio filter
+            subprocess.run(play_command, input=pcm.tobytes(), stderr=subprocess.DEVNULL)
+            
+        except Exception as e:
+            logger.error(f"❌ Error reproduciendo audio: {e}")
+
+    def play_blocks(self, blocks, sample_rate: int):
+        """
+        Reproduce bloques según llegan: aplay arranca con el primero y lee el resto por stdin.
+        
+        Args:
+            blocks: Iterable de bloques float32 mono
+            sample_rate: Frecuencia de muestreo
+        """
+        if (self.audio_output is not None and self.audio_output.available
+                and sample_rate == self.audio_output.sample_rate):
+            voice = self.audio_output.open(sample_rate)
+            written = []
             try:
-                if self.audio_effects_config and self.audio_effects_config.get("enabled", False):
-                    preset = self.audio_effects_config.get("preset", "none")
-                    
-                    if preset != "none":
-                        logger.info(f"🎚️ Aplicando audio effects: {preset}")
-                        
-                        # Importar solo cuando se necesite
-                        from core.audio_effects_processor import AudioEffectsProcessor
-                        
-                        # Verificar que el preset existe
-                        if preset not in AudioEffectsProcessor.PRESETS:
-                            logger.warning(f"⚠️ Preset '{preset}' no encontrado, usando 'studio'")
-                            self.audio_effects_config["preset"] = "studio"
-                            preset = "studio"
-                        
-                        # Crear procesador y aplicar efectos
-                        processor = AudioEffectsProcessor(self.audio_effects_config)
-                        success = processor.apply_effects(
-                            input_wav_path=str(self.output_path),
-                            output_wav_path=str(self.output_path)  # Sobrescribe el mismo archivo
-                        )
-                        
-                        if not success:
-                            logger.warning("⚠️ Audio effects configurados pero no aplicados correctamente")
-                    else:
-                        logger.debug("🔇 Audio effects preset: none")
-                else:
-                    logger.debug("🔇 Audio effects deshabilitados")
-                        
-            except ImportError:
-                logger.warning("⚠️ Módulo audio_effects_processor no disponible")
+                for block in blocks:
+                    voice.write(block)
+                    written.append(block)
             except Exception as e:
-                logger.warning(f"⚠️ Error aplicando audio effects: {e}")
-                # Continuar sin efectos - no fallar por esto
-            # ========== FIN AUDIO EFFECTS ==========
-            
-            # Reproducir el audio con parámetros mejorados
-            self._play_audio()
-            logger.info("🔊 Reproducción completada")
+                logger.error(f"❌ Error reproduciendo audio: {e}")
+            finally:
+                voice.close()
+            if not self.audio_output.wait(voice) and written:
+                # Stream residente atascado: lo ya sintetizado se repite por aplay
+                self.play_buffer(np.concatenate(written), sample_rate)
+            return
+
+        play_command = ["aplay", "-t", "raw", "-f", "S16_LE", "-c", "1", "-r", str(sample_rate), "-q"]
+        if self.audio_device:
+            play_command.extend(["-D", self.audio_device])
 
+        process = None
+        try:
+            for block in blocks:
+                if process is None:
+                    process = subprocess.Popen(play_command, stdin=subprocess.PIPE, stderr=subprocess.DEVNULL)
+                process.stdin.write((np.clip(block, -1.0, 1.0) * 32767).astype("<i2").tobytes())
         except Exception as e:
-            logger.exception(f"Error hablando: {e}")
-            # Clean up temp file if there was an error
-            if self.radio_filter_enabled and os.path.exists(self.temp_output_path):
+            logger.error(f"❌ Error reproduciendo audio: {e}")
+        finally:
+            if process is not None:
                 try:
-                    os.remove(self.temp_output_path)
-                except:
+                    process.stdin.close()
+                except Exception:
                     pass
-    
+                process.wait()
+
     # =======================
     # 2.3 UTILIDADES
     # =======================
     def _play_audio(self):
         """
-        Reproduce el archivo de audio usando aplay con parámetros optimizados.
+        Reproduce el archivo output_path usando aplay (scripts que trabajan con WAV exportados).
         """
+        if self.audio_output is not None and self.audio_output.available:
+            audio, sample_rate = sf.read(str(self.output_path), dtype='float32')
+            if audio.ndim > 1:
+                audio = audio.mean(axis=1)
+            self.play_buffer(audio, sample_rate)
+            return
+
         try:
             # Parámetros mejorados para aplay
             play_command = [
@@ -294,7 +478,11 @@ class PiperTTS:
             radio_filter_noise=piper_tuning.get("radio_filter_noise", True),
             radio_filter_compression=piper_tuning.get("radio_filter_compression", True),
             mando_effect_enabled=piper_tuning.get("mando_effect_enabled", False),
-            gain_before_filter=piper_tuning.get("gain_before_filter", 0.0)
+            gain_before_filter=piper_tuning.get("gain_before_filter", 0.0),
+            resident_voice=piper_tuning.get("resident_voice", True),
+            export_wav=piper_tuning.get("export_wav", False),
+            radio_filter_streaming=piper_tuning.get("radio_filter_streaming", False),
+            stream_block_size=piper_tuning.get("stream_block_size", 1024)
         )
         
         # ========== CONFIGURAR AUDIO EFFECTS ==========
@@ -0,0 +1,97 @@
+# ===============================================
+# REMINDER ANNOUNCER - Recordatorios Ya Dichos Antes de Tiempo para TARS-BSK
+# Objetivo: Sintetizar el aviso cuando se programa, no cuando suena
+# Dependencias: PiperTTS (render + render_fingerprint), phrase_bank (WAV), speech_pipeline (RenderedFragment)
+# Advertencia: La puntualidad no admite un Piper arrancando en frío a las 8:00 en punto.
+# ===============================================
+
+# ===============================================
+# 1. CONFIGURACIÓN INICIAL Y DEPENDENCIAS
+# ===============================================
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from tts.phrase_bank import read_wav, write_wav
+from tts.speech_pipeline import RenderedFragment
+
+logger = logging.getLogger("TARS.ReminderAnnouncer")
+
+# ===============================================
+# 2. CLASE PRINCIPAL REMINDERANNOUNCER
+# ===============================================
+class ReminderAnnouncer:
+    """
+    Puente entre SchedulerPlugin (solo stdlib) y la cadena de voz:
+
+    - render(): aviso completo (Piper + filtro + efectos) a data/reminder_audio/<job_id>.wav
+    - play(): reproduce el WAV guardado con prioridad de alarma, sin sintetizar nada
+    - fingerprint(): huella de la voz actual; si cambia, el scheduler vuelve a renderizar
+    """
+
+    def __init__(self, tts, speak_rendered: Callable[[RenderedFragment], object], audio_dir):
+        """
+        :param tts: PiperTTS (render + render_fingerprint)
+        :param speak_rendered: Encola un RenderedFragment con prioridad de alarma
+        :param audio_dir: Directorio de los WAV de avisos
+        """
+        self.tts = tts
+        self.speak_rendered = speak_rendered
+        self.audio_dir = Path(audio_dir)
+        self.audio_dir.mkdir(parents=True, exist_ok=True)
+
+        self.rendered = 0
+        self.played = 0
+
+    def fingerprint(self) -> str:
+        return self.tts.render_fingerprint()
+
+    def _path(self, job_id: str) -> Path:
+        return self.audio_dir / f"{job_id}.wav"
+
+    def render(self, job_id: str, text: str) -> Optional[str]:
+        """Renderiza el aviso; devuelve la huella de voz usada (None si falló)"""
+        fingerprint = self.fingerprint()
+        start = time.time()
+        audio, sample_rate = self.tts.render(text)
+        if not len(audio):
+            return None
+        tmp_path = self.audio_dir / f"{job_id}.tmp.wav"
+        write_wav(tmp_path, audio, sample_rate)
+        os.replace(tmp_path, self._path(job_id))
+        self.rendered += 1
+        logger.info(f"⏰ Aviso de {job_id} pre-sintetizado en {time.time() - start:.2f}s")
+        return fingerprint
+
+    def play(self, job_id: str, text: str) -> bool:
+        """Encola el aviso ya renderizado; False si no hay audio (el scheduler sintetiza al vuelo)"""
+        try:
+            audio, sample_rate = read_wav(self._path(job_id))
+        except Exception as e:
+            logger.warning(f"⚠️ Aviso pre-sintetizado de {job_id} no disponible: {e}")
+            return False
+        self.speak_rendered(RenderedFragment(text, audio, sample_rate))
+        self.played += 1
+        return True
+
+    def discard(self, job_id: str):
+        try:
+            self._path(job_id).unlink()
+        except FileNotFoundError:
+            pass
+
+    def get_stats(self) -> dict:
+        return {"rendered": self.rendered, "played": self.played}
+
+# ===============================================
+# ESTADO: PUNTUALMENTE PREPARADO (el aviso ya estaba dicho, solo faltaba la hora)
+# ÚLTIMA ACTUALIZACIÓN: Cuando el recordatorio de las 8:00 dejó de sonar a las 8:00 y 4 segundos
+# FILOSOFÍA: "Ser puntual es llegar antes. Hablar puntual, también."
+# ===============================================
+#
+#           THIS IS THE ON-TIME WAY...
+#           (sintetizar al programar, reproducir al sonar)
+#
+# ===============================================
@@ -0,0 +1,226 @@
+# ===============================================
+# SPEECH PIPELINE - Síntesis y Reproducción Solapadas para TARS-BSK
+# Objetivo: Que la frase siguiente ya esté sintetizada cuando termina la actual
+# Dependencias: threading, queue, numpy, PiperTTS (render + play_buffer)
+# Advertencia: Un time.sleep(1.0) entre frases no es una pausa dramática. Es un bug con pretensiones.
+# ===============================================
+
+# ===============================================
+# 1. CONFIGURACIÓN INICIAL Y DEPENDENCIAS
+# ===============================================
+import logging
+import queue
+import threading
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+
+logger = logging.getLogger("TARS.SpeechPipeline")
+
+# ===============================================
+# 2. ENUNCIADO EN CURSO
+# ===============================================
+class RenderedFragment(str):
+    """Fragmento cuyo audio final ya existe (p.ej. recordatorios pre-sintetizados): se reproduce sin render()"""
+
+    def __new__(cls, text: str, audio: np.ndarray, sample_rate: int):
+        fragment = super().__new__(cls, text)
+        fragment.audio = audio
+        fragment.sample_rate = sample_rate
+        return fragment
+
+
+class Utterance:
+    """Grupo de fragmentos encolados juntos; wait() bloquea hasta que suena el último"""
+
+    def __init__(self, fragments: int):
+        self.pending = fragments
+        self.cancelled = False
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        if fragments == 0:
+            self._done.set()
+
+    def _fragment_finished(self):
+        with self._lock:
+            self.pending -= 1
+            if self.pending <= 0:
+                self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def cancel(self):
+        """Sus fragmentos pendientes se descartan al llegar a síntesis o reproducción"""
+        self.cancelled = True
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+
+# ===============================================
+# 3. CLASE PRINCIPAL SPEECHPIPELINE
+# ===============================================
+class SpeechPipeline:
+    """
+    Productor/consumidor de voz:
+
+    - Hilo de síntesis: render() (Piper + filtro + efectos) de los fragmentos pendientes
+    - Cola acotada de audio listo (backpressure: no se sintetiza media respuesta por adelantado)
+    - Hilo de reproducción: play_buffer() con la pausa natural añadida como silencio
+    """
+
+    # =======================
+    # 3.1 INICIALIZACIÓN
+    # =======================
+    def __init__(self, tts, queue_size: int = 2, sentence_pause: float = 0.35,
+                 clause_pause: float = 0.2, fragment_pause: float = 0.15):
+        """
+        :param tts: PiperTTS (o cualquier objeto con render(text) y play_buffer(audio, sr))
+        :param queue_size: Fragmentos renderizados que pueden esperar a ser reproducidos
+        :param sentence_pause: Silencio tras '.', '!', '?' (segundos)
+        :param clause_pause: Silencio tras ',', ';', ':' (segundos)
+        :param fragment_pause: Silencio tras un fragmento sin puntuación final (segundos)
+        """
+        self.tts = tts
+        self.sentence_pause = sentence_pause
+        self.clause_pause = clause_pause
+        self.fragment_pause = fragment_pause
+
+        self._text_queue: queue.Queue = queue.Queue()
+        self._audio_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._running = False
+        self._threads = []
+
+        self.rendered = 0
+        self.played = 0
+        self.underruns = 0
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        for target, name in ((self._synthesis_loop, "TARS-SpeechSynth"), (self._playback_loop, "TARS-SpeechPlay")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"🎙️ Pipeline de voz iniciado (cola de audio: {self._audio_queue.maxsize})")
+
+    def stop(self):
+        self.clear()
+        self._running = False
+        self._text_queue.put(None)
+        try:
+            self._audio_queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    # =======================
+    # 3.2 API PÚBLICA
+    # =======================
+    def speak(self, fragments: Iterable[str]) -> Utterance:
+        """Encola fragmentos y vuelve enseguida; el Utterance permite esperar a que terminen"""
+        fragments = [f for f in fragments if f and f.strip()]
+        utterance = Utterance(len(fragments))
+        for fragment in fragments:
+            self._text_queue.put((fragment, utterance))
+        return utterance
+
+    def say(self, text: str, timeout: Optional[float] = None) -> bool:
+        """Encola un texto y espera a que termine de sonar"""
+        return self.speak([text]).wait(timeout)
+
+    def clear(self):
+        """Descarta lo pendiente (texto y audio ya renderizado); lo que suena termina"""
+        for q in (self._text_queue, self._audio_queue):
+            while True:
+                try:
+                    item = q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    utterance = item[-1]
+                    utterance.cancelled = True
+                    utterance._fragment_finished()
+
+    @property
+    def idle(self) -> bool:
+        return self._text_queue.empty() and self._audio_queue.empty()
+
+    # =======================
+    # 3.3 PAUSAS NATURALES
+    # =======================
+    def pause_after(self, fragment: str) -> float:
+        tail = fragment.rstrip()[-1:]
+        if tail in ".!?…":
+            return self.sentence_pause
+        if tail in ",;:":
+            return self.clause_pause
+        return self.fragment_pause
+
+    # =======================
+    # 3.4 HILOS DE TRABAJO
+    # =======================
+    def _synthesis_loop(self):
+        while self._running:
+            item = self._text_queue.get()
+            if item is None:
+                return
+            fragment, utterance = item
+            if utterance.cancelled:
+                utterance._fragment_finished()
+                continue
+
+            try:
+                start = time.time()
+                if isinstance(fragment, RenderedFragment):
+                    audio, sample_rate = fragment.audio, fragment.sample_rate
+                else:
+                    audio, sample_rate = self.tts.render(fragment)
+                logger.info(f"🧱 Fragmento renderizado en {time.time() - start:.2f}s: '{fragment[:40]}'")
+            except Exception as e:
+                logger.error(f"❌ Error sintetizando fragmento: {e}")
+                utterance._fragment_finished()
+                continue
+
+            if not len(audio):
+                utterance._fragment_finished()
+                continue
+
+            # Pausa natural como silencio al final del propio buffer: sin sleeps ni huecos extra
+            silence = np.zeros(int(self.pause_after(fragment) * sample_rate), dtype=np.float32)
+            self.rendered += 1
+            self._audio_queue.put((np.concatenate([audio, silence]), sample_rate, utterance))
+
+    def _playback_loop(self):
+        while self._running:
+            if self._audio_queue.empty() and not self._text_queue.empty():
+                self.underruns += 1  # La síntesis no llegó a tiempo: habrá hueco
+            item = self._audio_queue.get()
+            if item is None:
+                return
+            audio, sample_rate, utterance = item
+            try:
+                if not utterance.cancelled:
+                    self.tts.play_buffer(audio, sample_rate)
+                    self.played += 1
+            except Exception as e:
+                logger.error(f"❌ Error reproduciendo fragmento: {e}")
+            finally:
+                utterance._fragment_finished()
+
+    def get_stats(self) -> dict:
+        return {"rendered": self.rendered, "played": self.played, "underruns": self.underruns}
+
+# ===============================================
+# ESTADO: FLUIDAMENTE SOLAPADO (hablo mientras pienso la siguiente frase)
+# ÚLTIMA ACTUALIZACIÓN: Cuando tres frases dejaron de costar tres síntesis y dos segundos de silencio
+# FILOSOFÍA: "La pausa es parte del discurso. La espera no."
+# ===============================================
+#
+#           THIS IS THE PIPELINE WAY...
+#           (una frase suena, la siguiente se cocina)
+#
+# ===============================================
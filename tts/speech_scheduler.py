@@ -0,0 +1,368 @@
+# ===============================================
+# SPEECH SCHEDULER - Turnos de Palabra con Prioridad para TARS-BSK
+# Objetivo: Que chat, recordatorios y plugins hablen por una sola boca, y por orden de importancia
+# Dependencias: threading, heapq, SpeechPipeline (síntesis/reproducción), AudioOutput opcional (cortes inmediatos)
+# Advertencia: Si suena la alarma mientras filosofo sobre tostadoras, la alarma gana. Siempre.
+# ===============================================
+
+# ===============================================
+# 1. CONFIGURACIÓN INICIAL Y DEPENDENCIAS
+# ===============================================
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger("TARS.SpeechScheduler")
+
+# Menor número = más urgente
+PRIORITY_ALARM = 0     # Recordatorios que disparan
+PRIORITY_ANSWER = 1    # Respuestas del chat
+PRIORITY_FILLER = 2    # Transiciones, "déjame pensar..."
+PRIORITY_AMBIENT = 3   # Comentarios de plugins sin prisa
+
+PRIORITY_NAMES = {
+    PRIORITY_ALARM: "alarm",
+    PRIORITY_ANSWER: "answer",
+    PRIORITY_FILLER: "filler",
+    PRIORITY_AMBIENT: "ambient",
+}
+
+# Interrumpidos con estas prioridades vuelven a la cola con lo que les faltaba por decir
+RESUMABLE = {PRIORITY_ALARM, PRIORITY_ANSWER}
+
+# ===============================================
+# 2. ENUNCIADO PLANIFICADO
+# ===============================================
+class ScheduledUtterance:
+    """
+    Turno de palabra de un productor. submit() lo crea ya cerrado; open() lo deja
+    abierto para ir añadiendo frases (respuesta en streaming) hasta close().
+    """
+
+    def __init__(self, priority: int, source: str, coalesce_key: Optional[str] = None):
+        self.priority = priority
+        self.source = source
+        self.coalesce_key = coalesce_key
+        self.fragments: List[str] = []
+        self.spoken = 0            # Fragmentos que ya sonaron enteros
+        self.cancelled = False
+        self.preempted = 0         # Veces que otro más urgente lo interrumpió
+
+        self.queued_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+        self._closed = False
+        self._done = threading.Event()
+        self._changed = threading.Condition()
+
+    # =======================
+    # 2.1 API DEL PRODUCTOR
+    # =======================
+    def add(self, fragments: Iterable[str]):
+        with self._changed:
+            if not self._closed:
+                self.fragments.extend(f for f in fragments if f and f.strip())
+                self._changed.notify_all()
+
+    def close(self):
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+
+    def cancel(self):
+        self.cancelled = True
+        self.close()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    # =======================
+    # 2.2 LATENCIAS
+    # =======================
+    @property
+    def queue_latency(self) -> Optional[float]:
+        return None if self.started_at is None else self.started_at - self.queued_at
+
+    @property
+    def playback_time(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def _finish(self):
+        self.finished_at = time.time()
+        self._done.set()
+
+# ===============================================
+# 3. CLASE PRINCIPAL SPEECHSCHEDULER
+# ===============================================
+class SpeechScheduler:
+    """
+    Única puerta de salida de voz para todos los productores:
+
+    - Cola por prioridad (alarm > answer > filler > ambient), FIFO dentro de cada prioridad
+    - Preempción: algo más urgente corta lo que suena; answer/alarm interrumpidos se reanudan
+      desde el fragmento cortado, filler/ambient se descartan
+    - Coalescencia: con la misma coalesce_key solo sobrevive el último encolado; un filler o ambient
+      no se encola si ya espera o suena algo más urgente
+    - Latencia de cola y de reproducción por enunciado y por prioridad
+    """
+
+    # =======================
+    # 3.1 INICIALIZACIÓN
+    # =======================
+    def __init__(self, pipeline, audio_output=None):
+        """
+        :param pipeline: SpeechPipeline arrancado (speak(fragments) → Utterance, clear())
+        :param audio_output: AudioOutput para cortar en seco lo que ya suena (opcional)
+        """
+        self.pipeline = pipeline
+        self.audio_output = audio_output
+
+        self._heap = []
+        self._sequence = itertools.count()
+        self._lock = threading.Condition()
+        self._current: Optional[ScheduledUtterance] = None
+        self._running = False
+        self._thread = None
+
+        self.completed = 0
+        self.dropped = 0
+        self.preemptions = 0
+        self._latency: Dict[int, List[float]] = {p: [0, 0.0, 0.0] for p in PRIORITY_NAMES}
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._dispatch_loop, name="TARS-SpeechScheduler", daemon=True)
+        self._thread.start()
+        logger.info("🎚️ Planificador de voz iniciado")
+
+    def stop(self):
+        with self._lock:
+            self._running = False
+            for _, _, utterance in self._heap:
+                utterance.cancel()
+                utterance._finish()
+            self._heap.clear()
+            if self._current is not None:
+                self._current.cancel()
+            self._lock.notify_all()
+        self._interrupt(PRIORITY_ALARM)
+
+    # =======================
+    # 3.2 API DE LOS PRODUCTORES
+    # =======================
+    def submit(self, fragments: Iterable[str], priority: int = PRIORITY_ANSWER, source: str = "chat",
+               coalesce_key: Optional[str] = None) -> ScheduledUtterance:
+        """Encola un enunciado completo y vuelve enseguida (wait() para bloquear)"""
+        utterance = ScheduledUtterance(priority, source, coalesce_key)
+        utterance.add(fragments)
+        utterance.close()
+        return self._enqueue(utterance)
+
+    def open(self, priority: int = PRIORITY_ANSWER, source: str = "chat") -> ScheduledUtterance:
+        """Enunciado abierto: add() frase a frase según se generan, close() al terminar"""
+        return self._enqueue(ScheduledUtterance(priority, source))
+
+    def _enqueue(self, utterance: ScheduledUtterance) -> ScheduledUtterance:
+        with self._lock:
+            if not self._running or self._superfluous(utterance):
+                self.dropped += 1
+                utterance.cancel()
+                utterance._finish()
+                logger.info(f"🔇 Descartado [{PRIORITY_NAMES[utterance.priority]}] de {utterance.source}")
+                return utterance
+
+            if utterance.coalesce_key is not None:
+                self._coalesce(utterance.coalesce_key)
+
+            heapq.heappush(self._heap, (utterance.priority, next(self._sequence), utterance))
+            current = self._current
+            preempt = current is not None and utterance.priority < current.priority
+            if preempt:
+                current.preempted += 1
+                self.preemptions += 1
+            self._lock.notify_all()
+
+        if preempt:
+            # El corte lo hace el hilo de despacho (_speak) antes de pasar el urgente al pipeline:
+            # desde aquí podría cancelar fragmentos del propio urgente ya encolados
+            logger.info(f"⏭️ [{PRIORITY_NAMES[utterance.priority]}] de {utterance.source} interrumpe "
+                        f"[{PRIORITY_NAMES[current.priority]}] de {current.source}")
+        return utterance
+
+    def _superfluous(self, utterance: ScheduledUtterance) -> bool:
+        """Un relleno sobra si ya espera o suena algo más urgente (llamar con el lock tomado)"""
+        if utterance.priority < PRIORITY_FILLER:
+            return False
+        pending = [u for _, _, u in self._heap] + ([self._current] if self._current else [])
+        return any(u.priority < utterance.priority and not u.cancelled for u in pending)
+
+    def _coalesce(self, key: str):
+        """Solo el último con la misma clave sobrevive en la cola (llamar con el lock tomado)"""
+        for _, _, queued in self._heap:
+            if queued.coalesce_key == key and not queued.cancelled:
+                queued.cancel()
+                self.dropped += 1
+
+    def _interrupt(self, priority: int, in_flight: Optional[list] = None):
+        """
+        Corta los fragmentos de in_flight (todo el pipeline si es None, al parar) y, si hay salida
+        residente, lo que ya suena. Solo desde el hilo de despacho o con el despacho detenido.
+        """
+        if in_flight is None:
+            self.pipeline.clear()
+        else:
+            for _, played in in_flight:
+                played.cancel()
+        if self.audio_output is not None:
+            self.audio_output.stop("speech")
+            if priority == PRIORITY_ALARM:
+                # Una alarma tampoco espera al audio de "pensando..." de SensoryFeedback
+                self.audio_output.stop("filler")
+
+    # =======================
+    # 3.3 DESPACHO
+    # =======================
+    def _dispatch_loop(self):
+        while True:
+            with self._lock:
+                while self._running and not self._heap:
+                    self._lock.wait()
+                if not self._running:
+                    return
+                _, _, utterance = heapq.heappop(self._heap)
+                if utterance.cancelled:
+                    utterance._finish()
+                    continue
+                self._current = utterance
+
+            if utterance.started_at is None:
+                utterance.started_at = time.time()
+            try:
+                self._speak(utterance)
+            except Exception as e:
+                logger.error(f"❌ Error en el planificador de voz: {e}")
+            finally:
+                with self._lock:
+                    self._current = None
+            self._settle(utterance)
+
+    def _speak(self, utterance: ScheduledUtterance):
+        """Pasa los fragmentos al pipeline según llegan y espera a que suenen (o a ser interrumpido)"""
+        preempted_at = utterance.preempted
+        in_flight = []   # (índice del fragmento, Utterance del pipeline)
+        forwarded = utterance.spoken
+
+        while True:
+            with utterance._changed:
+                while (forwarded == len(utterance.fragments) and not utterance._closed
+                       and utterance.preempted == preempted_at):
+                    utterance._changed.wait(0.1)
+                    self._collect(utterance, in_flight)
+                new = utterance.fragments[forwarded:]
+                closed = utterance._closed
+
+            if utterance.preempted != preempted_at or utterance.cancelled:
+                self._yield_turn(utterance, in_flight)
+                return
+            # Cada fragmento por separado: así se sabe cuáles sonaron si llega una interrupción
+            for offset, fragment in enumerate(new):
+                in_flight.append((forwarded + offset, self.pipeline.speak([fragment])))
+            forwarded += len(new)
+            self._collect(utterance, in_flight)
+            if closed and forwarded == len(utterance.fragments):
+                break
+
+        while in_flight:
+            if utterance.preempted != preempted_at or utterance.cancelled:
+                self._yield_turn(utterance, in_flight)
+                return
+            in_flight[0][1].wait(0.05)
+            self._collect(utterance, in_flight)
+
+    def _yield_turn(self, utterance: ScheduledUtterance, in_flight: list):
+        """Cede la voz: anota lo que ya sonó y corta solo los fragmentos de este turno"""
+        self._collect(utterance, in_flight)
+        with self._lock:
+            urgent = self._heap[0][0] if self._heap else utterance.priority
+        self._interrupt(urgent, in_flight)
+
+    @staticmethod
+    def _collect(utterance: ScheduledUtterance, in_flight: list):
+        """Avanza `spoken` con los fragmentos que terminaron de sonar en orden"""
+        while in_flight and in_flight[0][1].done:
+            index, played = in_flight.pop(0)
+            if played.cancelled:
+                break
+            utterance.spoken = index + 1
+
+    def _settle(self, utterance: ScheduledUtterance):
+        """Termina el enunciado, o lo reencola si fue interrumpido y merece reanudarse"""
+        remaining = len(utterance.fragments) - utterance.spoken
+        interrupted = utterance.preempted and (remaining > 0 or not utterance._closed)
+        if interrupted and not utterance.cancelled and utterance.priority in RESUMABLE:
+            with self._lock:
+                if self._running:
+                    # Secuencia negativa: vuelve delante de los de su misma prioridad
+                    heapq.heappush(self._heap, (utterance.priority, -next(self._sequence), utterance))
+                    self._lock.notify_all()
+                    logger.info(f"⏸️ [{PRIORITY_NAMES[utterance.priority]}] de {utterance.source} "
+                                f"se reanudará ({remaining} fragmentos pendientes)")
+                    return
+
+        if interrupted:
+            self.dropped += 1
+        else:
+            self.completed += 1
+        utterance._finish()
+        self._record(utterance)
+
+    def _record(self, utterance: ScheduledUtterance):
+        stats = self._latency[utterance.priority]
+        stats[0] += 1
+        stats[1] += utterance.queue_latency or 0.0
+        stats[2] += utterance.playback_time or 0.0
+        logger.info(f"🗣️ [{PRIORITY_NAMES[utterance.priority]}] {utterance.source}: "
+                    f"cola {utterance.queue_latency or 0.0:.2f}s, voz {utterance.playback_time or 0.0:.2f}s")
+
+    # =======================
+    # 3.4 ESTADÍSTICAS
+    # =======================
+    def get_stats(self) -> dict:
+        per_priority = {}
+        for priority, (count, queue_total, playback_total) in self._latency.items():
+            if count:
+                per_priority[PRIORITY_NAMES[priority]] = {
+                    "count": count,
+                    "avg_queue": queue_total / count,
+                    "avg_playback": playback_total / count,
+                }
+        return {
+            "completed": self.completed,
+            "dropped": self.dropped,
+            "preemptions": self.preemptions,
+            "queued": len(self._heap),
+            "by_priority": per_priority,
+        }
+
+# ===============================================
+# ESTADO: DISCIPLINADAMENTE INTERRUMPIBLE (hablo cuando me toca)
+# ÚLTIMA ACTUALIZACIÓN: Cuando el recordatorio de las 8:00 dejó de pisar mi opinión sobre tu pregunta
+# FILOSOFÍA: "Hablar a la vez no es conversar. Es ruido con buenas intenciones."
+# ===============================================
+#
+#           THIS IS THE TURN-TAKING WAY...
+#           (una boca, muchas voces, un orden)
+#
+# ===============================================